@@ -0,0 +1,161 @@
+# AI路由的准入控制
+# - ClientRateLimiter：按客户端（IP）的令牌桶限速，超出直接429，不占用worker和上游配额
+# - ConcurrencyLimiter：全局限制同时进行中的上游调用数，超出时进入有界等待队列，
+#   队列满或等待超时由调用方决定快速拒绝（429）还是降级为预设响应
+import threading
+import time
+from collections import OrderedDict
+
+
+class AdmissionRejected(Exception):
+    """请求未获准入；reason为 rate_limited / queue_full / queue_timeout，retry_after为建议的重试等待秒数"""
+
+    def __init__(self, reason, retry_after=1):
+        super().__init__('服务繁忙，请稍后再试。')
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ClientRateLimiter:
+    """按客户端的令牌桶：每个客户端每秒补充rate个令牌，最多累积burst个
+
+    所有客户端的桶存放在一个LRU表中，只保存 (令牌数, 上次补充时间)；
+    超过max_clients时淘汰最久未访问的客户端（被淘汰的客户端下次访问时桶是满的，
+    长时间不活跃的桶本来也早已补满，不影响限速效果）。
+    """
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = float(burst)
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, client):
+        """尝试为客户端取一个令牌；成功返回0，失败返回需要等待的秒数"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.pop(client, None)
+            if bucket is None:
+                tokens = self.burst
+            else:
+                tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class ConcurrencyLimiter:
+    """全局并发上限 + 有界等待队列
+
+    acquire() 在有空位时立即返回；否则排队等待（最多max_queue个等待者，按到达顺序放行），
+    队列已满抛出 AdmissionRejected('queue_full')，等待超时抛出 AdmissionRejected('queue_timeout')。
+    """
+
+    def __init__(self, max_in_flight, max_queue, queue_timeout):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters = []    # 等待中的Event，按到达顺序
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def acquire(self):
+        """取得一个调用名额，返回排队等待的秒数"""
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._waiters:
+                self._in_flight += 1
+                return 0.0
+            if len(self._waiters) >= self.max_queue:
+                raise AdmissionRejected('queue_full', retry_after=max(1, int(self.queue_timeout)))
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+        started = time.perf_counter()
+        if not waiter.wait(self.queue_timeout):
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise AdmissionRejected('queue_timeout', retry_after=max(1, int(self.queue_timeout)))
+            # 超时的同时被放行，名额已转交给本请求
+        return time.perf_counter() - started
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # 名额直接转交给最早的等待者，in_flight不变
+                self._waiters.pop(0).set()
+            else:
+                self._in_flight -= 1
+
+    def hold(self, chunks):
+        """把已取得的名额交给流式迭代器：迭代结束、出错或被close()时归还"""
+        return _HeldStream(chunks, self.release)
+
+
+class _HeldStream:
+    """持有上游调用名额的流式迭代器"""
+
+    def __init__(self, chunks, release):
+        self._chunks = iter(chunks)
+        self._release = release
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            close = getattr(self._chunks, 'close', None)
+            if close:
+                close()
+        finally:
+            self._release()
+
+    def __del__(self):
+        # 未迭代就被丢弃时也要归还名额
+        self.close()
+
+
+# 由可信代理覆盖写入（而非追加）的客户端地址头，优先于X-Forwarded-For：Vercel会写入这两个头，nginx常配置X-Real-IP
+REAL_IP_HEADERS = ('X-Vercel-Forwarded-For', 'X-Real-IP')
+
+
+def client_identity(remote_addr, headers=None, trust_proxy=False):
+    """客户端标识：部署在反向代理/Vercel之后时优先取代理写入的真实地址头，
+    其次取X-Forwarded-For的最后一跳（由最近的可信代理追加，客户端自带的前几跳可以伪造），
+    都没有时取连接地址。headers需按不区分大小写的方式取值（Flask/Starlette的Headers）"""
+    if trust_proxy and headers is not None:
+        for name in REAL_IP_HEADERS + ('X-Forwarded-For',):
+            value = headers.get(name)
+            if value:
+                hop = value.split(',')[-1].strip()
+                if hop:
+                    return hop
+    return remote_addr or 'unknown'
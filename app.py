@@ -1,20 +1,39 @@
+import time
+_startup_started = time.perf_counter()  # 冷启动计时起点：应用模块开始导入
+
 import os
-from dotenv import load_dotenv
-from flask import Flask, request, render_template, Response, stream_with_context, jsonify
-from http import HTTPStatus
+from flask import Flask, request, render_template, Response, stream_with_context, jsonify, g, has_request_context, url_for
 import json
+import math
 import base64
-from PIL import Image, ImageDraw, ImageFont
-import io
-import time
-import requests
-
-# Vercel环境适配：优先从环境变量加载配置
-# 在无服务器环境中，不依赖.env文件
-try:
-    load_dotenv(override=True)
-except:
-    pass  # 在Vercel环境中可能没有.env文件
+import datetime
+import hashlib
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from cache_store import LRUCache, SQLiteCache, TieredCache, make_cache_key
+from singleflight import SingleFlight, StreamFanout
+from number_scoring import clean_number, describe_number, score_number
+from ranking_store import MemoryRankingStore, SQLiteRankingStore
+from prompts import PROMPTS, prompt_version
+from json_stream import JSONFieldStream, validate_fields
+from preset_corpus import get_number_preset, get_number_preset_bytes, load_corpus
+from share_card import render_share_card, warm_share_card
+from bazi_calendar import BaZi, load_table as load_solar_terms, parse_birth
+from char_index import NameFeatures, analyze_name, load_index as load_char_index
+from lucky_draw import PRIZES, draw, draw_many
+from cache_warmer import CacheWarmer
+from static_assets import IMMUTABLE_CACHE_CONTROL, asset_filename, choose_body, find_asset, load_assets
+from stream_compression import compress_bytes, compress_chunks, negotiate_encoding
+from admission import REAL_IP_HEADERS, AdmissionRejected, ClientRateLimiter, ConcurrencyLimiter, client_identity
+from llm_client import Completion, LLMError, create_llm_client, missing_dependency
+from resilience import CallTimeout, CircuitBreaker, RetryBudget, TokenBucket, backoff_delay, call_with_timeout
+from metrics import (
+    ADMISSION_REJECTED, CACHE_WARM_REFRESHES, UPSTREAM_QUEUE_WAIT_SECONDS,
+    CACHE_REQUESTS, CONTENT_TYPE as METRICS_CONTENT_TYPE, HTTP_REQUEST_SECONDS, STREAM_FIRST_CHUNK_SECONDS,
+    UPSTREAM_CALLS, UPSTREAM_DEGRADED, UPSTREAM_FIRST_CHUNK_SECONDS, UPSTREAM_RETRIES, UPSTREAM_SECONDS,
+    gauge_func, record_upstream_usage, render_metrics, time_first_chunk
+)
 
 app = Flask(__name__)
 
@@ -26,100 +45,619 @@ IS_VERCEL = (
     os.getenv('LAMBDA_TASK_ROOT') is not None
 )
 
-# AI服务配置
+# 本地环境从.env加载配置；无服务器环境的配置由平台注入环境变量，跳过dotenv以缩短冷启动
 if not IS_VERCEL:
     try:
-        import dashscope
-        api_key = os.getenv("DASHSCOPE_API_KEY")
-        if api_key:
+        from dotenv import load_dotenv
+        load_dotenv(override=True)
+    except ImportError:
+        pass
+
+# AI服务配置：LLM_BACKEND选择上游客户端（dashscope/http/mock，见llm_client.py），默认仍走官方SDK，
+# 设置LLM_BACKEND=http改用带连接池的HTTP客户端；这里只检查依赖是否可用，客户端在首次调用AI时再创建
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'dashscope').lower()
+DASHSCOPE_API_KEY = None
+if not IS_VERCEL:
+    missing = missing_dependency(LLM_BACKEND)
+    if LLM_BACKEND == 'mock':
+        print("本地环境：使用模拟大模型后端")
+    elif missing:
+        print(f"{missing}未安装，使用预设响应模式")
+        IS_VERCEL = True
+    else:
+        DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY")
+        if DASHSCOPE_API_KEY:
             print(f"本地环境：API Key加载成功")
-            dashscope.api_key = api_key
         else:
             print("警告：本地环境未找到API Key，切换到预设模式")
             IS_VERCEL = True
-    except ImportError:
-        print("dashscope未安装，使用预设响应模式")
-        IS_VERCEL = True
 
 if IS_VERCEL:
     print("使用预设响应模式")
-
+    load_corpus()
+
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+def get_llm_client():
+    """首次使用时创建进程内共享的大模型客户端（HTTP后端复用同一个连接池）"""
+    global _llm_client
+    if _llm_client is None:
+        with _llm_client_lock:
+            if _llm_client is None:
+                _llm_client = create_llm_client(LLM_BACKEND, DASHSCOPE_API_KEY, AI_MODEL, AI_TIMEOUT)
+    return _llm_client
+
+def prewarm():
+    """后台预热：提前创建大模型客户端、加载分享卡片依赖、交节时刻表、汉字索引和静态资源，不阻塞启动"""
+    started = time.perf_counter()
+    try:
+        if not IS_VERCEL:
+            get_llm_client()
+        warm_share_card()
+        load_solar_terms()
+        load_char_index()
+        load_assets()
+        print(f"后台预热完成，耗时{(time.perf_counter() - started) * 1000:.0f}ms")
+    except Exception as e:
+        print(f"后台预热失败: {str(e)}")
+
+
+# 指标与追踪：设置METRICS_TRACE_HEADER=1或请求带X-Trace: 1时，响应附带Server-Timing头
+METRICS_TRACE_HEADER = os.getenv('METRICS_TRACE_HEADER', '').lower() in ('1', 'true', 'yes')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.trace = [] if METRICS_TRACE_HEADER or request.headers.get('X-Trace') == '1' else None
+
+@app.after_request
+def record_request_metrics(response):
+    """记录请求耗时；流式响应在最后一个字节发出、连接关闭时才计入"""
+    started = g.get('request_started')
+    if started is None:
+        return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    method, status = request.method, str(response.status_code)
+    response.call_on_close(
+        lambda: HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route, method, status)
+    )
+    if g.get('trace') is not None:
+        entries = [f'{name};dur={seconds * 1000:.1f}' for name, seconds in g.trace]
+        entries.append(f'app;dur={(time.perf_counter() - started) * 1000:.1f}')
+        response.headers['Server-Timing'] = ', '.join(entries)
+    return response
+
+def add_trace(name, seconds):
+    """向当前请求的Server-Timing追加一项；未开启追踪或不在请求上下文中（如批量任务线程）时忽略"""
+    if has_request_context() and g.get('trace') is not None:
+        g.trace.append((name, seconds))
+
+def track_first_chunk(chunks):
+    """包装流式响应，记录首个内容片段的耗时"""
+    return time_first_chunk(chunks, g.request_started, STREAM_FIRST_CHUNK_SECONDS, request.url_rule.rule)
+
+# 响应压缩：文本流（/fortune、/name_analysis等）和首页按Accept-Encoding协商gzip/deflate，
+# 流式响应逐片段同步刷新；设置STREAM_COMPRESSION=0可关闭（例如前置代理已负责压缩）
+STREAM_COMPRESSION = os.getenv('STREAM_COMPRESSION', '1').lower() not in ('0', 'false', 'no')
+COMPRESSION_MIN_SIZE = 256
+
+def compress_response(response):
+    """按请求的Accept-Encoding压缩响应：流式响应逐片段压缩，完整响应体过小时不压缩"""
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding')) if STREAM_COMPRESSION else None
+    if encoding is None or 'Content-Encoding' in response.headers:
+        return response
+    if response.is_streamed:
+        response.response = compress_chunks(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < COMPRESSION_MIN_SIZE:
+            return response
+        response.set_data(compress_bytes(body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.context_processor
+def inject_asset_url():
+    def asset_url(name):
+        """带内容摘要的资源地址；资源未登记时退回普通静态文件地址"""
+        filename = asset_filename(name)
+        return f'/assets/{filename}' if filename else url_for('static', filename=name)
+    return {'asset_url': asset_url}
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    # 页面本身每次重新验证，引用的脚本和样式带内容摘要，可以长期缓存
+    response = compress_response(Response(render_template('index.html'), content_type='text/html; charset=utf-8'))
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/assets/<path:filename>')
+def hashed_asset(filename):
+    """带内容摘要的静态资源：按Accept-Encoding返回预压缩版本，一年内immutable缓存"""
+    asset = find_asset(filename)
+    if asset is None:
+        return jsonify({'error': '资源不存在。'}), 404
+    encoding, body = choose_body(asset, request.headers.get('Accept-Encoding'))
+    response = Response(body, content_type=asset.mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(f'{asset.digest}-{encoding or "identity"}')
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response.make_conditional(request)
+
+# 模型与参数配置（同时参与缓存键计算，参数变化后旧缓存自动失效）
+AI_MODEL = 'qwen-plus'
+STREAM_PARAMETERS = {
+    'temperature': 0.8,
+    'top_k': 50,
+    'top_p': 0.9,
+    'max_tokens': 1500,
+    'repetition_penalty': 1.1,
+    'seed': None,
+    'incremental_output': True
+}
+NON_STREAM_PARAMETERS = {
+    'temperature': 0.7,
+    'top_k': 50,
+    'top_p': 0.9,
+    'max_tokens': 2000,
+    'repetition_penalty': 1.1,
+    'seed': None,
+    'incremental_output': False
+}
+# /evaluate流式模式：采样参数与非流式一致（共用缓存键），只是按增量返回
+EVALUATE_STREAM_PARAMETERS = {**NON_STREAM_PARAMETERS, 'incremental_output': True}
+
+# 容错配置：单次调用超时、重试退避上限、熔断阈值
+AI_TIMEOUT = float(os.getenv('AI_TIMEOUT', '30'))
+AI_RETRY_BASE_DELAY = float(os.getenv('AI_RETRY_BASE_DELAY', '0.2'))
+AI_RETRY_MAX_DELAY = float(os.getenv('AI_RETRY_MAX_DELAY', '2'))
+ai_breaker = CircuitBreaker(
+    failure_rate=float(os.getenv('AI_BREAKER_FAILURE_RATE', '0.5')),
+    min_calls=int(os.getenv('AI_BREAKER_MIN_CALLS', '10')),
+    window=float(os.getenv('AI_BREAKER_WINDOW', '30')),
+    cooldown=float(os.getenv('AI_BREAKER_COOLDOWN', '15'))
+)
+retry_budget = RetryBudget(ratio=float(os.getenv('AI_RETRY_BUDGET_RATIO', '0.2')))
+
+# 准入控制：AI路由按客户端令牌桶限速；同时进行中的上游调用数有全局上限，
+# 超出时在有界队列中等待，队列满或等待超时按ADMISSION_OVERFLOW处理：
+# preset（默认）降级为预设响应，reject直接返回429
+RATE_LIMIT_RATE = float(os.getenv('RATE_LIMIT_RATE', '1'))      # 每个客户端每秒补充的请求数，0为不限速
+RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', '10'))    # 每个客户端允许的突发请求数
+TRUST_PROXY_HEADERS = os.getenv('TRUST_PROXY_HEADERS', '1' if os.getenv('VERCEL') else '0') == '1'
+UPSTREAM_MAX_IN_FLIGHT = int(os.getenv('UPSTREAM_MAX_IN_FLIGHT', os.getenv('LLM_POOL_SIZE', '16')))  # 0为不限
+UPSTREAM_QUEUE_SIZE = int(os.getenv('UPSTREAM_QUEUE_SIZE', '32'))
+UPSTREAM_QUEUE_TIMEOUT = float(os.getenv('UPSTREAM_QUEUE_TIMEOUT', '5'))
+ADMISSION_OVERFLOW = os.getenv('ADMISSION_OVERFLOW', 'preset').lower()
+AI_ENDPOINTS = {'evaluate', 'evaluate_batch', 'fortune', 'name_analysis'}
+client_rate_limiter = ClientRateLimiter(RATE_LIMIT_RATE, RATE_LIMIT_BURST) if RATE_LIMIT_RATE > 0 else None
+upstream_limiter = (
+    ConcurrencyLimiter(UPSTREAM_MAX_IN_FLIGHT, UPSTREAM_QUEUE_SIZE, UPSTREAM_QUEUE_TIMEOUT)
+    if UPSTREAM_MAX_IN_FLIGHT > 0 else None
+)
+
+def too_many_requests(retry_after, message='请求过于频繁，请稍后再试。'):
+    response = jsonify({'error': message})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+@app.before_request
+def limit_client_rate():
+    """AI路由按客户端限速，超出直接429，不进入后续处理"""
+    if client_rate_limiter is None or request.endpoint not in AI_ENDPOINTS:
+        return None
+    client = client_identity(request.remote_addr, request.headers, TRUST_PROXY_HEADERS)
+    wait = client_rate_limiter.try_acquire(client)
+    if wait:
+        ADMISSION_REJECTED.inc('rate_limited', 'reject')
+        return too_many_requests(wait)
+    return None
+
+def acquire_upstream_slot(prompt):
+    """取得上游调用名额；返回None表示已获准入（调用方负责归还），
+    队列满或等待超时时按ADMISSION_OVERFLOW返回降级用的预设响应或抛出AdmissionRejected"""
+    if upstream_limiter is None:
+        return None
+    try:
+        waited = upstream_limiter.acquire()
+    except AdmissionRejected as e:
+        ADMISSION_REJECTED.inc(e.reason, ADMISSION_OVERFLOW)
+        # 熔断器半开时本次调用可能持有探测名额，未调用上游就要归还，否则熔断器会一直停在半开状态
+        ai_breaker.release_probe()
+        if ADMISSION_OVERFLOW == 'reject':
+            raise
+        UPSTREAM_DEGRADED.inc(prompt.feature)
+        return get_vercel_preset_response(prompt)
+    if waited:
+        UPSTREAM_QUEUE_WAIT_SECONDS.observe(waited)
+        add_trace('queue', waited)
+    return None
+
+def release_upstream_slot():
+    if upstream_limiter is not None:
+        upstream_limiter.release()
 
-def call_ai_with_retry(prompt, stream=False, max_retries=3):
-    """带重试机制的AI调用函数，Vercel环境使用预设响应"""
+def call_ai_with_retry(prompt, stream=False, max_retries=3, parameters=None):
+    """带重试机制的AI调用函数，Vercel环境使用预设响应
+
+    prompt为提示词注册表渲染出的Prompt对象；parameters默认按stream选择流式/非流式参数。
+
+    重试使用抖动退避并受重试预算限制；上游错误率过高时熔断器打开，
+    直接返回预设响应，不再等待上游。调用前需取得全局并发名额，
+    流式调用的名额随返回的迭代器一直持有到流结束。
+    """
     if IS_VERCEL:
         # Vercel环境使用预设的高质量中文响应
         return get_vercel_preset_response(prompt)
+    if not ai_breaker.allow():
+        UPSTREAM_DEGRADED.inc(prompt.feature)
+        return get_vercel_preset_response(prompt)
+    overflow = acquire_upstream_slot(prompt)
+    if overflow is not None:
+        return overflow
+    try:
+        response = call_upstream(prompt, stream, max_retries, parameters)
+    except BaseException:
+        release_upstream_slot()
+        raise
+    if stream and upstream_limiter is not None and not isinstance(response, str):
+        return upstream_limiter.hold(response)
+    release_upstream_slot()
+    return response
+
+def call_upstream(prompt, stream, max_retries, parameters):
+    """实际的上游调用与重试，由call_ai_with_retry在取得名额后调用"""
+    feature = prompt.feature
+    retry_budget.record_request()
     for attempt in range(max_retries):
+        started = time.perf_counter()
         try:
             if stream:
-                return dashscope.Generation.call(
-                    model='qwen-plus',
-                    prompt=prompt,
-                    stream=True,
-                    result_format='text',
-                    parameters={
-                        'temperature': 0.8,
-                        'top_k': 50,
-                        'top_p': 0.9,
-                        'max_tokens': 1500,
-                        'repetition_penalty': 1.1,
-                        'seed': None,
-                        'incremental_output': True
-                    }
-                )
+                # 流式调用建立连接后返回片段迭代器，结果和耗时在generate_stream中统计
+                return get_llm_client().stream(prompt, parameters or STREAM_PARAMETERS)
             else:
-                return dashscope.Generation.call(
-                    model='qwen-plus',
-                    prompt=prompt,
-                    result_format='text',
-                    parameters={
-                        'temperature': 0.7,
-                        'top_k': 50,
-                        'top_p': 0.9,
-                        'max_tokens': 2000,
-                        'repetition_penalty': 1.1,
-                        'seed': None,
-                        'incremental_output': False
-                    }
+                response = call_with_timeout(
+                    get_llm_client().call, AI_TIMEOUT, prompt, parameters or NON_STREAM_PARAMETERS
                 )
+                elapsed = time.perf_counter() - started
+                ai_breaker.record_success()
+                UPSTREAM_CALLS.inc(feature, 'call', 'ok')
+                UPSTREAM_SECONDS.observe(elapsed, feature, 'call')
+                record_upstream_usage(feature, response.usage, len(response.text))
+                add_trace('upstream', elapsed)
+                return response
         except Exception as e:
+            ai_breaker.record_failure()
+            UPSTREAM_CALLS.inc(feature, 'stream' if stream else 'call', 'timeout' if isinstance(e, CallTimeout) else 'error')
             print(f"AI调用失败 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
-            if attempt < max_retries - 1:
-                time.sleep(2 ** attempt)  # 指数退避
+            if not ai_breaker.allow():
+                # 熔断器已打开，立即降级
+                UPSTREAM_DEGRADED.inc(feature)
+                return get_vercel_preset_response(prompt)
+            if attempt < max_retries - 1 and retry_budget.try_spend():
+                UPSTREAM_RETRIES.inc(feature)
+                time.sleep(backoff_delay(attempt, AI_RETRY_BASE_DELAY, AI_RETRY_MAX_DELAY))  # 抖动退避
             else:
                 raise e
 
-def generate_stream(prompt):
-    """一个通用的流式生成器函数，只返回增量内容。"""
-    if not dashscope.api_key:
+def generate_stream(prompt, cache_key=None, parameters=None, finalize=None):
+    """一个通用的流式生成器函数，只返回增量内容。
+
+    传入cache_key时，完整生成成功后会把全文写入缓存；
+    传入finalize时缓存finalize(全文)的结果，返回空值则不缓存。
+    """
+    if not IS_VERCEL and LLM_BACKEND != 'mock' and not DASHSCOPE_API_KEY:
         yield "错误：服务器未配置API Key。"
         return
 
+    feature = prompt.feature
+    responses = None
     try:
-        responses = call_ai_with_retry(prompt, stream=True)
-
-        previous_content = ""
-        for resp in responses:
-            if resp.status_code == HTTPStatus.OK:
-                full_content = resp.output.text
-                # 计算并发送增量内容
-                incremental_content = full_content[len(previous_content):]
-                yield incremental_content
-                previous_content = full_content
-            else:
-                error_message = f"请求错误：code: {resp.code}, message: {resp.message}"
-                print(error_message)
-                yield error_message
-                break
+        parameters = parameters or STREAM_PARAMETERS
+        started = time.perf_counter()
+        responses = call_ai_with_retry(prompt, stream=True, parameters=parameters)
+        if isinstance(responses, str):
+            # 预设模式或熔断降级，直接返回完整文本
+            yield responses
+            return
+
+        # incremental_output=True时上游直接返回增量；否则返回累计全文，只按已发送长度取新增部分
+        incremental = parameters.get('incremental_output', False)
+        emitted_length = 0
+        emitted = []
+        usage = None
+        for chunk in responses:
+            usage = chunk.usage or usage  # 用量为累计值，取最后一次
+            incremental_content = chunk.text if incremental else chunk.text[emitted_length:]
+            if not incremental_content:
+                continue
+            if not emitted:
+                UPSTREAM_FIRST_CHUNK_SECONDS.observe(time.perf_counter() - started, feature)
+            emitted_length += len(incremental_content)
+            emitted.append(incremental_content)
+            yield incremental_content
+        ai_breaker.record_success()
+        UPSTREAM_CALLS.inc(feature, 'stream', 'ok')
+        UPSTREAM_SECONDS.observe(time.perf_counter() - started, feature, 'stream')
+        record_upstream_usage(feature, usage, emitted_length)
+        if cache_key and emitted:
+            result = ''.join(emitted)
+            if finalize:
+                result = finalize(result)
+            if result:
+                set_cache_result(cache_key, result)
+    except AdmissionRejected as e:
+        # 响应头已发出，无法再返回429，改为在流中提示
+        yield str(e)
     except Exception as e:
-        error_message = f"调用API时发生异常: {str(e)}"
+        ai_breaker.record_failure()
+        if responses is not None:
+            # 建立调用时的失败已在call_ai_with_retry中统计
+            UPSTREAM_CALLS.inc(feature, 'stream', 'error')
+        # 上游在流中返回的错误事件原样提示，其余为调用异常
+        error_message = str(e) if isinstance(e, LLMError) else f"调用API时发生异常: {str(e)}"
         print(error_message)
         yield error_message
+    finally:
+        # 客户端提前断开时关闭上游流，连接归还连接池
+        close = getattr(responses, 'close', None)
+        if close:
+            close()
+
+def get_response_text(response):
+    """统一处理响应文本获取"""
+    if isinstance(response, str):
+        # Vercel预设响应，直接是JSON字符串
+        return response
+    elif isinstance(response, Completion):
+        # 大模型客户端返回的生成结果
+        return response.text
+    else:
+        # 其他情况
+        return str(response)
+
+def extract_json_text(raw_text):
+    """从AI响应中提取并验证JSON，返回 (json字符串, 错误信息)"""
+    start_index = raw_text.find('{')
+    end_index = raw_text.rfind('}')
+
+    if start_index != -1 and end_index != -1 and start_index < end_index:
+        json_str = raw_text[start_index:end_index+1]
+        try:
+            # 验证JSON格式
+            json.loads(json_str)
+            return json_str, None
+        except json.JSONDecodeError:
+            # 如果提取的不是有效JSON，尝试直接使用原始文本
+            try:
+                json.loads(raw_text)
+                return raw_text, None
+            except:
+                return None, 'AI返回了格式错误的JSON，无法解析。'
+    else:
+        # 没有找到JSON结构，尝试直接解析原始文本
+        try:
+            json.loads(raw_text)
+            return raw_text, None
+        except:
+            return None, 'AI响应中不包含有效的JSON内容。'
+
+def apply_number_score(json_str, number):
+    """用规则评分引擎的价格和等级覆盖AI输出，保证同一尾号结果一致"""
+    scored = score_number(number) if number else None
+    if not scored:
+        return json_str
+    try:
+        result = json.loads(json_str)
+    except json.JSONDecodeError:
+        return json_str
+    if not isinstance(result, dict):
+        return json_str
+    if result.get('price') == scored['price'] and result.get('level') == scored['level']:
+        return json_str
+    result['price'] = scored['price']
+    result['level'] = scored['level']
+    return json.dumps(result, ensure_ascii=False)
+
+# 评估结果的字段表：字段名 -> 允许的类型
+EVALUATE_SCHEMA = {
+    'price': (str, int, float),
+    'level': str,
+    'suggestion': str,
+}
+
+def finalize_evaluation(raw_text, number=None):
+    """提取JSON、用规则评分覆盖价格和等级并按字段表校验，返回 (json字符串, 错误信息)"""
+    json_str, error = extract_json_text(raw_text)
+    if not json_str:
+        return None, error
+    json_str = apply_number_score(json_str, number)
+    error = validate_fields(json.loads(json_str), EVALUATE_SCHEMA)
+    if error:
+        return None, error
+    return json_str, None
+
+def run_evaluate(prompt, cache_key, number=None, refresh=False):
+    """调用AI完成号码评估并写入缓存，返回 (json字符串, 错误信息)；refresh=True时忽略已有缓存重新生成"""
+    # 合并等待期间可能已有其他请求写入缓存
+    cached_result = None if refresh else get_cached_result(cache_key, recheck=True)
+    if cached_result:
+        return cached_result, None
+
+    response = call_ai_with_retry(prompt, stream=False)
+    json_str, error = finalize_evaluation(get_response_text(response), number)
+    # 熔断降级得到的预设响应不写缓存，上游恢复后重新生成
+    degraded = not IS_VERCEL and isinstance(response, str)
+    if json_str and not degraded:
+        # 保存到缓存
+        set_cache_result(cache_key, json_str)
+    return json_str, error
+
+def stream_with_fanout(prompt, cache_key):
+    """相同cache_key的并发流式请求共享同一个上游流"""
+    return stream_fanout.subscribe(cache_key, lambda: generate_stream(prompt, cache_key))
+
+def format_sse_event(text, event_id, event=None):
+    """把一段文本编码为SSE事件，多行文本拆成多个data行"""
+    lines = [f'id: {event_id}']
+    if event:
+        lines.append(f'event: {event}')
+    lines.extend(f'data: {line}' for line in text.split('\n'))
+    return '\n'.join(lines) + '\n\n'
+
+def generate_sse(prompt, cache_key, resume_offset=0):
+    """SSE流式输出，事件ID为已发送的字符偏移量
+
+    客户端断线后带上Last-Event-ID重连：生成仍在进行时从合并流的缓冲区续传，
+    已完成时从缓存续传，都不会触发新的上游调用。
+    """
+    yield 'retry: 2000\n\n'
+    cached_result = get_cached_result(cache_key)
+    if cached_result is None and resume_offset and not stream_fanout.is_active(cache_key):
+        # 原来的生成已不可用，通知客户端清空后重新生成
+        yield format_sse_event('', 0, event='reset')
+        resume_offset = 0
+    if cached_result is not None:
+        if resume_offset > len(cached_result):
+            yield format_sse_event('', 0, event='reset')
+            resume_offset = 0
+        if resume_offset < len(cached_result):
+            yield format_sse_event(cached_result[resume_offset:], len(cached_result))
+        yield format_sse_event('', len(cached_result), event='done')
+        return
+
+    position = 0
+    for chunk in stream_with_fanout(prompt, cache_key):
+        end = position + len(chunk)
+        if end > resume_offset:
+            yield format_sse_event(chunk[max(0, resume_offset - position):], end)
+        position = end
+    yield format_sse_event('', position, event='done')
+
+def wants_sse():
+    """客户端是否请求SSE格式"""
+    return 'text/event-stream' in request.headers.get('Accept', '') or request.args.get('mode') == 'sse'
+
+def sse_response(events):
+    response = Response(stream_with_context(track_first_chunk(events)), content_type='text/event-stream; charset=utf-8')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return compress_response(response)
+
+def streaming_response(prompt, cache_key):
+    """按Accept头返回纯文本流或可续传的SSE流"""
+    if wants_sse():
+        last_event_id = request.headers.get('Last-Event-ID', '')
+        resume_offset = int(last_event_id) if last_event_id.isdigit() else 0
+        return sse_response(generate_sse(prompt, cache_key, resume_offset))
+
+    cached_result = get_cached_result(cache_key)
+    if cached_result:
+        return compress_response(Response(cached_result, content_type='text/plain; charset=utf-8'))
+
+    return compress_response(Response(
+        stream_with_context(track_first_chunk(stream_with_fanout(prompt, cache_key))),
+        content_type='text/plain; charset=utf-8'
+    ))
+
+def format_field_event(name, value, event_id):
+    return format_sse_event(json.dumps({'name': name, 'value': value}, ensure_ascii=False), event_id, event='field')
+
+def generate_evaluate_sse(prompt, cache_key, number=None, result=None):
+    """/evaluate的SSE输出：每个字段一完整就发送field事件，结束时发送校验后的完整result事件
+
+    规则评分引擎给出的价格和等级最先发送，不等待上游；已有结果（缓存或预设）时直接逐字段发送。
+    """
+    yield 'retry: 2000\n\n'
+    if result is None:
+        result = get_cached_result(cache_key)
+    sent = 0
+    if result is not None:
+        for name, value in json.loads(result).items():
+            sent += 1
+            yield format_field_event(name, value, sent)
+        yield format_sse_event(result, sent, event='result')
+        yield format_sse_event('', sent, event='done')
+        return
+
+    scored = score_number(number) if number else None
+    if scored:
+        for name in ('price', 'level'):
+            sent += 1
+            yield format_field_event(name, scored[name], sent)
+
+    parser = JSONFieldStream()
+    chunks = []
+    source = lambda: generate_stream(
+        prompt, cache_key, EVALUATE_STREAM_PARAMETERS,
+        finalize=lambda text: finalize_evaluation(text, number)[0]
+    )
+    for chunk in stream_fanout.subscribe(cache_key, source):
+        chunks.append(chunk)
+        for name, value in parser.feed(chunk):
+            if scored and name in ('price', 'level'):
+                continue  # 以规则评分为准，已发送
+            sent += 1
+            yield format_field_event(name, value, sent)
+
+    json_str, error = finalize_evaluation(''.join(chunks), number)
+    if error:
+        yield format_sse_event(json.dumps({'error': error}, ensure_ascii=False), sent, event='error')
+    else:
+        yield format_sse_event(json_str, sent, event='result')
+    yield format_sse_event('', sent, event='done')
+
+def build_evaluate_prompt(number):
+    """构造号码评估提示词
+
+    能识别为四位尾号时，价格和等级由规则评分引擎给出，大模型只负责撰写解读文字。
+    """
+    scored = score_number(number)
+    if scored:
+        features = '、'.join(describe_number(number)) or '无明显特殊形态'
+        price_rule = f"price字段：固定为\"{scored['price']}\"（由评估系统给出，不要修改）"
+        level_rule = f"level字段：固定为\"{scored['level']}\"（由评估系统给出，不要修改）"
+        pricing_rule = f"号码特征：{features}，解读内容要与上述估值和等级相呼应"
+    else:
+        price_rule = "price字段：根据号码特殊性给出3000-8000的价格（整数字符串）"
+        level_rule = "level字段：选择适合的等级（普通级/优质级/稀有级/典藏级/传说级）"
+        pricing_rule = "绝对不要输出相同的价格，必须根据号码特征有差异化定价"
+    return PROMPTS['evaluate'].render(
+        {'number': number},
+        number=number, price_rule=price_rule, level_rule=level_rule, pricing_rule=pricing_rule
+    )
+
+def build_fortune_prompt(bazi):
+    """构造生辰解读提示词：只把四柱交给模型，同一八字的不同生日共享提示词和缓存"""
+    return PROMPTS['fortune'].render(bazi.key(), bazi=bazi.describe())
+
+def build_name_analysis_prompt(name):
+    """构造姓名解读提示词：能在本地算出姓名特征时只把特征交给模型，缓存键也取自特征；
+    否则（索引未构建、生僻字、非中文姓名）回退为把姓名原文交给模型分析。
+    汉字索引需手动构建（见char_index.py），默认部署中不存在，始终走回退路径"""
+    features = analyze_name(name)
+    if features is None:
+        return PROMPTS['name_analysis'].render({'name': name}, profile=f'"{name}"（请结合字音、字形自行分析）')
+    return PROMPTS['name_analysis'].render(features.key(), profile=features.describe())
+
+# 流式输出攒批：把细碎的token片段合并后再发送，默认50ms或256字节刷新一次
+STREAM_FLUSH_INTERVAL = float(os.getenv('STREAM_FLUSH_INTERVAL', '0.05'))
+STREAM_FLUSH_BYTES = int(os.getenv('STREAM_FLUSH_BYTES', '256'))
+
+# 请求合并：相同key的并发请求共享一次上游调用
+evaluate_flight = SingleFlight()
+stream_fanout = StreamFanout(flush_interval=STREAM_FLUSH_INTERVAL, flush_bytes=STREAM_FLUSH_BYTES)
+
+def get_evaluate_preset(number):
+    """预设模式下直接返回语料库中预先生成的评估结果（UTF-8字节）；非预设模式或语料库未构建时返回None"""
+    return get_number_preset_bytes(number) if IS_VERCEL else None
 
 @app.route('/evaluate', methods=['POST'])
 def evaluate():
@@ -131,84 +669,117 @@ def evaluate():
     except Exception as e:
         return jsonify({'error': f'解析JSON请求失败: {str(e)}'}), 400
 
-    if not number:
+    if number is None or number == '':
         return jsonify({'error': 'JSON请求体中必须包含 \'number\' 字段。'}), 400
+    # 数字或带空白的号码统一为字符串，预设、语料库、评分和缓存key都按同一个值查找
+    number = clean_number(number)
+    if number is None:
+        return jsonify({'error': '号码只能包含数字。'}), 400
+    record_evaluation_request(number)
+
+    preset = get_evaluate_preset(number)
+    if preset is not None:
+        if wants_sse():
+            return sse_response(generate_evaluate_sse(None, None, result=preset.decode('utf-8')))
+        return Response(preset, content_type='application/json')
+
+    prompt = build_evaluate_prompt(number)
+    cache_key = get_cache_key("evaluate", number)
+    if wants_sse():
+        # 流式模式：字段逐个下发，首个有效字节不必等待整段生成
+        return sse_response(generate_evaluate_sse(prompt, cache_key, number))
 
-    prompt = f"""
-作为专业的数字文化研究专家和趣味评估师，请分析手机尾号：{number}
+    # 检查缓存
+    cached_result = get_cached_result(cache_key)
+    if cached_result:
+        return Response(cached_result, content_type='application/json')
 
-**角色设定**：你是红姐数字能量站的首席分析师，擅长用现代语言解读传统数字文化，语言风格要生动有趣、通俗易懂。
+    try:
+        # 并发的相同请求只触发一次上游调用
+        (json_str, error), _ = evaluate_flight.do(cache_key, lambda: run_evaluate(prompt, cache_key, number))
+        if error:
+            return jsonify({'error': error}), 500
+        return Response(json_str, content_type='application/json')
+    except AdmissionRejected as e:
+        return too_many_requests(e.retry_after, str(e))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-**分析框架**（请严格按此顺序分析）：
-1. **谐音寓意**：分析数字的中文谐音含义，要有创意且积极正面
-2. **数字能量**：从传统数字学角度解读其能量属性
-3. **市场价值**：基于稀有度和吉祥程度评估市场价值
-4. **运势影响**：说明对主人可能带来的积极影响
 
-**重要约束条件**：
-- 必须输出标准JSON格式
-- price字段：根据号码特殊性给出3000-8000的价格（整数字符串）
-- level字段：选择适合的等级（普通级/优质级/稀有级/典藏级/传说级）
-- suggestion字段：200-300字的专业建议，要有具体的文化内涵解释
+# 批量评估配置
+BATCH_MAX_NUMBERS = int(os.getenv('BATCH_MAX_NUMBERS', '5000'))
+BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', '8'))
+BATCH_RATE_LIMIT = float(os.getenv('BATCH_RATE_LIMIT', '5'))  # 每秒最多发起的上游调用数
+batch_rate_limiter = TokenBucket(BATCH_RATE_LIMIT)
 
-**特别要求**：
-- 绝对不要输出相同的价格，必须根据号码特征有差异化定价
-- 语言要符合中文表达习惯，避免翻译腔
-- 内容要富有文化底蕴但通俗易懂
-- 只返回JSON，不要任何额外文字
+def evaluate_for_batch(number, cache_key):
+    """批量评估中的单个号码：限速后走与/evaluate相同的合并、提取和缓存逻辑"""
+    batch_rate_limiter.acquire()
+    (json_str, error), _ = evaluate_flight.do(cache_key, lambda: run_evaluate(build_evaluate_prompt(number), cache_key, number))
+    return json_str, error
 
-请开始分析尾号：{number}
-"""
-    # 检查缓存
-    cache_key = get_cache_key("evaluate", number)
-    cached_result = get_cached_result(cache_key)
-    if cached_result:
-        return Response(cached_result, content_type='application/json')
+def batch_result_line(number, json_str=None, error=None, cached=False):
+    """生成一行NDJSON结果"""
+    if error:
+        item = {'number': number, 'error': error}
+    else:
+        item = {'number': number, 'cached': cached, 'result': json.loads(json_str)}
+    return json.dumps(item, ensure_ascii=False) + '\n'
 
+@app.route('/evaluate_batch', methods=['POST'])
+def evaluate_batch():
+    """批量评估手机尾号，按完成顺序以NDJSON流式返回"""
     try:
-        response = call_ai_with_retry(prompt, stream=False)
-
-        # 统一处理响应文本获取
-        if isinstance(response, str):
-            # Vercel预设响应，直接是JSON字符串
-            raw_text = response
-        elif hasattr(response, 'status_code') and response.status_code == HTTPStatus.OK:
-            # dashscope API响应
-            raw_text = response.output.text
-        else:
-            # 其他情况
-            raw_text = str(response)
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': '请求体必须是有效的JSON。'}), 400
+        numbers = data.get('numbers')
+    except Exception as e:
+        return jsonify({'error': f'解析JSON请求失败: {str(e)}'}), 400
 
-        # 处理JSON提取
-        start_index = raw_text.find('{')
-        end_index = raw_text.rfind('}')
+    if not isinstance(numbers, list) or not numbers:
+        return jsonify({'error': 'JSON请求体中必须包含非空的 \'numbers\' 列表。'}), 400
+    if len(numbers) > BATCH_MAX_NUMBERS:
+        return jsonify({'error': f'单次最多评估{BATCH_MAX_NUMBERS}个号码。'}), 400
+
+    invalid = next((i for i, number in enumerate(numbers) if clean_number(number) is None), None)
+    if invalid is not None:
+        return jsonify({'error': f'第{invalid + 1}个号码无效，号码只能包含数字。'}), 400
+
+    # 去重并保持原有顺序
+    unique_numbers = list(dict.fromkeys(clean_number(n) for n in numbers))
+
+    def generate():
+        misses = []
+        # 缓存命中的号码直接返回
+        for number in unique_numbers:
+            cache_key = get_cache_key("evaluate", number)
+            cached_result = get_cached_result(cache_key)
+            if cached_result:
+                yield batch_result_line(number, cached_result, cached=True)
+            else:
+                misses.append((number, cache_key))
+        if not misses:
+            return
 
-        if start_index != -1 and end_index != -1 and start_index < end_index:
-            json_str = raw_text[start_index:end_index+1]
-            try:
-                # 验证JSON格式
-                json.loads(json_str)
-                # 保存到缓存
-                set_cache_result(cache_key, json_str)
-                return Response(json_str, content_type='application/json')
-            except json.JSONDecodeError:
-                # 如果提取的不是有效JSON，尝试直接使用原始文本
+        # 未命中的号码并发调用上游，按完成顺序返回
+        executor = ThreadPoolExecutor(max_workers=min(BATCH_MAX_WORKERS, len(misses)))
+        futures = {executor.submit(evaluate_for_batch, number, cache_key): number for number, cache_key in misses}
+        try:
+            for future in as_completed(futures):
+                number = futures[future]
                 try:
-                    json.loads(raw_text)
-                    set_cache_result(cache_key, raw_text)
-                    return Response(raw_text, content_type='application/json')
-                except:
-                    return jsonify({'error': 'AI返回了格式错误的JSON，无法解析。'}), 500
-        else:
-            # 没有找到JSON结构，尝试直接解析原始文本
-            try:
-                json.loads(raw_text)
-                set_cache_result(cache_key, raw_text)
-                return Response(raw_text, content_type='application/json')
-            except:
-                return jsonify({'error': 'AI响应中不包含有效的JSON内容。'}), 500
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+                    json_str, error = future.result()
+                    yield batch_result_line(number, json_str, error)
+                except Exception as e:
+                    yield batch_result_line(number, error=str(e))
+        finally:
+            # 客户端断开时取消尚未开始的任务
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    return Response(stream_with_context(track_first_chunk(generate())), content_type='application/x-ndjson; charset=utf-8')
 
 
 @app.route('/fortune', methods=['POST'])
@@ -218,36 +789,21 @@ def fortune():
         if not data:
             return jsonify({'error': '请求体必须是有效的JSON。'}), 400
         birthdate = data.get('birthdate')
+        birthtime = data.get('birthtime')
     except Exception as e:
         return jsonify({'error': f'解析JSON请求失败: {str(e)}'}), 400
 
     if not birthdate:
         return jsonify({'error': 'JSON请求体中必须包含 \'birthdate\' 字段。'}), 400
 
-    prompt = f"""
-**角色**：你是红姐数字能量站的命理文化专家，专门从传统文化角度解读生辰信息。
-
-**任务**：根据生日 {birthdate} 进行传统文化分析
-
-**分析要求**：
-1. **性格特质**：从出生月份、季节等角度分析性格倾向
-2. **天赋优势**：分析可能具备的天然优势和潜能
-3. **情感特征**：解读在人际关系中的表现特点
-4. **事业方向**：建议适合的发展领域和方式
-5. **开运建议**：给出未来一年的吉祥提醒
-
-**输出规范**：
-- 语言要温暖亲切，如红姐亲自解读
-- 内容要具体实用，不空泛
-- 长度控制在350-450字
-- 要体现中华传统文化底蕴
-- 语气积极正面，给人希望和动力
-
-**重要声明**：请在开头说明这是"传统文化娱乐解读，仅供参考"
+    try:
+        bazi = parse_birth(birthdate, birthtime)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-现在开始为生日{birthdate}的朋友进行解读：
-"""
-    return Response(stream_with_context(generate_stream(prompt)), content_type='text/plain; charset=utf-8')
+    prompt = build_fortune_prompt(bazi)
+    cache_key = get_cache_key("fortune", bazi.key())
+    return streaming_response(prompt, cache_key)
 
 @app.route('/name_analysis', methods=['POST'])
 def name_analysis():
@@ -262,33 +818,9 @@ def name_analysis():
     if not name:
         return jsonify({'error': 'JSON请求体中必须包含 \'name\' 字段。'}), 400
 
-    prompt = f"""
-**角色**：你是红姐数字能量站的汉字文化专家，专注传统姓名文化解读。
-
-**任务**：为姓名"{name}"进行传统文化解析
-
-**解读框架**：
-1. **字音解析**：分析姓名的音韵特点和谐音寓意
-2. **字形文化**：解读汉字结构蕴含的文化内涵
-3. **五行能量**：从传统五行角度分析姓名能量
-4. **性格映射**：推测可能的性格特质和天赋
-5. **人生暗示**：分析姓名对人生路径的积极指引
-
-**表达风格**：
-- 用红姐温暖亲切的语调
-- 语言要生动有趣，避免学术化
-- 多用"可能"、"倾向于"等谦逊表述
-- 内容积极正面，给人启发
-- 长度控制在420-520字
-
-**合规要求**：
-- 开头必须声明"这是传统文化娱乐解读，仅供参考"
-- 强调姓名只是文化符号，人生靠自己努力
-- 避免任何绝对化的预测表述
-
-现在开始为"{name}"进行姓名文化解读：
-"""
-    return Response(stream_with_context(generate_stream(prompt)), content_type='text/plain; charset=utf-8')
+    prompt = build_name_analysis_prompt(name)
+    cache_key = get_cache_key("name_analysis", prompt.inputs)
+    return streaming_response(prompt, cache_key)
 
 @app.route('/lucky_draw', methods=['POST'])
 def lucky_draw():
@@ -300,38 +832,38 @@ def lucky_draw():
     except Exception as e:
         return jsonify({'error': f'解析JSON请求失败: {str(e)}'}), 400
 
-    if not number:
+    if not number or not isinstance(number, str):
         return jsonify({'error': 'JSON请求体中必须包含 \'number\' 字段。'}), 400
 
     # 基于号码计算"幸运值"（纯娱乐）
-    import hashlib
-    hash_value = int(hashlib.md5(number.encode()).hexdigest()[:8], 16)
-    luck_score = (hash_value % 100) + 1
-
-    prizes = [
-        {"name": "超级幸运星", "probability": 5, "color": "#ff6b6b"},
-        {"name": "大吉大利", "probability": 10, "color": "#4ecdc4"},
-        {"name": "财运亨通", "probability": 15, "color": "#45b7d1"},
-        {"name": "事业有成", "probability": 20, "color": "#96ceb4"},
-        {"name": "平安喜乐", "probability": 25, "color": "#feca57"},
-        {"name": "好运连连", "probability": 25, "color": "#ff9ff3"}
-    ]
-
-    # 根据luck_score确定奖项
-    cumulative = 0
-    selected_prize = prizes[-1]  # 默认最后一个
-    for prize in prizes:
-        cumulative += prize["probability"]
-        if luck_score <= cumulative:
-            selected_prize = prize
-            break
+    return jsonify(draw(number))
 
-    return jsonify({
-        "prize": selected_prize["name"],
-        "color": selected_prize["color"],
-        "score": luck_score,
-        "message": f"恭喜！根据您的号码{number}，获得了【{selected_prize['name']}】！这是传统文化的趣味解读，愿好运伴随您！"
-    })
+LUCKY_DRAW_BATCH_MAX = int(os.getenv('LUCKY_DRAW_BATCH_MAX', '10000'))
+
+@app.route('/lucky_draw_batch', methods=['POST'])
+def lucky_draw_batch():
+    """批量抽奖（直播活动为整场观众抽奖）：results按输入顺序排列，每一项与/lucky_draw的响应完全相同"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': '请求体必须是有效的JSON。'}), 400
+        numbers = data.get('numbers')
+    except Exception as e:
+        return jsonify({'error': f'解析JSON请求失败: {str(e)}'}), 400
+
+    if not isinstance(numbers, list) or not numbers:
+        return jsonify({'error': 'JSON请求体中必须包含非空的 \'numbers\' 列表。'}), 400
+    if len(numbers) > LUCKY_DRAW_BATCH_MAX:
+        return jsonify({'error': f'单次最多抽奖{LUCKY_DRAW_BATCH_MAX}个号码。'}), 400
+    invalid = next((i for i, number in enumerate(numbers) if not number or not isinstance(number, str)), None)
+    if invalid is not None:
+        return jsonify({'error': f'第{invalid + 1}个号码无效，号码必须是非空字符串。'}), 400
+
+    results = draw_many(numbers)
+    counts = dict.fromkeys((prize['name'] for prize in PRIZES), 0)
+    for result in results:
+        counts[result['prize']] += 1
+    return jsonify({'results': results, 'counts': counts})
 
 @app.route('/generate_share_card', methods=['POST'])
 def generate_share_card():
@@ -346,90 +878,13 @@ def generate_share_card():
         return jsonify({'error': f'解析JSON请求失败: {str(e)}'}), 400
 
     try:
-        # 优化：使用更小的图像尺寸提高性能
-        width, height = 400, 600
-
-        # 创建分享卡片图像（优化版本）
-        image = Image.new('RGB', (width, height), '#6a11cb')
-        draw = ImageDraw.Draw(image)
-
-        # 简化渐变背景绘制（减少循环次数）
-        gradient_steps = 50  # 减少渐变步数提高性能
-        step_height = height // gradient_steps
-
-        for i in range(gradient_steps):
-            y = i * step_height
-            ratio = i / gradient_steps
-            r = int(106 * (1 - ratio) + 37 * ratio)
-            g = int(17 * (1 - ratio) + 117 * ratio)
-            b = int(203 * (1 - ratio) + 252 * ratio)
-            color = (r, g, b)
-            draw.rectangle([(0, y), (width, y + step_height)], fill=color)
-
-        # 优化字体加载（使用默认字体提高性能）
-        title_font = ImageFont.load_default()
-        subtitle_font = ImageFont.load_default()
-        content_font = ImageFont.load_default()
-
-        # 绘制标题
-        title = "红姐数字能量站"
-        title_bbox = draw.textbbox((0, 0), title, font=title_font)
-        title_width = title_bbox[2] - title_bbox[0]
-        draw.text(((width - title_width) // 2, 50), title, fill='white', font=title_font)
-
-        # 根据类型绘制不同内容
-        if card_type == 'number':
-            # 手机号码估值卡片
-            number = content.get('number', '****')
-            price = content.get('price', '未知')
-            level = content.get('level', '普通级')
-
-            # 绘制号码
-            number_text = f"手机尾号: {number}"
-            number_bbox = draw.textbbox((0, 0), number_text, font=subtitle_font)
-            number_width = number_bbox[2] - number_bbox[0]
-            draw.text(((width - number_width) // 2, 150), number_text, fill='white', font=subtitle_font)
-
-            # 绘制价格
-            price_text = f"估值: ¥{price}"
-            price_bbox = draw.textbbox((0, 0), price_text, font=title_font)
-            price_width = price_bbox[2] - price_bbox[0]
-            draw.text(((width - price_width) // 2, 250), price_text, fill='#ffd700', font=title_font)
-
-            # 绘制等级
-            level_text = f"等级: {level}"
-            level_bbox = draw.textbbox((0, 0), level_text, font=subtitle_font)
-            level_width = level_bbox[2] - level_bbox[0]
-            draw.text(((width - level_width) // 2, 350), level_text, fill='white', font=subtitle_font)
-
-        elif card_type == 'lucky':
-            # 幸运转盘卡片
-            prize = content.get('prize', '好运连连')
-            score = content.get('score', 50)
-
-            # 绘制奖项
-            prize_text = f"🎉 {prize} 🎉"
-            prize_bbox = draw.textbbox((0, 0), prize_text, font=title_font)
-            prize_width = prize_bbox[2] - prize_bbox[0]
-            draw.text(((width - prize_width) // 2, 200), prize_text, fill='#ffd700', font=title_font)
-
-            # 绘制分数
-            score_text = f"幸运值: {score}"
-            score_bbox = draw.textbbox((0, 0), score_text, font=subtitle_font)
-            score_width = score_bbox[2] - score_bbox[0]
-            draw.text(((width - score_width) // 2, 300), score_text, fill='white', font=subtitle_font)
-
-        # 绘制底部文字
-        footer_text = "仅供传统文化娱乐参考"
-        footer_bbox = draw.textbbox((0, 0), footer_text, font=content_font)
-        footer_width = footer_bbox[2] - footer_bbox[0]
-        draw.text(((width - footer_width) // 2, height - 80), footer_text, fill='white', font=content_font)
-
-        # 优化图片压缩输出
-        buffered = io.BytesIO()
-        image.save(buffered, format="JPEG", quality=85, optimize=True)  # 使用JPEG格式和85%质量
-        img_base64 = base64.b64encode(buffered.getvalue()).decode()
+        jpeg_bytes = render_share_card(card_type, content)
+
+        # 二进制模式：直接返回图片，避免base64带来的约33%体积膨胀
+        if request.args.get('format') == 'jpeg' or data.get('format') == 'jpeg':
+            return Response(jpeg_bytes, mimetype='image/jpeg')
 
+        img_base64 = base64.b64encode(jpeg_bytes).decode()
         return jsonify({
             'image': f'data:image/jpeg;base64,{img_base64}',
             'message': '分享卡片生成成功！'
@@ -438,52 +893,209 @@ def generate_share_card():
     except Exception as e:
         return jsonify({'error': f'生成分享卡片失败: {str(e)}'}), 500
 
-# 排行榜数据持久化存储
-import os
-import json
-
-# Vercel适配：使用内存存储代替文件存储
-# 在无服务器环境中无法进行持久化文件写入
-rankings = {
-    'top_numbers': [
-        {'number': '8888', 'price': '7888', 'level': '传说级', 'timestamp': '2024-01-01'},
-        {'number': '6666', 'price': '6666', 'level': '稀有级', 'timestamp': '2024-01-01'},
-        {'number': '1314', 'price': '5200', 'level': '典藏级', 'timestamp': '2024-01-01'},
-        {'number': '0520', 'price': '4888', 'level': '经典级', 'timestamp': '2024-01-01'},
-        {'number': '9999', 'price': '7999', 'level': '传说级', 'timestamp': '2024-01-01'},
-    ],
-    'recent_evaluations': []
-}
-
-# 简单的内存缓存
-cache = {}
-CACHE_DURATION = 300  # 5分钟缓存
+# 排行榜存储
+# 默认使用进程内存储（Vercel等无服务器环境无法持久化写文件）；
+# 配置RANKINGS_SQLITE_PATH后同一主机的所有worker共享一份排行榜
+RANKINGS_SQLITE_PATH = os.getenv('RANKINGS_SQLITE_PATH')
+ranking_store = MemoryRankingStore()
+if RANKINGS_SQLITE_PATH:
+    try:
+        ranking_store = SQLiteRankingStore(RANKINGS_SQLITE_PATH)
+        print(f"已启用共享SQLite排行榜: {RANKINGS_SQLITE_PATH}")
+    except Exception as e:
+        print(f"共享SQLite排行榜初始化失败，使用内存存储: {str(e)}")
+
+# 有界LRU+TTL内存缓存（条目数和内存上限可通过环境变量配置）
+CACHE_DURATION = int(os.getenv('CACHE_DURATION', '300'))  # 默认5分钟缓存
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '2048'))
+CACHE_MAX_BYTES = int(os.getenv('CACHE_MAX_BYTES', str(32 * 1024 * 1024)))  # 默认32MB
+# 可选：同一主机多worker共享的SQLite缓存文件，例如 /tmp/hongjie_cache.db
+CACHE_SQLITE_PATH = os.getenv('CACHE_SQLITE_PATH')
+CACHE_SQLITE_MAX_ENTRIES = int(os.getenv('CACHE_SQLITE_MAX_ENTRIES', '100000'))
+
+cache = LRUCache(max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES, ttl=CACHE_DURATION)
+if CACHE_SQLITE_PATH:
+    try:
+        cache = TieredCache(cache, SQLiteCache(CACHE_SQLITE_PATH, max_entries=CACHE_SQLITE_MAX_ENTRIES, ttl=CACHE_DURATION))
+        print(f"已启用共享SQLite缓存: {CACHE_SQLITE_PATH}")
+    except Exception as e:
+        print(f"共享SQLite缓存初始化失败，仅使用内存缓存: {str(e)}")
 
 def get_cache_key(prefix, data):
-    """生成缓存键"""
-    return f"{prefix}:{hash(str(data))}"
-
-def get_cached_result(cache_key):
-    """获取缓存结果"""
-    if cache_key in cache:
-        result, timestamp = cache[cache_key]
-        if time.time() - timestamp < CACHE_DURATION:
-            return result
-        else:
-            del cache[cache_key]
-    return None
+    """生成缓存键（内容摘要 + 提示词模板版本 + 模型参数，跨进程稳定）"""
+    params = NON_STREAM_PARAMETERS if prefix == 'evaluate' else STREAM_PARAMETERS
+    return make_cache_key(prefix, data, version=prompt_version(prefix), params={'model': AI_MODEL, **params})
+
+def get_cached_result(cache_key, recheck=False):
+    """获取缓存结果；recheck=True表示合并等待后的复查，不计入命中率"""
+    started = time.perf_counter()
+    result = cache.get(cache_key)
+    if not recheck:
+        CACHE_REQUESTS.inc(cache_key.split(':', 1)[0], 'miss' if result is None else 'hit')
+        add_trace('cache', time.perf_counter() - started)
+    return result
 
 def set_cache_result(cache_key, result):
     """设置缓存结果"""
-    cache[cache_key] = (result, time.time())
+    cache.set(cache_key, result)
+
+gauge_func('cache_entries', 'AI结果缓存条目数（进程内）', lambda: cache.stats()['entries'])
+gauge_func('cache_bytes', 'AI结果缓存占用字节数（进程内）', lambda: cache.stats()['bytes'])
+gauge_func('dashscope_breaker_open', '熔断器是否处于打开状态', lambda: 1 if ai_breaker.state == 'open' else 0)
+gauge_func('stream_fanout_in_flight', '正在进行的合并上游流数量', lambda: stream_fanout.in_flight())
+if upstream_limiter is not None:
+    gauge_func('upstream_in_flight', '占用并发名额的上游调用数', lambda: upstream_limiter.in_flight)
+    gauge_func('upstream_queue_depth', '排队等待上游并发名额的请求数', lambda: upstream_limiter.queued)
+if client_rate_limiter is not None:
+    gauge_func('rate_limiter_clients', '限速表中跟踪的客户端数', lambda: len(client_rate_limiter))
+
+# /evaluate热门号码缓存预热：按请求频率统计热门号码，连同固定预热号码和排行榜最近评估的号码，
+# 在缓存过期前提前刷新；预设模式下不调用上游，无需预热。
+# 预热会主动产生上游调用，默认关闭：多worker/多实例部署时每个进程都会各自预热同一批号码，
+# 应只在一个进程上设置CACHE_WARMER=1
+CACHE_WARMER_ENABLED = not IS_VERCEL and os.getenv('CACHE_WARMER', '0').lower() in ('1', 'true', 'yes')
+CACHE_WARM_INTERVAL = float(os.getenv('CACHE_WARM_INTERVAL', '30'))
+CACHE_WARM_REFRESH_AHEAD = float(os.getenv('CACHE_WARM_REFRESH_AHEAD', str(max(30, CACHE_DURATION // 5))))
+if CACHE_WARM_REFRESH_AHEAD >= CACHE_DURATION:
+    # 提前量不小于缓存有效期时，每个条目刚写入就被视为即将过期，预热会不停重复刷新
+    print(f"CACHE_WARM_REFRESH_AHEAD({CACHE_WARM_REFRESH_AHEAD:g}s)不小于CACHE_DURATION({CACHE_DURATION}s)，改为{CACHE_DURATION / 2:g}s")
+    CACHE_WARM_REFRESH_AHEAD = CACHE_DURATION / 2
+CACHE_WARM_TOP_N = int(os.getenv('CACHE_WARM_TOP_N', '20'))
+CACHE_WARM_MAX_WORKERS = int(os.getenv('CACHE_WARM_MAX_WORKERS', '2'))
+CACHE_WARM_RATE = float(os.getenv('CACHE_WARM_RATE', '1'))  # 每秒最多发起的预热调用数
+CACHE_WARM_RECENT = int(os.getenv('CACHE_WARM_RECENT', '10'))  # 同时保持排行榜最近评估的号码
+CACHE_WARM_SEED_NUMBERS = [
+    number.strip() for number in os.getenv('CACHE_WARM_SEED_NUMBERS', '8888,6666,1314,0520').split(',') if number.strip()
+]
+# 未配置令牌时 /cache/warm 只允许本机调用
+CACHE_WARM_TOKEN = os.getenv('CACHE_WARM_TOKEN')
+
+def refresh_evaluation(number):
+    """预热：重新生成号码的评估结果并写入缓存（不复用即将过期的旧结果）"""
+    cache_key = get_cache_key("evaluate", number)
+    evaluate_flight.do(
+        cache_key, lambda: run_evaluate(build_evaluate_prompt(number), cache_key, number, refresh=True)
+    )
+    # 降级的预设响应不写缓存，以缓存是否已刷新为准
+    refreshed = cache.ttl_remaining(cache_key) > CACHE_WARM_REFRESH_AHEAD
+    CACHE_WARM_REFRESHES.inc('ok' if refreshed else 'failed')
+    return refreshed
+
+def upstream_has_capacity():
+    """上游未熔断且并发占用不到一半时才预热，不与用户请求争抢名额"""
+    if ai_breaker.state == 'open':
+        return False
+    if upstream_limiter is None:
+        return True
+    return not upstream_limiter.queued and upstream_limiter.in_flight < max(1, upstream_limiter.max_in_flight // 2)
+
+cache_warmer = None
+if CACHE_WARMER_ENABLED:
+    cache_warmer = CacheWarmer(
+        refresh=refresh_evaluation,
+        ttl_remaining=lambda number: cache.ttl_remaining(get_cache_key("evaluate", number)),
+        candidates=lambda: CACHE_WARM_SEED_NUMBERS + ranking_store.recent_numbers(CACHE_WARM_RECENT),
+        has_capacity=upstream_has_capacity,
+        interval=CACHE_WARM_INTERVAL,
+        refresh_ahead=CACHE_WARM_REFRESH_AHEAD,
+        top_n=CACHE_WARM_TOP_N,
+        max_workers=CACHE_WARM_MAX_WORKERS,
+        rate=CACHE_WARM_RATE,
+    ).start()
+    gauge_func('cache_warmer_pending', '排队等待预热的号码数', lambda: cache_warmer.pending)
+    gauge_func('cache_warmer_tracked', '热门统计中跟踪的号码数', lambda: len(cache_warmer.sketch))
+
+def record_evaluation_request(number):
+    if cache_warmer is not None and isinstance(number, str):
+        cache_warmer.record(number)
+
+def bearer_token_matches(token):
+    """校验 Authorization: Bearer <令牌>；按字节做定长比较，非ASCII的请求头也只会校验失败而不是抛异常"""
+    provided = request.headers.get('Authorization', '').encode('utf-8')
+    return hmac.compare_digest(provided, f'Bearer {token}'.encode('utf-8'))
+
+def is_direct_loopback_request():
+    """本机直接发起的请求：只看连接地址，不信任任何转发头；
+    经同机反向代理转发的外部请求连接地址也是本机，因此带转发头的一律不算"""
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return False
+    return not any(request.headers.get(name) for name in REAL_IP_HEADERS + ('X-Forwarded-For', 'Forwarded'))
+
+@app.route('/cache/warm', methods=['GET', 'POST'])
+def cache_warm():
+    """直播前批量预热：POST号码列表排队刷新（keep_warm秒内持续保持热度），GET查看预热状态和热门号码"""
+    if CACHE_WARM_TOKEN:
+        if not bearer_token_matches(CACHE_WARM_TOKEN):
+            return jsonify({'error': '未授权访问预热接口。'}), 401
+    elif not is_direct_loopback_request():
+        return jsonify({'error': '未配置CACHE_WARM_TOKEN时只允许本机直接调用预热接口。'}), 403
+    if cache_warmer is None:
+        return jsonify({'error': '缓存预热未启用（预设模式或未设置CACHE_WARMER=1）。'}), 503
+    if request.method == 'GET':
+        # 未启用共享缓存时预热结果只写入处理本次请求的worker的进程内缓存
+        return jsonify({**cache_warmer.stats(), 'shared_cache': isinstance(cache, TieredCache)})
+
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({'error': '请求体必须是有效的JSON。'}), 400
+        numbers = data.get('numbers')
+        keep_warm = float(data.get('keep_warm') or 0)
+    except Exception as e:
+        return jsonify({'error': f'解析JSON请求失败: {str(e)}'}), 400
+
+    if not isinstance(numbers, list) or not numbers:
+        return jsonify({'error': 'JSON请求体中必须包含非空的 \'numbers\' 列表。'}), 400
+    if len(numbers) > BATCH_MAX_NUMBERS:
+        return jsonify({'error': f'单次最多预热{BATCH_MAX_NUMBERS}个号码。'}), 400
+    invalid = next((i for i, number in enumerate(numbers) if clean_number(number) is None), None)
+    if invalid is not None:
+        return jsonify({'error': f'第{invalid + 1}个号码无效，号码只能包含数字。'}), 400
+    numbers = list(dict.fromkeys(clean_number(n) for n in numbers))
+    if keep_warm > 0:
+        cache_warmer.pin(numbers, keep_warm)
+    queued, skipped = cache_warmer.enqueue(numbers, force=bool(data.get('force')))
+    return jsonify({
+        'queued': queued, 'skipped': skipped, 'pending': cache_warmer.pending,
+        'shared_cache': isinstance(cache, TieredCache),
+    }), 202
+
+# 排行榜响应缓存：每个版本只序列化一次，配合ETag让大部分轮询变成304
+RANKINGS_MAX_AGE = int(os.getenv('RANKINGS_MAX_AGE', '5'))
+# 排行榜SSE推送只由ASGI入口（asgi_app.py）提供：Flask/Vercel下每条长连接都会占住一个worker线程，
+# 浏览器默认按ETag轮询/rankings；使用ASGI部署时设置RANKINGS_STREAM=1让浏览器改用推送
+RANKINGS_STREAM = os.getenv('RANKINGS_STREAM', '0') == '1'
+RANKINGS_STREAM_HEARTBEAT = float(os.getenv('RANKINGS_STREAM_HEARTBEAT', '15'))
+RANKINGS_STREAM_POLL_INTERVAL = float(os.getenv('RANKINGS_STREAM_POLL_INTERVAL', '1'))
+RANKINGS_STREAM_MAX_SECONDS = float(os.getenv('RANKINGS_STREAM_MAX_SECONDS', '25'))  # 单条推送连接的最长秒数，到期后浏览器按retry重连
+_rankings_snapshot = None
+_rankings_snapshot_lock = threading.Lock()
+
+def get_rankings_snapshot():
+    """返回 (版本号, JSON字节, ETag)，排行榜未变化时直接复用上次序列化结果"""
+    global _rankings_snapshot
+    cached = _rankings_snapshot
+    if cached is not None and cached[0] == ranking_store.version:
+        return cached
+    with _rankings_snapshot_lock:
+        snapshot, version = ranking_store.snapshot(top_limit=10, recent_limit=20)  # 前10名、最近20次
+        body = json.dumps(snapshot, ensure_ascii=False).encode('utf-8')
+        # ETag基于内容摘要，不同worker的内存版本号即使相同也不会误判
+        etag = hashlib.sha1(body).hexdigest()[:16]
+        _rankings_snapshot = (version, body, etag)
+        return _rankings_snapshot
 
 @app.route('/rankings', methods=['GET'])
 def get_rankings():
-    """获取排行榜数据"""
-    return jsonify({
-        'top_numbers': rankings['top_numbers'][:10],  # 前10名
-        'recent_evaluations': rankings['recent_evaluations'][-20:]  # 最近20次
-    })
+    """获取排行榜数据（支持ETag/If-None-Match）"""
+    _, body, etag = get_rankings_snapshot()
+    response = Response(body, content_type='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'public, max-age={RANKINGS_MAX_AGE}, must-revalidate'
+    if RANKINGS_STREAM:
+        # 告知浏览器可以改用SSE推送；未设置时浏览器按ETag轮询
+        response.headers['X-Rankings-Stream'] = '/rankings/stream'
+    return response.make_conditional(request)
 
 @app.route('/add_to_ranking', methods=['POST'])
 def add_to_ranking():
@@ -500,126 +1112,89 @@ def add_to_ranking():
         if not number:
             return jsonify({'error': '缺少必要参数'}), 400
 
-        import datetime
         timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
 
-        # 添加到最近评估
-        rankings['recent_evaluations'].append({
-            'number': number,
-            'price': price,
-            'level': level,
-            'timestamp': timestamp
-        })
+        # 记录最近评估；价格高于4000且未上榜的号码进入榜单
+        ranking_store.add(number, price, level, timestamp)
 
-        # 保持最近评估列表不超过50条
-        if len(rankings['recent_evaluations']) > 50:
-            rankings['recent_evaluations'] = rankings['recent_evaluations'][-50:]
-
-        # 如果价格足够高，添加到榜单
-        price_num = int(price.replace(',', ''))
-        if price_num > 4000:  # 只有高于4000的才进入榜单
-            # 检查是否已存在
-            existing = next((item for item in rankings['top_numbers'] if item['number'] == number), None)
-            if not existing:
-                rankings['top_numbers'].append({
-                    'number': number,
-                    'price': price,
-                    'level': level,
-                    'timestamp': timestamp
-                })
-                # 按价格排序，保持前20名
-                rankings['top_numbers'].sort(key=lambda x: int(x['price'].replace(',', '')), reverse=True)
-                rankings['top_numbers'] = rankings['top_numbers'][:20]
-
-        # Vercel适配：内存存储，无需文件操作
         return jsonify({'message': '添加成功'})
 
     except Exception as e:
         return jsonify({'error': f'添加失败: {str(e)}'}), 500
 
 def get_vercel_preset_response(prompt):
-    """Vercel环境的预设响应函数"""
-    import hashlib
-    import random
-
-    # 基于prompt生成稳定的随机种子
-    seed = int(hashlib.md5(prompt.encode()).hexdigest()[:8], 16)
-    random.seed(seed)
-
-    # 检测是否为数字评估请求
-    if "手机尾号" in prompt or "数字能量" in prompt:
-        # 提取数字
-        import re
-        numbers = re.findall(r'\d{4}', prompt)
-        if numbers:
-            number = numbers[0]
-            return generate_number_analysis(number)
-
-    # 检测是否为生辰分析请求
-    if "生辰八字" in prompt or "出生日期" in prompt:
-        return generate_fortune_analysis()
-
-    # 检测是否为姓名分析请求
-    if "姓名" in prompt:
-        return generate_name_analysis()
+    """Vercel环境的预设响应函数，按提示词的功能ID和结构化输入路由"""
+    if prompt.feature == 'evaluate':
+        return generate_number_analysis(prompt.inputs['number'])
+
+    if prompt.feature == 'fortune':
+        return generate_fortune_analysis(prompt.inputs)
+
+    if prompt.feature == 'name_analysis':
+        return generate_name_analysis(prompt.inputs)
 
     # 默认响应
     return "感谢您使用红姐数字能量站！这是基于传统文化的趣味解读，仅供娱乐参考，请以科学理性的态度对待生活。"
 
 def generate_number_analysis(number):
-    """生成数字能量分析"""
-    analysis_templates = {
-        "1314": {
-            "homophonic_meaning": "'1314'谐音'一生一世'，堪称爱情的数字诗篇。在中文语境中，它象征着永恒的陪伴与不渝的承诺，常用于表白、婚恋场景，是情感长跑中的甜蜜密码。这个组合把浪漫刻进了数字基因，堪称移动的情书。",
-            "numerical_energy": "从数字能量学看，'1'代表开创与独立，如同晨曦初露，充满向上的生命力；'3'象征活力与表达，如春风拂面；'4'在此非指'死'，而是'稳'的化身，代表踏实与持久。三者共振，形成'进取—绽放—坚守'的能量闭环，寓意事业有成、感情稳定。",
-            "market_value": "由于其深入人心的情感寓意，1314在婚庆、情侣号、纪念日礼品市场备受欢迎。虽非极端稀有，但文化认同度极高，属于高流通性的吉祥号码，具备持续增值潜力。",
-            "fortune_impact": "持有此号者易吸引稳定关系与长久合作，尤其利于从事情感咨询、婚庆服务、文化创意等行业。在人际交往中自带亲和力光环，有助于建立信任与深度连接，是情感与事业双线发展的隐形助力。"
-        },
-        "8888": {
-            "homophonic_meaning": "'8888'四连发，谐音'发发发发'，是财富与成功的终极象征。在传统文化中，'8'形似无穷符号，寓意财源滚滚、生生不息。四个'8'的组合如同四方来财，预示着全方位的兴旺发达。",
-            "numerical_energy": "从数字能量学角度，'8'代表物质成就与权威地位，具有强烈的聚财磁场。四个'8'连续出现，形成超强的财富振频，有助于提升个人的商业敏感度和投资直觉，是天然的财富吸引器。",
-            "market_value": "8888作为顶级吉祥号码，在商界和收藏界享有极高声誉。无论是手机号、车牌还是门牌号，都是身份与财力的象征，具有极强的保值增值能力。",
-            "fortune_impact": "持有者往往在商业领域表现出色，容易获得贵人相助和投资机会。这个号码特别适合企业家、金融从业者和销售人员，能够增强个人的商业魅力和谈判能力。"
-        }
-    }
-
-    # 获取特定数字的分析，如果没有则生成通用分析
-    if number in analysis_templates:
-        return json.dumps(analysis_templates[number], ensure_ascii=False)
-    else:
-        # 生成通用分析
-        import random
-        random.seed(int(number))
-
-        meanings = [
-            "寓意吉祥如意，代表着美好的愿望和期待",
-            "象征着稳步前进，预示着事业的稳定发展",
-            "体现了和谐平衡，有助于人际关系的改善",
-            "代表着创新突破，预示着新的机遇和发展"
-        ]
-
-        energies = [
-            "从数字能量学看，这个组合具有正向的磁场效应",
-            "数字排列体现了阴阳平衡的和谐状态",
-            "蕴含着稳定而持续的能量波动",
-            "展现了积极向上的生命力量"
-        ]
-
-        return json.dumps({
-            "homophonic_meaning": f"'{number}'{random.choice(meanings)}，在传统文化中被视为吉祥的象征。",
-            "numerical_energy": random.choice(energies) + "，有助于提升个人的正能量磁场。",
-            "market_value": "这个数字组合在传统文化中具有一定的收藏价值，体现了对美好生活的向往。",
-            "fortune_impact": "持有者可能在相关领域获得更多的关注和机会，有助于个人发展和人际交往。"
-        }, ensure_ascii=False)
-
-def generate_fortune_analysis():
-    """生成生辰八字分析"""
-    return "根据传统文化的解读角度，您的生辰蕴含着独特的人生密码。从五行角度来看，您的命格中蕴含着平衡与和谐的特质，预示着稳定的人生发展。不过，这些都是传统文化的趣味解读，现代生活还是要靠自己的努力和奋斗！"
-
-def generate_name_analysis():
-    """生成姓名分析"""
+    """生成数字能量分析（查预设语料库）"""
+    return get_number_preset(number)
+
+def generate_fortune_analysis(pillars):
+    """生成生辰八字分析（按日主五行和生肖给出预设解读）"""
+    bazi = BaZi(**pillars)
+    return (f"根据传统文化的解读角度，您的八字为{' '.join(bazi.pillars)}，日主{bazi.day_master}属{bazi.day_master_element}，生肖属{bazi.zodiac}。"
+            f"{ELEMENT_TRAITS[bazi.day_master_element]}"
+            "不过，这些都是传统文化的趣味解读，现代生活还是要靠自己的努力和奋斗！")
+
+ELEMENT_TRAITS = {
+    '木': "木主仁，您为人正直、富有同情心，做事有向上生长的韧劲，适合在教育、文化、策划等需要耐心耕耘的领域发展。",
+    '火': "火主礼，您热情开朗、行动力强，善于感染身边的人，适合在传播、销售、管理等需要表现力的领域发光发热。",
+    '土': "土主信，您稳重踏实、值得信赖，善于协调各方关系，适合在经营、工程、服务等需要厚积薄发的领域稳步前行。",
+    '金': "金主义，您果断干练、讲原则重承诺，做事有条理，适合在金融、法务、技术等需要判断力的领域建功立业。",
+    '水': "水主智，您聪慧灵活、善于变通，思维开阔，适合在研究、咨询、贸易等需要智慧与应变的领域大展身手。",
+}
+
+def generate_name_analysis(inputs):
+    """生成姓名分析（有本地特征时按五行和三才给出预设解读）"""
+    if 'surname' in inputs:
+        features = NameFeatures.from_key(inputs)
+        return (f"从姓名文化学的角度来看，您的姓名字音五行为{features.elements}，声调{features.tones}，"
+                f"总格{features.wuge()['总格']}画，三才配置为{features.sancai()}。"
+                f"{ELEMENT_TRAITS[features.sancai()[1]]}"
+                "当然，这只是传统文化的解读方式，真正的人生成就还是要靠个人的努力和品德！")
     return "从姓名文化学的角度来看，您的姓名字形优美，读音和谐，蕴含着深厚的文化底蕴。在传统文化中，这样的名字往往预示着文雅的气质和良好的人缘。当然，这只是传统文化的解读方式，真正的人生成就还是要靠个人的努力和品德！"
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus格式的指标；设置METRICS_TOKEN后需携带 Authorization: Bearer <令牌>"""
+    if METRICS_TOKEN and not bearer_token_matches(METRICS_TOKEN):
+        return jsonify({'error': '未授权访问指标接口。'}), 401
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+# 冷启动探针：模块导入耗时在启动时打印，首个请求完成耗时在首个请求结束时打印，两者都导出为指标
+STARTUP_SECONDS = time.perf_counter() - _startup_started
+_first_request_seconds = None
+
+@app.after_request
+def record_first_request(response):
+    global _first_request_seconds
+    if _first_request_seconds is None:
+        _first_request_seconds = time.perf_counter() - _startup_started
+        print(f"冷启动：首个请求（{request.path}）在导入开始后{_first_request_seconds * 1000:.0f}ms完成处理")
+    return response
+
+gauge_func('app_startup_seconds', '应用模块导入耗时（冷启动）', lambda: STARTUP_SECONDS)
+gauge_func(
+    'app_first_request_seconds', '从应用开始导入到首个请求处理完成的耗时',
+    lambda: _first_request_seconds if _first_request_seconds is not None else 0
+)
+print(f"应用初始化完成，耗时{STARTUP_SECONDS * 1000:.0f}ms")
+
+# 常驻进程默认在后台预热；无服务器实例按请求计费且可能随时冻结，默认不预热
+if os.getenv('STARTUP_PREWARM', '0' if IS_VERCEL else '1') == '1':
+    threading.Thread(target=prewarm, name='prewarm', daemon=True).start()
+
 # Vercel部署适配
 # 确保app实例可以被Vercel访问
 application = app
@@ -0,0 +1,630 @@
+# ASGI入口：AI相关路由使用异步实现，其余路由回退到原有Flask应用
+# 流式生成期间不再占用worker线程，单进程即可承载大量并发流
+# 运行方式：uvicorn asgi_app:app --host 0.0.0.0 --port 8000
+import asyncio
+import collections
+import contextlib
+import json
+import math
+import os
+import time
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as flask_app
+from bazi_calendar import parse_birth
+from admission import AdmissionRejected, client_identity
+from llm_client import (
+    DASHSCOPE_API_URL, LLM_KEEPALIVE_EXPIRY, MockLLMClient, build_headers, build_payload, parse_body, parse_stream_line
+)
+from metrics import (
+    ADMISSION_REJECTED, HTTP_REQUEST_SECONDS, STREAM_FIRST_CHUNK_SECONDS, UPSTREAM_CALLS, UPSTREAM_DEGRADED, UPSTREAM_FIRST_CHUNK_SECONDS,
+    UPSTREAM_HTTP_CONNECTIONS, UPSTREAM_HTTP_REQUESTS, UPSTREAM_QUEUE_WAIT_SECONDS, UPSTREAM_RETRIES,
+    UPSTREAM_SECONDS, gauge_func, is_content_chunk, record_upstream_usage
+)
+from resilience import backoff_delay
+from stream_compression import compress_async_chunks, compress_bytes, negotiate_encoding
+from async_singleflight import AsyncSingleFlight, AsyncStreamFanout
+
+AI_MAX_CONNECTIONS = int(os.getenv('AI_MAX_CONNECTIONS', '100'))
+
+
+class AsyncDashScopeClient:
+    """基于httpx的非阻塞通义千问HTTP客户端（复用连接池）"""
+
+    def __init__(self, api_key, url=DASHSCOPE_API_URL, timeout=flask_app.AI_TIMEOUT, max_connections=AI_MAX_CONNECTIONS):
+        self.api_key = api_key
+        self.url = url
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=max_connections, max_keepalive_connections=max_connections,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+            ),
+        )
+        self._extensions = {'trace': self._trace}
+
+    @staticmethod
+    async def _trace(event, info):
+        if event == 'connection.connect_tcp.complete':
+            UPSTREAM_HTTP_CONNECTIONS.inc('httpx-async')
+
+    def _payload(self, prompt, parameters):
+        return build_payload(flask_app.AI_MODEL, prompt.text, parameters)
+
+    async def call(self, prompt, parameters, usage=None):
+        """非流式调用，返回完整文本；传入usage字典时填入上游报告的token用量"""
+        UPSTREAM_HTTP_REQUESTS.inc('httpx-async')
+        resp = await self._client.post(
+            self.url, headers=build_headers(self.api_key), json=self._payload(prompt, parameters),
+            extensions=self._extensions
+        )
+        completion = parse_body(resp.status_code, json.loads(resp.content or b'{}'))
+        if usage is not None:
+            usage.update(completion.usage)
+        return completion.text
+
+    async def stream(self, prompt, parameters, usage=None):
+        """流式调用，逐个产出上游返回的文本片段；传入usage字典时填入最新的累计token用量"""
+        UPSTREAM_HTTP_REQUESTS.inc('httpx-async')
+        request = self._client.build_request(
+            'POST', self.url, headers=build_headers(self.api_key, stream=True),
+            json=self._payload(prompt, parameters), extensions=self._extensions
+        )
+        resp = await self._client.send(request, stream=True)
+        try:
+            if resp.status_code != 200:
+                parse_body(resp.status_code, json.loads(await resp.aread() or b'{}'))
+            async for line in resp.aiter_lines():
+                completion = parse_stream_line(line)
+                if completion is None:
+                    continue
+                if usage is not None:
+                    usage.update(completion.usage)
+                yield completion.text
+        finally:
+            await resp.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+class AsyncMockClient:
+    """LLM_BACKEND=mock时使用的异步模拟客户端，内容和延迟与同步版MockLLMClient一致"""
+
+    def __init__(self, mock=None):
+        self.mock = mock or MockLLMClient()
+
+    async def call(self, prompt, parameters, usage=None):
+        chunks = self.mock.plan(prompt, parameters)
+        await asyncio.sleep(self.mock.first_token_latency + self.mock.token_latency * (len(chunks) - 1))
+        if usage is not None:
+            usage.update(chunks[-1].usage)
+        return self.mock.respond(prompt)
+
+    async def stream(self, prompt, parameters, usage=None):
+        await asyncio.sleep(self.mock.first_token_latency)
+        for index, chunk in enumerate(self.mock.plan(prompt, parameters)):
+            if index:
+                await asyncio.sleep(self.mock.token_latency)
+            if usage is not None:
+                usage.update(chunk.usage)
+            yield chunk.text
+
+    async def aclose(self):
+        pass
+
+
+class AsyncConcurrencyLimiter:
+    """admission.ConcurrencyLimiter的事件循环版本：全局并发上限 + 有界等待队列，按到达顺序放行"""
+
+    def __init__(self, max_in_flight, max_queue, queue_timeout):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters = collections.deque()
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    async def acquire(self):
+        """取得一个调用名额，返回排队等待的秒数；队列满或等待超时抛出AdmissionRejected"""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return 0.0
+        retry_after = max(1, int(self.queue_timeout))
+        if len(self._waiters) >= self.max_queue:
+            raise AdmissionRejected('queue_full', retry_after)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            raise AdmissionRejected('queue_timeout', retry_after)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # 已被放行但请求被取消（客户端断开），名额转交下一个
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+        return time.perf_counter() - started
+
+    def _discard(self, waiter):
+        with contextlib.suppress(ValueError):
+            self._waiters.remove(waiter)
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # 名额直接转交给最早的等待者，in_flight不变
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+ai_client = None
+upstream_limiter = (
+    AsyncConcurrencyLimiter(
+        flask_app.UPSTREAM_MAX_IN_FLIGHT, flask_app.UPSTREAM_QUEUE_SIZE, flask_app.UPSTREAM_QUEUE_TIMEOUT
+    ) if flask_app.UPSTREAM_MAX_IN_FLIGHT > 0 else None
+)
+evaluate_flight = AsyncSingleFlight()
+stream_fanout = AsyncStreamFanout(flush_interval=flask_app.STREAM_FLUSH_INTERVAL, flush_bytes=flask_app.STREAM_FLUSH_BYTES)
+
+
+def get_ai_client():
+    global ai_client
+    if ai_client is None:
+        if flask_app.LLM_BACKEND == 'mock':
+            ai_client = AsyncMockClient()
+        else:
+            ai_client = AsyncDashScopeClient(os.getenv('DASHSCOPE_API_KEY'))
+    return ai_client
+
+
+async def acquire_upstream_slot(prompt):
+    """取得上游调用名额，语义同Flask版：返回None表示已获准入（调用方负责归还），
+    否则返回降级用的预设响应；ADMISSION_OVERFLOW=reject时抛出AdmissionRejected"""
+    if upstream_limiter is None:
+        return None
+    try:
+        waited = await upstream_limiter.acquire()
+    except AdmissionRejected as e:
+        ADMISSION_REJECTED.inc(e.reason, flask_app.ADMISSION_OVERFLOW)
+        # 熔断器半开时本次调用可能持有探测名额，未调用上游就要归还，否则熔断器会一直停在半开状态
+        flask_app.ai_breaker.release_probe()
+        if flask_app.ADMISSION_OVERFLOW == 'reject':
+            raise
+        UPSTREAM_DEGRADED.inc(prompt.feature)
+        return flask_app.get_vercel_preset_response(prompt)
+    if waited:
+        UPSTREAM_QUEUE_WAIT_SECONDS.observe(waited)
+    return None
+
+
+def release_upstream_slot():
+    if upstream_limiter is not None:
+        upstream_limiter.release()
+
+
+async def call_ai_with_retry(prompt, max_retries=3):
+    """异步版本的带重试AI调用，退避等待不阻塞事件循环，与Flask共用熔断器和重试预算
+
+    返回 (文本, 是否为降级的预设响应)
+    """
+    if flask_app.IS_VERCEL:
+        return flask_app.get_vercel_preset_response(prompt), False
+    if not flask_app.ai_breaker.allow():
+        UPSTREAM_DEGRADED.inc(prompt.feature)
+        return flask_app.get_vercel_preset_response(prompt), True
+    overflow = await acquire_upstream_slot(prompt)
+    if overflow is not None:
+        return overflow, True
+    try:
+        return await call_upstream(prompt, max_retries)
+    finally:
+        release_upstream_slot()
+
+
+async def call_upstream(prompt, max_retries):
+    """实际的上游调用与重试，由call_ai_with_retry在取得名额后调用"""
+    feature = prompt.feature
+    flask_app.retry_budget.record_request()
+    for attempt in range(max_retries):
+        started = time.perf_counter()
+        usage = {}
+        try:
+            text = await asyncio.wait_for(
+                get_ai_client().call(prompt, flask_app.NON_STREAM_PARAMETERS, usage), flask_app.AI_TIMEOUT
+            )
+            flask_app.ai_breaker.record_success()
+            UPSTREAM_CALLS.inc(feature, 'call', 'ok')
+            UPSTREAM_SECONDS.observe(time.perf_counter() - started, feature, 'call')
+            record_upstream_usage(feature, usage, len(text or ''))
+            return text, False
+        except Exception as e:
+            flask_app.ai_breaker.record_failure()
+            UPSTREAM_CALLS.inc(feature, 'call', 'timeout' if isinstance(e, asyncio.TimeoutError) else 'error')
+            print(f"AI调用失败 (尝试 {attempt + 1}/{max_retries}): {str(e) or type(e).__name__}")
+            if not flask_app.ai_breaker.allow():
+                UPSTREAM_DEGRADED.inc(feature)
+                return flask_app.get_vercel_preset_response(prompt), True
+            if attempt < max_retries - 1 and flask_app.retry_budget.try_spend():
+                UPSTREAM_RETRIES.inc(feature)
+                await asyncio.sleep(backoff_delay(attempt, flask_app.AI_RETRY_BASE_DELAY, flask_app.AI_RETRY_MAX_DELAY))
+            else:
+                raise
+
+
+async def generate_stream(prompt, cache_key=None, parameters=None, finalize=None):
+    """异步流式生成器，只返回增量内容；成功结束后写入缓存（传入finalize时缓存finalize(全文)）"""
+    if flask_app.IS_VERCEL:
+        text = flask_app.get_vercel_preset_response(prompt)
+        result = finalize(text) if finalize else text
+        if cache_key and result:
+            flask_app.set_cache_result(cache_key, result)
+        yield text
+        return
+    feature = prompt.feature
+    if not flask_app.ai_breaker.allow():
+        # 熔断降级，不写缓存，上游恢复后可重新生成
+        UPSTREAM_DEGRADED.inc(feature)
+        yield flask_app.get_vercel_preset_response(prompt)
+        return
+    try:
+        overflow = await acquire_upstream_slot(prompt)
+    except AdmissionRejected as e:
+        # 响应头已发出，无法再返回429，改为在流中提示
+        yield str(e)
+        return
+    if overflow is not None:
+        yield overflow
+        return
+
+    emitted = []
+    usage = {}
+    started = time.perf_counter()
+    try:
+        async for chunk in get_ai_client().stream(prompt, parameters or flask_app.STREAM_PARAMETERS, usage):
+            if chunk:
+                if not emitted:
+                    UPSTREAM_FIRST_CHUNK_SECONDS.observe(time.perf_counter() - started, feature)
+                emitted.append(chunk)
+                yield chunk
+    except Exception as e:
+        flask_app.ai_breaker.record_failure()
+        UPSTREAM_CALLS.inc(feature, 'stream', 'error')
+        error_message = f"调用API时发生异常: {str(e)}"
+        print(error_message)
+        yield error_message
+        return
+    finally:
+        # 上游流结束（含出错、客户端断开）即归还名额
+        release_upstream_slot()
+    flask_app.ai_breaker.record_success()
+    UPSTREAM_CALLS.inc(feature, 'stream', 'ok')
+    UPSTREAM_SECONDS.observe(time.perf_counter() - started, feature, 'stream')
+    record_upstream_usage(feature, usage, sum(len(chunk) for chunk in emitted))
+    if cache_key and emitted:
+        result = ''.join(emitted)
+        if finalize:
+            result = finalize(result)
+        if result:
+            flask_app.set_cache_result(cache_key, result)
+
+
+async def run_evaluate(prompt, cache_key, number=None):
+    """调用AI完成号码评估并写入缓存，返回 (json字符串, 错误信息)"""
+    cached_result = flask_app.get_cached_result(cache_key, recheck=True)
+    if cached_result:
+        return cached_result, None
+
+    raw_text, degraded = await call_ai_with_retry(prompt)
+    json_str, error = flask_app.finalize_evaluation(raw_text, number)
+    if json_str and not degraded:
+        flask_app.set_cache_result(cache_key, json_str)
+    return json_str, error
+
+
+async def read_field(request, field):
+    """解析JSON请求体并取出必填字段，返回 (字段值, 错误响应)"""
+    try:
+        data = await request.json()
+        if not data:
+            return None, JSONResponse({'error': '请求体必须是有效的JSON。'}, status_code=400)
+        value = data.get(field)
+    except Exception as e:
+        return None, JSONResponse({'error': f'解析JSON请求失败: {str(e)}'}, status_code=400)
+
+    if value is None or value == '':
+        return None, JSONResponse({'error': f'JSON请求体中必须包含 \'{field}\' 字段。'}, status_code=400)
+    return value, None
+
+
+async def evaluate(request):
+    number, error_response = await read_field(request, 'number')
+    if error_response:
+        return error_response
+    number = flask_app.clean_number(number)
+    if number is None:
+        return JSONResponse({'error': '号码只能包含数字。'}, status_code=400)
+    flask_app.record_evaluation_request(number)
+
+    preset = flask_app.get_evaluate_preset(number)
+    if preset is not None:
+        if wants_sse(request):
+            return sse_response(request, generate_evaluate_sse(None, None, result=preset.decode('utf-8')))
+        return Response(preset, media_type='application/json')
+
+    cache_key = flask_app.get_cache_key("evaluate", number)
+    prompt = flask_app.build_evaluate_prompt(number)
+    if wants_sse(request):
+        return sse_response(request, generate_evaluate_sse(prompt, cache_key, number))
+
+    cached_result = flask_app.get_cached_result(cache_key)
+    if cached_result:
+        return Response(cached_result, media_type='application/json')
+
+    try:
+        (json_str, error), _ = await evaluate_flight.do(cache_key, lambda: run_evaluate(prompt, cache_key, number))
+        if error:
+            return JSONResponse({'error': error}, status_code=500)
+        return Response(json_str, media_type='application/json')
+    except AdmissionRejected as e:
+        return too_many_requests(e.retry_after, str(e))
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+def too_many_requests(retry_after, message='请求过于频繁，请稍后再试。'):
+    return JSONResponse(
+        {'error': message}, status_code=429, headers={'Retry-After': str(max(1, math.ceil(retry_after)))}
+    )
+
+
+async def generate_sse(prompt, cache_key, resume_offset=0):
+    """SSE流式输出，续传规则与Flask版generate_sse相同"""
+    yield 'retry: 2000\n\n'
+    cached_result = flask_app.get_cached_result(cache_key)
+    if cached_result is None and resume_offset and not stream_fanout.is_active(cache_key):
+        yield flask_app.format_sse_event('', 0, event='reset')
+        resume_offset = 0
+    if cached_result is not None:
+        if resume_offset > len(cached_result):
+            yield flask_app.format_sse_event('', 0, event='reset')
+            resume_offset = 0
+        if resume_offset < len(cached_result):
+            yield flask_app.format_sse_event(cached_result[resume_offset:], len(cached_result))
+        yield flask_app.format_sse_event('', len(cached_result), event='done')
+        return
+
+    position = 0
+    async for chunk in stream_fanout.subscribe(cache_key, lambda: generate_stream(prompt, cache_key)):
+        end = position + len(chunk)
+        if end > resume_offset:
+            yield flask_app.format_sse_event(chunk[max(0, resume_offset - position):], end)
+        position = end
+    yield flask_app.format_sse_event('', position, event='done')
+
+
+async def generate_evaluate_sse(prompt, cache_key, number=None, result=None):
+    """/evaluate的SSE输出，事件格式与Flask版generate_evaluate_sse相同；已有结果（预设）时直接逐字段发送"""
+    yield 'retry: 2000\n\n'
+    if result is None:
+        result = flask_app.get_cached_result(cache_key)
+    sent = 0
+    if result is not None:
+        for name, value in json.loads(result).items():
+            sent += 1
+            yield flask_app.format_field_event(name, value, sent)
+        yield flask_app.format_sse_event(result, sent, event='result')
+        yield flask_app.format_sse_event('', sent, event='done')
+        return
+
+    scored = flask_app.score_number(number) if number else None
+    if scored:
+        for name in ('price', 'level'):
+            sent += 1
+            yield flask_app.format_field_event(name, scored[name], sent)
+
+    parser = flask_app.JSONFieldStream()
+    chunks = []
+    source = lambda: generate_stream(
+        prompt, cache_key, flask_app.EVALUATE_STREAM_PARAMETERS,
+        finalize=lambda text: flask_app.finalize_evaluation(text, number)[0]
+    )
+    async for chunk in stream_fanout.subscribe(cache_key, source):
+        chunks.append(chunk)
+        for name, value in parser.feed(chunk):
+            if scored and name in ('price', 'level'):
+                continue
+            sent += 1
+            yield flask_app.format_field_event(name, value, sent)
+
+    json_str, error = flask_app.finalize_evaluation(''.join(chunks), number)
+    if error:
+        yield flask_app.format_sse_event(json.dumps({'error': error}, ensure_ascii=False), sent, event='error')
+    else:
+        yield flask_app.format_sse_event(json_str, sent, event='result')
+    yield flask_app.format_sse_event('', sent, event='done')
+
+
+def wants_sse(request):
+    return 'text/event-stream' in request.headers.get('accept', '') or request.query_params.get('mode') == 'sse'
+
+
+def sse_response(request, events):
+    return compress_response(request, StreamingResponse(
+        events,
+        media_type='text/event-stream; charset=utf-8',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    ))
+
+
+def compress_response(request, response):
+    """与Flask端相同的响应压缩：流式响应逐片段压缩并同步刷新"""
+    response.headers.append('Vary', 'Accept-Encoding')
+    encoding = negotiate_encoding(request.headers.get('accept-encoding')) if flask_app.STREAM_COMPRESSION else None
+    if encoding is None:
+        return response
+    if isinstance(response, StreamingResponse):
+        response.body_iterator = compress_async_chunks(response.body_iterator, encoding)
+    else:
+        if len(response.body) < flask_app.COMPRESSION_MIN_SIZE:
+            return response
+        response.body = compress_bytes(response.body, encoding)
+        response.headers['Content-Length'] = str(len(response.body))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def stream_response(request, prefix, value, prompt):
+    cache_key = flask_app.get_cache_key(prefix, value)
+    if wants_sse(request):
+        last_event_id = request.headers.get('last-event-id', '')
+        resume_offset = int(last_event_id) if last_event_id.isdigit() else 0
+        return sse_response(request, generate_sse(prompt, cache_key, resume_offset))
+
+    cached_result = flask_app.get_cached_result(cache_key)
+    if cached_result:
+        return compress_response(request, Response(cached_result, media_type='text/plain; charset=utf-8'))
+    chunks = stream_fanout.subscribe(cache_key, lambda: generate_stream(prompt, cache_key))
+    return compress_response(request, StreamingResponse(chunks, media_type='text/plain; charset=utf-8'))
+
+
+async def fortune(request):
+    birthdate, error_response = await read_field(request, 'birthdate')
+    if error_response:
+        return error_response
+    try:
+        # request.json() 的解析结果已被缓存，这里不会重复读取请求体
+        bazi = parse_birth(birthdate, (await request.json()).get('birthtime'))
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, status_code=400)
+    return stream_response(request, 'fortune', bazi.key(), flask_app.build_fortune_prompt(bazi))
+
+
+async def name_analysis(request):
+    name, error_response = await read_field(request, 'name')
+    if error_response:
+        return error_response
+    prompt = flask_app.build_name_analysis_prompt(name)
+    return stream_response(request, 'name_analysis', prompt.inputs, prompt)
+
+
+class MetricsMiddleware:
+    """记录异步路由的请求耗时和流式首片段耗时（回退到Flask的路由由Flask自己统计）"""
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = set(routes)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        route, method = scope['path'], scope['method']
+        state = {'status': '500', 'first_chunk': True}
+
+        async def send_with_metrics(message):
+            if message['type'] == 'http.response.start':
+                state['status'] = str(message['status'])
+            elif message['type'] == 'http.response.body':
+                more_body = message.get('more_body', False)
+                # 只有分多次发送的流式响应才记录首片段耗时
+                if state['first_chunk'] and more_body and is_content_chunk(message.get('body', b'')):
+                    STREAM_FIRST_CHUNK_SECONDS.observe(time.perf_counter() - started, route)
+                    state['first_chunk'] = False
+                if not more_body:
+                    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route, method, state['status'])
+            await send(message)
+
+        await self.app(scope, receive, send_with_metrics)
+
+
+async def generate_rankings_events():
+    """排行榜SSE：按间隔检查版本号，只在数据变化时发送，超过RANKINGS_STREAM_MAX_SECONDS主动结束由浏览器重连"""
+    yield 'retry: 3000\n\n'
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + flask_app.RANKINGS_STREAM_MAX_SECONDS
+    sent_version = None
+    last_sent = loop.time()
+    while True:
+        # SQLite排行榜的版本查询和快照都是阻塞I/O，放到线程池执行；版本未变时直接复用上次的序列化结果
+        version, body, etag = await run_in_threadpool(flask_app.get_rankings_snapshot)
+        if version != sent_version:
+            yield f'id: {etag}\nevent: rankings\ndata: {body.decode("utf-8")}\n\n'
+            sent_version = version
+            last_sent = loop.time()
+        elif loop.time() - last_sent >= flask_app.RANKINGS_STREAM_HEARTBEAT:
+            yield ': keepalive\n\n'
+            last_sent = loop.time()
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return
+        await asyncio.sleep(min(flask_app.RANKINGS_STREAM_POLL_INTERVAL, remaining))
+
+
+async def stream_rankings(request):
+    """以Server-Sent Events推送排行榜；等待期间只占用一个协程，不占worker线程"""
+    return sse_response(request, generate_rankings_events())
+
+
+class RateLimitMiddleware:
+    """异步AI路由按客户端限速，与Flask的limit_client_rate共用同一个令牌桶表"""
+
+    def __init__(self, app, routes):
+        self.app = app
+        self.routes = set(routes)
+
+    async def __call__(self, scope, receive, send):
+        limiter = flask_app.client_rate_limiter
+        if limiter is None or scope['type'] != 'http' or scope['path'] not in self.routes:
+            await self.app(scope, receive, send)
+            return
+        remote_addr = scope['client'][0] if scope.get('client') else None
+        wait = limiter.try_acquire(client_identity(remote_addr, Headers(scope=scope), flask_app.TRUST_PROXY_HEADERS))
+        if wait:
+            ADMISSION_REJECTED.inc('rate_limited', 'reject')
+            await too_many_requests(wait)(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    yield
+    if ai_client is not None:
+        await ai_client.aclose()
+
+
+app = Starlette(
+    routes=[
+        Route('/evaluate', evaluate, methods=['POST']),
+        Route('/fortune', fortune, methods=['POST']),
+        Route('/name_analysis', name_analysis, methods=['POST']),
+        Route('/rankings/stream', stream_rankings, methods=['GET']),
+        # 其余路由（首页、静态资源、排行榜、分享卡片等）仍由Flask处理
+        Mount('/', app=WSGIMiddleware(flask_app.app)),
+    ],
+    lifespan=lifespan,
+)
+app.add_middleware(RateLimitMiddleware, routes=('/evaluate', '/fortune', '/name_analysis'))
+# 后添加的中间件在外层：被限速拒绝的请求也计入请求指标
+app.add_middleware(MetricsMiddleware, routes=('/evaluate', '/fortune', '/name_analysis'))
+if upstream_limiter is not None:
+    gauge_func('upstream_async_in_flight', '异步路由占用并发名额的上游调用数', lambda: upstream_limiter.in_flight)
+    gauge_func('upstream_async_queue_depth', '异步路由排队等待上游并发名额的请求数', lambda: upstream_limiter.queued)
@@ -0,0 +1,111 @@
+# 请求合并的asyncio版本，供ASGI入口使用
+# 与singleflight.py中的线程版本语义相同；单独成模块，Flask入口冷启动时不必导入asyncio
+import asyncio
+
+from singleflight import _Broadcast
+
+
+class AsyncSingleFlight:
+    """SingleFlight的asyncio版本，供ASGI服务使用"""
+
+    def __init__(self):
+        self._calls = {}
+        self.leaders = 0
+        self.shared = 0
+
+    async def do(self, key, coro_fn):
+        future = self._calls.get(key)
+        if future is not None:
+            self.shared += 1
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.leaders += 1
+        try:
+            result = await coro_fn()
+        except Exception as e:
+            future.set_exception(e)
+            # 没有等待者时避免"exception was never retrieved"警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            self._calls.pop(key, None)
+
+    def in_flight(self):
+        return len(self._calls)
+
+
+class AsyncStreamFanout:
+    """StreamFanout的asyncio版本：一个上游异步流分发给所有订阅者，攒批规则相同"""
+
+    def __init__(self, flush_interval=0, flush_bytes=0):
+        self._streams = {}
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.leaders = 0
+        self.shared = 0
+
+    def subscribe(self, key, factory):
+        broadcast = self._streams.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            broadcast.event = asyncio.Event()
+            self._streams[key] = broadcast
+            self.leaders += 1
+            asyncio.get_running_loop().create_task(self._pump(key, broadcast, factory))
+        else:
+            self.shared += 1
+        broadcast.subscribers += 1
+        return self._follow(broadcast)
+
+    async def _pump(self, key, broadcast, factory):
+        try:
+            async for chunk in factory():
+                broadcast.append(chunk)
+                self._wake(broadcast)
+        except Exception as e:
+            print(f"流式合并上游异常: {str(e)}")
+            broadcast.append(f"调用API时发生异常: {str(e)}")
+        finally:
+            self._streams.pop(key, None)
+            broadcast.done = True
+            self._wake(broadcast)
+
+    @staticmethod
+    def _wake(broadcast):
+        event = broadcast.event
+        broadcast.event = asyncio.Event()
+        event.set()
+
+    async def _follow(self, broadcast):
+        loop = asyncio.get_running_loop()
+        index = 0
+        while True:
+            while index >= len(broadcast.chunks) and not broadcast.done:
+                await broadcast.event.wait()
+            if self.flush_interval:
+                deadline = loop.time() + self.flush_interval
+                while not broadcast.done and broadcast.pending_bytes(index) < self.flush_bytes:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        await asyncio.wait_for(broadcast.event.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+            pending = broadcast.chunks[index:]
+            if pending:
+                yield ''.join(pending)
+            index += len(pending)
+            if broadcast.done and index >= len(broadcast.chunks):
+                return
+
+    def is_active(self, key):
+        return key in self._streams
+
+    def in_flight(self):
+        return len(self._streams)
@@ -0,0 +1,311 @@
+# 生辰八字历法引擎
+# 把公历出生日期（北京时间）换算为年、月、日、时四柱干支，不依赖网络和第三方库：
+# - 年柱以立春为界，月柱以十二"节"（小寒、立春、惊蛰……大雪）为界，交节时刻由太阳视黄经推算
+# - 日柱按儒略日数取六十甲子（2000-01-01为戊午日），23点起算作次日子时
+# - 时柱按五鼠遁由日干推出
+# 1899~2101年的交节时刻离线预先算好写入数据文件，运行时查表即可，单次换算为微秒级；
+# 数据文件不存在时按年现算（毫秒级）并缓存。太阳黄经采用Meeus低精度算法加行星摄动修正，
+# 交节时刻误差在数分钟以内。
+#
+# 构建：python bazi_calendar.py build [--output data/solar_terms.bin]
+import argparse
+import bisect
+import math
+import os
+import re
+import struct
+import sys
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+STEMS = '甲乙丙丁戊己庚辛壬癸'
+BRANCHES = '子丑寅卯辰巳午未申酉戌亥'
+GANZHI = tuple(STEMS[i % 10] + BRANCHES[i % 12] for i in range(60))
+STEM_ELEMENTS = '木木火火土土金金水水'
+BRANCH_ELEMENTS = '水土木木土火火土金金土水'
+ZODIAC = '鼠牛虎兔龙蛇马羊猴鸡狗猪'
+ELEMENTS = '木火土金水'
+
+# 每年的十二个"节"，按公历顺序排列；第k个节开始的月份地支为 (k+1) % 12（小寒起丑月，立春起寅月）
+JIE_NAMES = ('小寒', '立春', '惊蛰', '清明', '立夏', '芒种', '小暑', '立秋', '白露', '寒露', '立冬', '大雪')
+JIE_LONGITUDES = (285, 315, 345, 15, 45, 75, 105, 135, 165, 195, 225, 255)
+
+MIN_YEAR, MAX_YEAR = 1900, 2100
+TABLE_FIRST_YEAR, TABLE_LAST_YEAR = MIN_YEAR - 1, MAX_YEAR + 1
+
+TABLE_MAGIC = b'HJST'
+TABLE_VERSION = 1
+HEADER = struct.Struct('<4sIII')  # 魔数、版本、起始年份、年数
+YEAR_TERMS = struct.Struct('<12i')
+DEFAULT_TABLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'solar_terms.bin')
+
+TROPICAL_YEAR = 365.2422
+BEIJING_OFFSET_MINUTES = 8 * 60
+
+
+def julian_day_number(year, month, day):
+    """公历日期的儒略日数（当天正午的儒略日）"""
+    a = (14 - month) // 12
+    y = year + 4800 - a
+    m = month + 12 * a - 3
+    return day + (153 * m + 2) // 5 + 365 * y + y // 4 - y // 100 + y // 400 - 32045
+
+
+# 时间统一用"自1900-01-01 00:00（北京时间）起的分钟数"表示
+EPOCH_JDN = julian_day_number(1900, 1, 1)
+
+
+def local_minutes(year, month, day, hour=0, minute=0):
+    return (julian_day_number(year, month, day) - EPOCH_JDN) * 1440 + hour * 60 + minute
+
+
+def _delta_t(year):
+    """力学时与世界时之差ΔT（秒），Espenak & Meeus多项式，覆盖1900~2150年"""
+    if year < 1920:
+        t = year - 1900
+        return -2.79 + 1.494119 * t - 0.0598939 * t ** 2 + 0.0061966 * t ** 3 - 0.000197 * t ** 4
+    if year < 1941:
+        t = year - 1920
+        return 21.20 + 0.84493 * t - 0.076100 * t ** 2 + 0.0020936 * t ** 3
+    if year < 1961:
+        t = year - 1950
+        return 29.07 + 0.407 * t - t ** 2 / 233 + t ** 3 / 2547
+    if year < 1986:
+        t = year - 1975
+        return 45.45 + 1.067 * t - t ** 2 / 260 - t ** 3 / 718
+    if year < 2005:
+        t = year - 2000
+        return (63.86 + 0.3345 * t - 0.060374 * t ** 2 + 0.0017275 * t ** 3
+                + 0.000651814 * t ** 4 + 0.00002373599 * t ** 5)
+    if year < 2050:
+        t = year - 2000
+        return 62.92 + 0.32217 * t + 0.005589 * t ** 2
+    return -20 + 32 * ((year - 1820) / 100) ** 2 - 0.5628 * (2150 - year)
+
+
+def sun_apparent_longitude(jde):
+    """太阳视黄经（度），jde为力学时儒略日"""
+    t = (jde - 2451545.0) / 36525
+    mean_longitude = 280.46646 + 36000.76983 * t + 0.0003032 * t * t
+    anomaly = math.radians(357.52911 + 35999.05029 * t - 0.0001537 * t * t)
+    center = ((1.914602 - 0.004817 * t - 0.000014 * t * t) * math.sin(anomaly)
+              + (0.019993 - 0.000101 * t) * math.sin(2 * anomaly)
+              + 0.000289 * math.sin(3 * anomaly))
+    # 金星、木星、月球的主要摄动项
+    perturbation = (0.00134 * math.cos(math.radians(153.23 + 22518.7541 * t))
+                    + 0.00154 * math.cos(math.radians(216.57 + 45037.5082 * t))
+                    + 0.00200 * math.cos(math.radians(312.69 + 32964.3577 * t))
+                    + 0.00179 * math.sin(math.radians(350.74 + 445267.1142 * t - 0.00144 * t * t))
+                    + 0.00178 * math.sin(math.radians(231.19 + 20.20 * t)))
+    # 章动与光行差
+    omega = math.radians(125.04 - 1934.136 * t)
+    return (mean_longitude + center + perturbation - 0.00569 - 0.00478 * math.sin(omega)) % 360
+
+
+def solar_term_minutes(year, longitude):
+    """公历year年内太阳视黄经到达longitude的时刻（北京时间分钟数）"""
+    # 以春分（约3月20日）为起点按平均速度估算初值，再用牛顿迭代逼近
+    jde = julian_day_number(year, 3, 20) - 0.5 + ((longitude + 90) % 360 - 90) / 360 * TROPICAL_YEAR
+    for _ in range(20):
+        delta = (longitude - sun_apparent_longitude(jde) + 180) % 360 - 180
+        jde += delta / 360 * TROPICAL_YEAR
+        if abs(delta) < 1e-7:
+            break
+    jd_ut = jde - _delta_t(year) / 86400
+    return round((jd_ut - (EPOCH_JDN - 0.5)) * 1440) + BEIJING_OFFSET_MINUTES
+
+
+@lru_cache(maxsize=None)
+def compute_year_terms(year):
+    """现算某年十二个节的交节时刻"""
+    return tuple(solar_term_minutes(year, longitude) for longitude in JIE_LONGITUDES)
+
+
+def build_table(path=DEFAULT_TABLE_PATH):
+    """离线预计算交节时刻表，返回 (路径, 字节数)"""
+    years = TABLE_LAST_YEAR - TABLE_FIRST_YEAR + 1
+    parts = [HEADER.pack(TABLE_MAGIC, TABLE_VERSION, TABLE_FIRST_YEAR, years)]
+    for year in range(TABLE_FIRST_YEAR, TABLE_LAST_YEAR + 1):
+        parts.append(YEAR_TERMS.pack(*compute_year_terms(year)))
+    data = b''.join(parts)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path, len(data)
+
+
+_table = None
+_table_first_year = 0
+_table_loaded = False
+_table_lock = threading.Lock()
+
+
+def load_table(path=None):
+    """加载交节时刻表（进程内只加载一次），文件不存在或损坏时返回None，改为按年现算"""
+    global _table, _table_first_year, _table_loaded
+    if not _table_loaded:
+        with _table_lock:
+            if not _table_loaded:
+                path = path or os.getenv('SOLAR_TERMS_PATH', DEFAULT_TABLE_PATH)
+                if os.path.exists(path):
+                    try:
+                        with open(path, 'rb') as f:
+                            data = f.read()
+                        magic, version, first_year, years = HEADER.unpack_from(data)
+                        if magic != TABLE_MAGIC or version != TABLE_VERSION:
+                            raise ValueError('交节时刻表格式不匹配')
+                        _table = [
+                            YEAR_TERMS.unpack_from(data, HEADER.size + i * YEAR_TERMS.size) for i in range(years)
+                        ]
+                        _table_first_year = first_year
+                    except (OSError, ValueError, struct.error) as e:
+                        print(f"交节时刻表加载失败，改为实时计算: {str(e)}")
+                _table_loaded = True
+    return _table
+
+
+def year_terms(year):
+    """某年十二个节的交节时刻（北京时间分钟数），优先查表"""
+    table = load_table()
+    if table is not None and 0 <= year - _table_first_year < len(table):
+        return table[year - _table_first_year]
+    return compute_year_terms(year)
+
+
+class BaZi(namedtuple('BaZi', ['year', 'month', 'day', 'hour'])):
+    """四柱干支；hour为None表示时辰未知"""
+
+    __slots__ = ()
+
+    @property
+    def pillars(self):
+        return tuple(p for p in self if p)
+
+    @property
+    def day_master(self):
+        """日主（日干）"""
+        return self.day[0]
+
+    @property
+    def day_master_element(self):
+        return STEM_ELEMENTS[STEMS.index(self.day[0])]
+
+    @property
+    def zodiac(self):
+        return ZODIAC[BRANCHES.index(self.year[1])]
+
+    @property
+    def solar_term(self):
+        """月令所在的节（出生于该节之后、下一个节之前）"""
+        return JIE_NAMES[(BRANCHES.index(self.month[1]) - 1) % 12]
+
+    def element_counts(self):
+        """八字中五行各自出现的次数"""
+        counts = dict.fromkeys(ELEMENTS, 0)
+        for pillar in self.pillars:
+            counts[STEM_ELEMENTS[STEMS.index(pillar[0])]] += 1
+            counts[BRANCH_ELEMENTS[BRANCHES.index(pillar[1])]] += 1
+        return counts
+
+    def describe(self):
+        """供提示词使用的文字描述"""
+        names = ('年柱', '月柱', '日柱', '时柱')
+        text = '，'.join(f'{name}{pillar}' for name, pillar in zip(names, self) if pillar)
+        if self.hour is None:
+            text += '（时辰未知）'
+        counts = '、'.join(f'{element}{count}' for element, count in self.element_counts().items())
+        return (f'{text}；日主{self.day_master}（五行属{self.day_master_element}），'
+                f'生肖属{self.zodiac}，生于{self.solar_term}之后；八字五行分布：{counts}')
+
+    def key(self):
+        """缓存键和预设路由使用的结构化输入"""
+        return {'year': self.year, 'month': self.month, 'day': self.day, 'hour': self.hour}
+
+
+def four_pillars(year, month, day, hour=None, minute=0):
+    """公历出生时间（北京时间）换算为四柱；时辰未知时按当天正午判断交节"""
+    if not MIN_YEAR <= year <= MAX_YEAR:
+        raise ValueError(f'出生年份需在{MIN_YEAR}~{MAX_YEAR}年之间。')
+    moment = local_minutes(year, month, day, 12 if hour is None else hour, minute)
+
+    # 月柱：找到出生时刻之前最近的节；早于当年小寒则属于上一年大雪起的子月
+    terms = year_terms(year)
+    index = bisect.bisect_right(terms, moment) - 1
+    branch = (index + 1) % 12
+    # 年柱：以立春为界
+    bazi_year = year if index >= 1 else year - 1
+    year_index = (bazi_year - 4) % 60
+    year_stem = year_index % 10
+    month_offset = (branch - 2) % 12                    # 寅月为0
+    month_stem = (year_stem * 2 + 2 + month_offset) % 10  # 五虎遁
+    month_pillar = STEMS[month_stem] + BRANCHES[branch]
+
+    # 日柱：23点起算作次日
+    day_index = (julian_day_number(year, month, day) + 49 + (1 if hour == 23 else 0)) % 60
+
+    hour_pillar = None
+    if hour is not None:
+        hour_branch = ((hour + 1) // 2) % 12
+        hour_stem = ((day_index % 10) * 2 + hour_branch) % 10  # 五鼠遁
+        hour_pillar = STEMS[hour_stem] + BRANCHES[hour_branch]
+
+    return BaZi(GANZHI[year_index], month_pillar, GANZHI[day_index], hour_pillar)
+
+
+BIRTHDATE_PATTERN = re.compile(
+    r'^\s*(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})\s*日?'
+    r'(?:\s*[T\s]?\s*(\d{1,2})(?:\s*[:：时点]\s*(\d{1,2})?)?(?:\s*[:：分]\s*\d{0,2}\s*秒?)?)?\s*$'
+)
+BIRTHTIME_PATTERN = re.compile(r'^\s*(\d{1,2})(?:\s*[:：时点]\s*(\d{1,2})?)?(?:\s*[:：分]\s*\d{0,2}\s*秒?)?\s*$')
+
+
+def parse_birth(birthdate, birthtime=None):
+    """解析出生日期（可带时间）和可选的出生时间，返回BaZi；格式或日期无效时抛出ValueError"""
+    match = BIRTHDATE_PATTERN.match(str(birthdate))
+    if not match:
+        raise ValueError('出生日期格式不正确，请使用 YYYY-MM-DD 格式。')
+    year, month, day = (int(match.group(i)) for i in (1, 2, 3))
+    hour, minute = match.group(4), match.group(5)
+    if birthtime:
+        time_match = BIRTHTIME_PATTERN.match(str(birthtime))
+        if not time_match:
+            raise ValueError('出生时间格式不正确，请使用 HH:MM 格式。')
+        hour, minute = time_match.group(1), time_match.group(2)
+    hour = int(hour) if hour is not None else None
+    minute = int(minute) if minute else 0
+    if not 1 <= month <= 12 or not 1 <= day <= _days_in_month(year, month):
+        raise ValueError('出生日期无效，请检查年月日。')
+    if hour is not None and not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise ValueError('出生时间无效，请检查时分。')
+    return four_pillars(year, month, day, hour, minute)
+
+
+def _days_in_month(year, month):
+    if month == 2:
+        return 29 if year % 4 == 0 and (year % 100 != 0 or year % 400 == 0) else 28
+    return 30 if month in (4, 6, 9, 11) else 31
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='红姐数字能量站八字历法工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help=f'预计算{TABLE_FIRST_YEAR}~{TABLE_LAST_YEAR}年的交节时刻表')
+    build_parser.add_argument('--output', default=os.getenv('SOLAR_TERMS_PATH', DEFAULT_TABLE_PATH))
+    show_parser = subparsers.add_parser('show', help='换算出生时间的四柱')
+    show_parser.add_argument('birthdate', help='YYYY-MM-DD，可带 HH:MM')
+    show_parser.add_argument('birthtime', nargs='?')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        path, size = build_table(args.output)
+        print(f"已生成交节时刻表: {path}（{TABLE_FIRST_YEAR}~{TABLE_LAST_YEAR}年，{size / 1024:.1f}KB）")
+    elif args.command == 'show':
+        print(parse_birth(args.birthdate, args.birthtime).describe())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
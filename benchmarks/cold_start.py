@@ -0,0 +1,117 @@
+# 冷启动探针
+# 每次在全新的Python进程中按Vercel入口（api/index.py）导入应用并处理一个请求，
+# 统计模块导入耗时、首个请求耗时以及已加载的重型依赖，结果输出为JSON；
+# 传入--max-import-ms / --max-first-request-ms 时超出预算以非零状态码退出。
+#
+# 用法：
+#   python benchmarks/cold_start.py --runs 5
+#   python benchmarks/cold_start.py --routes lucky_draw,rankings --local
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from run_benchmarks import ROOT, SCENARIOS  # noqa: E402
+
+HEAVY_MODULES = ('PIL', 'dashscope', 'requests', 'dotenv', 'asyncio', 'httpx')
+
+CHILD_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+sys.path.insert(0, {api!r})
+import index
+imported = time.perf_counter()
+client = index.app.test_client()
+response = client.open({path!r}, method={method!r}, json={payload!r})
+response.get_data()
+finished = time.perf_counter()
+print(json.dumps({{
+    'import_ms': round((imported - started) * 1000, 2),
+    'first_request_ms': round((finished - imported) * 1000, 2),
+    'status': response.status_code,
+    'modules': len(sys.modules),
+    'heavy_modules': [name for name in {heavy!r} if name in sys.modules],
+}}))
+'''
+
+
+def probe(route, local=False):
+    """在新进程中导入应用并请求一次route，返回测量结果"""
+    method, path, payload_fn, _ = SCENARIOS[route]
+    script = CHILD_SCRIPT.format(
+        root=ROOT, api=os.path.join(ROOT, 'api'), path=path, method=method,
+        payload=payload_fn(1314) if payload_fn else None, heavy=HEAVY_MODULES
+    )
+    env = {k: v for k, v in os.environ.items() if k not in ('VERCEL', 'VERCEL_ENV', 'NOW_REGION', 'LAMBDA_TASK_ROOT')}
+    if local:
+        env.update({'DASHSCOPE_API_KEY': env.get('DASHSCOPE_API_KEY', 'cold-start-probe'), 'STARTUP_PREWARM': '0'})
+    else:
+        env['VERCEL'] = '1'
+    output = subprocess.check_output([sys.executable, '-c', script], cwd=ROOT, env=env, stderr=subprocess.DEVNULL)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def summarize(values):
+    values = sorted(values)
+    return {'median': round(statistics.median(values), 2), 'min': values[0], 'max': values[-1]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='冷启动耗时探针')
+    parser.add_argument('--routes', default='lucky_draw,rankings,evaluate,generate_share_card')
+    parser.add_argument('--runs', type=int, default=5, help='每个路由启动的新进程数')
+    parser.add_argument('--local', action='store_true', help='按本地模式（非预设）启动，默认模拟Vercel')
+    parser.add_argument('--output', help='结果JSON路径，默认输出到标准输出')
+    parser.add_argument('--max-import-ms', type=float, help='导入耗时中位数预算（毫秒）')
+    parser.add_argument('--max-first-request-ms', type=float, help='首个请求耗时中位数预算（毫秒）')
+    args = parser.parse_args(argv)
+
+    routes = [r.strip() for r in args.routes.split(',') if r.strip()]
+    unknown = [r for r in routes if r not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知路由场景：{','.join(unknown)}")
+
+    results = []
+    for route in routes:
+        runs = [probe(route, args.local) for _ in range(args.runs)]
+        result = {
+            'route': route,
+            'runs': len(runs),
+            'status': sorted({run['status'] for run in runs}),
+            'import_ms': summarize([run['import_ms'] for run in runs]),
+            'first_request_ms': summarize([run['first_request_ms'] for run in runs]),
+            'modules': runs[-1]['modules'],
+            'heavy_modules': runs[-1]['heavy_modules'],
+        }
+        results.append(result)
+        print(
+            f"{route:<20} import={result['import_ms']['median']}ms "
+            f"first_request={result['first_request_ms']['median']}ms heavy={','.join(result['heavy_modules']) or '-'}",
+            file=sys.stderr
+        )
+
+    report = {'mode': 'local' if args.local else 'vercel', 'python': sys.version.split()[0], 'results': results}
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    over_budget = [
+        r['route'] for r in results
+        if (args.max_import_ms and r['import_ms']['median'] > args.max_import_ms)
+        or (args.max_first_request_ms and r['first_request_ms']['median'] > args.max_first_request_ms)
+    ]
+    if over_budget:
+        print(f"超出冷启动预算：{','.join(over_budget)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
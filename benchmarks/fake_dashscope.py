@@ -0,0 +1,153 @@
+# 本地模拟的通义千问（DashScope）文本生成接口，供压测使用
+# 按可配置的首token延迟、每token延迟和错误率返回结果，支持非流式JSON和SSE流式两种模式。
+# 应用通过 DASHSCOPE_HTTP_BASE_URL（dashscope SDK）或 DASHSCOPE_API_URL（ASGI版）指向这里。
+#
+# 单独运行：python benchmarks/fake_dashscope.py --port 18080 --token-latency 0.02
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GENERATION_PATH = '/api/v1/services/aigc/text-generation/generation'
+
+EVALUATE_RESULT = {
+    'price': '5200',
+    'level': '稀有级',
+    'suggestion': '这个尾号数字组合和谐，谐音寓意积极向上，象征着稳步前行、好运相伴。'
+                  '从传统数字文化来看，它兼具稳定与进取的能量，适合日常使用和商务往来。',
+}
+FILLER = '从传统文化角度来看，这个组合蕴含着积极向上的寓意，象征着好运与顺遂，仅供娱乐参考。'
+
+
+class FakeDashScopeConfig:
+    def __init__(self, first_token_latency=0.3, token_latency=0.02, tokens=120, error_rate=0.0, seed=None):
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+
+    def should_fail(self):
+        with self.lock:
+            self.calls += 1
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+            return failed
+
+
+def build_tokens(prompt, count):
+    """按提示词类型生成回复并切成count个片段（号码评估返回JSON，其余返回长文本）"""
+    if '手机尾号' in prompt:
+        text = json.dumps(EVALUATE_RESULT, ensure_ascii=False)
+    else:
+        text = (FILLER * (count // len(FILLER) + 2))[:max(count * 3, 1)]
+    size = max(1, len(text) // max(count, 1))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class FakeDashScopeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = FakeDashScopeConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if self.path != GENERATION_PATH:
+            self._send_json(404, {'code': 'NotFound', 'message': self.path})
+            return
+        config = self.config
+        if config.should_fail():
+            time.sleep(config.first_token_latency)
+            self._send_json(500, {'code': 'InternalError', 'message': 'injected failure', 'request_id': uuid.uuid4().hex})
+            return
+
+        prompt = (body.get('input') or {}).get('prompt', '')
+        parameters = body.get('parameters') or {}
+        tokens = build_tokens(prompt, config.tokens)
+        usage = {'input_tokens': len(prompt) // 2, 'output_tokens': len(tokens)}
+        usage['total_tokens'] = usage['input_tokens'] + usage['output_tokens']
+        stream = self.headers.get('X-DashScope-SSE') == 'enable' or 'text/event-stream' in self.headers.get('Accept', '')
+        if stream:
+            self._send_stream(tokens, usage, parameters.get('incremental_output', False))
+        else:
+            time.sleep(config.first_token_latency + config.token_latency * len(tokens))
+            self._send_json(200, {
+                'output': {'text': ''.join(tokens), 'finish_reason': 'stop'},
+                'usage': usage,
+                'request_id': uuid.uuid4().hex,
+            })
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, tokens, usage, incremental):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream;charset=UTF-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        request_id = uuid.uuid4().hex
+        time.sleep(self.config.first_token_latency)
+        text = ''
+        for index, token in enumerate(tokens):
+            if index:
+                time.sleep(self.config.token_latency)
+            text += token
+            last = index == len(tokens) - 1
+            payload = {
+                'output': {'text': token if incremental else text, 'finish_reason': 'stop' if last else 'null'},
+                'usage': {**usage, 'output_tokens': index + 1},
+                'request_id': request_id,
+            }
+            event = f'id:{index + 1}\nevent:result\n:HTTP_STATUS/200\ndata:{json.dumps(payload, ensure_ascii=False)}\n\n'
+            self._write_chunk(event.encode('utf-8'))
+        self._write_chunk(b'')
+
+    def _write_chunk(self, data):
+        self.wfile.write(f'{len(data):x}\r\n'.encode('ascii') + data + b'\r\n')
+        self.wfile.flush()
+
+
+def start_fake_dashscope(port=0, config=None):
+    """在后台线程启动模拟服务，返回 (server, 基础URL)"""
+    handler = type('Handler', (FakeDashScopeHandler,), {'config': config or FakeDashScopeConfig()})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/api/v1'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟DashScope文本生成接口')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--first-token-latency', type=float, default=0.3)
+    parser.add_argument('--token-latency', type=float, default=0.02)
+    parser.add_argument('--tokens', type=int, default=120)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    config = FakeDashScopeConfig(args.first_token_latency, args.token_latency, args.tokens, args.error_rate)
+    server, base_url = start_fake_dashscope(args.port, config)
+    print(f"模拟DashScope已启动：DASHSCOPE_HTTP_BASE_URL={base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,359 @@
+# 全路由压测
+# 在子进程中启动应用（Flask开发服务器或uvicorn运行的ASGI版），上游指向本地模拟的DashScope，
+# 按给定并发级别压测各个路由，统计吞吐、p50/p99延迟、首字节时间（TTFB）和应用进程内存增长，
+# 结果写入JSON文件；传入--baseline时与基线比较，超出容忍度则以非零状态码退出，便于部署前拦截性能回退。
+#
+# 用法：
+#   python benchmarks/run_benchmarks.py --concurrency 1,8,32 --requests 200
+#   python benchmarks/run_benchmarks.py --scenarios evaluate,fortune --asgi
+#   python benchmarks/run_benchmarks.py --baseline benchmarks/results/baseline.json
+import argparse
+import datetime
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from fake_dashscope import FakeDashScopeConfig, start_fake_dashscope  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+SURNAMES = '王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗'
+GIVEN_CHARS = '伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰'
+SSE_HEADERS = {'Accept': 'text/event-stream'}
+# SSE响应以第一个非空data行作为首字节，retry/心跳等控制行不算
+SSE_CONTENT = re.compile(rb'^data: [^\n]', re.M)
+
+
+def number_for(key):
+    return f'{key % 10000:04d}'
+
+
+def birthdate_for(key):
+    return (datetime.date(1960, 1, 1) + datetime.timedelta(days=key % 20000)).isoformat()
+
+
+def name_for(key):
+    surname = SURNAMES[key % len(SURNAMES)]
+    key //= len(SURNAMES)
+    first = GIVEN_CHARS[key % len(GIVEN_CHARS)]
+    second = GIVEN_CHARS[(key // len(GIVEN_CHARS)) % len(GIVEN_CHARS)]
+    return surname + first + second
+
+
+# 场景：名称 -> (方法, 路径, 请求体生成函数, 请求头)
+SCENARIOS = {
+    'evaluate': ('POST', '/evaluate', lambda key: {'number': number_for(key)}, {}),
+    'evaluate_sse': ('POST', '/evaluate', lambda key: {'number': number_for(key)}, SSE_HEADERS),
+    'fortune': ('POST', '/fortune', lambda key: {'birthdate': birthdate_for(key)}, SSE_HEADERS),
+    'name_analysis': ('POST', '/name_analysis', lambda key: {'name': name_for(key)}, SSE_HEADERS),
+    'lucky_draw': ('POST', '/lucky_draw', lambda key: {'number': number_for(key)}, {}),
+    'lucky_draw_batch': (
+        'POST', '/lucky_draw_batch', lambda key: {'numbers': [number_for(key + i) for i in range(1000)]}, {}
+    ),
+    'generate_share_card': (
+        'POST', '/generate_share_card',
+        lambda key: {'type': 'number', 'format': 'jpeg',
+                     'content': {'number': number_for(key), 'price': str(3000 + key % 5000), 'level': '稀有级'}},
+        {}
+    ),
+    'rankings': ('GET', '/rankings', None, {}),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def read_rss_kb(pid):
+    """读取进程常驻内存（KB），非Linux平台返回None"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def percentile(sorted_values, pct):
+    """最近秩法百分位数"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize_ms(values):
+    values = sorted(values)
+    if not values:
+        return None
+    to_ms = lambda v: round(v * 1000, 2)
+    return {
+        'p50': to_ms(percentile(values, 50)),
+        'p90': to_ms(percentile(values, 90)),
+        'p99': to_ms(percentile(values, 99)),
+        'max': to_ms(values[-1]),
+        'mean': to_ms(sum(values) / len(values)),
+    }
+
+
+def start_app(port, upstream_url, asgi=False, extra_env=None):
+    """以子进程启动待测应用，等待就绪后返回Popen对象"""
+    env = {k: v for k, v in os.environ.items() if k not in ('VERCEL', 'VERCEL_ENV', 'NOW_REGION', 'LAMBDA_TASK_ROOT')}
+    env.update({
+        'DASHSCOPE_API_KEY': 'benchmark',
+        'DASHSCOPE_HTTP_BASE_URL': upstream_url,
+        'DASHSCOPE_API_URL': upstream_url + '/services/aigc/text-generation/generation',
+        'PYTHONUNBUFFERED': '1',
+        # 压测请求都来自本机同一地址，关闭按客户端限速（全局并发上限仍然生效）
+        'RATE_LIMIT_RATE': '0',
+        # 后台缓存预热会额外调用上游，干扰测量
+        'CACHE_WARMER': '0',
+    })
+    env.update(extra_env or {})
+    if asgi:
+        cmd = [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--host', '127.0.0.1',
+               '--port', str(port), '--log-level', 'warning']
+    else:
+        cmd = [sys.executable, '-c',
+               f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    process = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return process
+
+
+def wait_until_ready(base_url, process, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'应用进程启动失败，退出码 {process.returncode}')
+        try:
+            if requests.get(base_url + '/rankings', timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'应用在{timeout}秒内未就绪')
+
+
+def send_one(session, method, url, payload, headers):
+    """发送一个请求并完整读取响应，返回 (总耗时, 首字节耗时, 是否出错)"""
+    started = time.perf_counter()
+    ttfb = None
+    try:
+        with session.request(method, url, json=payload, headers=headers, stream=True, timeout=120) as resp:
+            sse = 'text/event-stream' in resp.headers.get('Content-Type', '')
+            body = b''
+            for chunk in resp.iter_content(chunk_size=None):
+                body += chunk
+                if ttfb is None and chunk and (not sse or SSE_CONTENT.search(body)):
+                    ttfb = time.perf_counter() - started
+            failed = resp.status_code >= 400 or b'event: error' in body
+    except requests.RequestException:
+        failed = True
+    return time.perf_counter() - started, ttfb, failed
+
+
+def run_level(base_url, scenario, concurrency, total, key_space, rng):
+    """以固定并发发送total个请求，返回原始样本"""
+    method, path, payload_fn, headers = SCENARIOS[scenario]
+    payloads = [payload_fn(rng.randrange(key_space)) if payload_fn else None for _ in range(total)]
+    counter = itertools.count()
+    samples = []
+    samples_lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        local = []
+        while True:
+            index = next(counter)
+            if index >= total:
+                break
+            local.append(send_one(session, method, base_url + path, payloads[index], headers))
+        session.close()
+        with samples_lock:
+            samples.extend(local)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def run_benchmarks(args):
+    config = FakeDashScopeConfig(
+        first_token_latency=args.first_token_latency, token_latency=args.token_latency,
+        tokens=args.tokens, error_rate=args.error_rate, seed=args.seed
+    )
+    upstream, upstream_url = start_fake_dashscope(config=config)
+    port = args.port or free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    process = start_app(port, upstream_url, asgi=args.asgi)
+    results = []
+    try:
+        wait_until_ready(base_url, process, args.startup_timeout)
+        rss_start = read_rss_kb(process.pid)
+        rng = random.Random(args.seed)
+        for scenario in args.scenarios:
+            if args.warmup:
+                run_level(base_url, scenario, 1, args.warmup, args.key_space, rng)
+            for concurrency in args.concurrency:
+                rss_before = read_rss_kb(process.pid)
+                calls_before = config.calls
+                samples, elapsed = run_level(base_url, scenario, concurrency, args.requests, args.key_space, rng)
+                rss_after = read_rss_kb(process.pid)
+                errors = sum(1 for _, _, failed in samples if failed)
+                result = {
+                    'scenario': scenario,
+                    'concurrency': concurrency,
+                    'requests': len(samples),
+                    'errors': errors,
+                    'error_rate': round(errors / len(samples), 4) if samples else 0,
+                    'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+                    'latency_ms': summarize_ms([total for total, _, _ in samples]),
+                    'ttfb_ms': summarize_ms([ttfb for _, ttfb, _ in samples if ttfb is not None]),
+                    'upstream_calls': config.calls - calls_before,
+                    'rss_kb_before': rss_before,
+                    'rss_kb_after': rss_after,
+                    'rss_growth_kb': rss_after - rss_before if rss_before and rss_after else None,
+                }
+                results.append(result)
+                print_result(result)
+        rss_end = read_rss_kb(process.pid)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        upstream.shutdown()
+
+    return {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'server': 'asgi' if args.asgi else 'flask',
+            'config': {
+                'concurrency': args.concurrency, 'requests': args.requests, 'warmup': args.warmup,
+                'key_space': args.key_space, 'seed': args.seed,
+                'first_token_latency': args.first_token_latency, 'token_latency': args.token_latency,
+                'tokens': args.tokens, 'error_rate': args.error_rate,
+            },
+            'rss_kb_start': rss_start,
+            'rss_kb_end': rss_end,
+        },
+        'results': results,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(result):
+    latency = result['latency_ms'] or {}
+    ttfb = result['ttfb_ms'] or {}
+    print(
+        f"{result['scenario']:<20} c={result['concurrency']:<4} "
+        f"rps={result['throughput_rps']:<9} p50={latency.get('p50')}ms p99={latency.get('p99')}ms "
+        f"ttfb_p50={ttfb.get('p50')}ms errors={result['errors']} "
+        f"upstream={result['upstream_calls']} rss+={result['rss_growth_kb']}KB"
+    )
+
+
+def compare_with_baseline(report, baseline, tolerance):
+    """与基线比较吞吐、p99延迟和错误率，返回回退描述列表"""
+    previous = {(r['scenario'], r['concurrency']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        base = previous.get((result['scenario'], result['concurrency']))
+        if not base:
+            continue
+        name = f"{result['scenario']} c={result['concurrency']}"
+        if base.get('throughput_rps') and result['throughput_rps'] < base['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: 吞吐 {base['throughput_rps']} -> {result['throughput_rps']} rps")
+        base_p99 = (base.get('latency_ms') or {}).get('p99')
+        p99 = (result['latency_ms'] or {}).get('p99')
+        if base_p99 and p99 and p99 > base_p99 * (1 + tolerance):
+            regressions.append(f"{name}: p99 {base_p99} -> {p99} ms")
+        if result['error_rate'] > base.get('error_rate', 0) + 0.01:
+            regressions.append(f"{name}: 错误率 {base.get('error_rate', 0)} -> {result['error_rate']}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='红姐数字能量站全路由压测')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"逗号分隔的场景，可选：{','.join(SCENARIOS)}")
+    parser.add_argument('--concurrency', default='1,8,32', help='逗号分隔的并发级别')
+    parser.add_argument('--requests', type=int, default=200, help='每个并发级别发送的请求数')
+    parser.add_argument('--warmup', type=int, default=10, help='每个场景正式压测前的预热请求数')
+    parser.add_argument('--key-space', type=int, default=1000, help='输入取值空间大小，越小缓存命中率越高')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--first-token-latency', type=float, default=0.3, help='模拟上游首token延迟（秒）')
+    parser.add_argument('--token-latency', type=float, default=0.02, help='模拟上游每token延迟（秒）')
+    parser.add_argument('--tokens', type=int, default=120, help='模拟上游每次生成的token数')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='模拟上游错误率（0-1）')
+    parser.add_argument('--asgi', action='store_true', help='压测uvicorn运行的ASGI版本')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--startup-timeout', type=float, default=30)
+    parser.add_argument('--output', help='结果JSON路径，默认写入benchmarks/results/')
+    parser.add_argument('--baseline', help='基线结果JSON，超出容忍度时以状态码1退出')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='相对基线允许的性能波动比例')
+    args = parser.parse_args(argv)
+    args.scenarios = [s.strip() for s in args.scenarios.split(',') if s.strip()]
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知场景：{','.join(unknown)}")
+    args.concurrency = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_benchmarks(args)
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"bench-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare_with_baseline(report, json.load(f), args.tolerance)
+        if regressions:
+            print('发现性能回退：')
+            for line in regressions:
+                print(f'  - {line}')
+            return 1
+        print('与基线相比未发现性能回退')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,325 @@
+# 结果缓存组件
+# 有界LRU + 单条TTL，线程安全，带命中/未命中/淘汰计数
+# 可选SQLite共享后端，同一主机上的多个worker共用缓存
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+def normalize_input(data):
+    """规范化输入：全角转半角、去首尾空白、合并连续空白"""
+    if isinstance(data, str):
+        return ' '.join(unicodedata.normalize('NFKC', data).split())
+    if isinstance(data, dict):
+        return {str(k): normalize_input(v) for k, v in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [normalize_input(item) for item in data]
+    return data
+
+
+def make_cache_key(prefix, data, version='', params=None):
+    """基于内容摘要生成稳定的缓存键
+
+    不依赖Python进程内随机化的hash()，不同worker、重启后的worker都能复用。
+    """
+    payload = json.dumps(
+        {'data': normalize_input(data), 'version': version, 'params': params or {}},
+        ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str
+    )
+    digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+    return f"{prefix}:{digest}"
+
+
+def estimate_size(key, value):
+    """粗略估算一条缓存占用的字节数"""
+    size = sys.getsizeof(key)
+    if isinstance(value, (str, bytes)):
+        size += sys.getsizeof(value)
+    elif isinstance(value, (list, tuple)):
+        size += sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    else:
+        size += sys.getsizeof(value)
+    return size
+
+
+class LRUCache:
+    """有界的LRU+TTL内存缓存
+
+    - max_entries：最多保存的条目数
+    - max_bytes：估算内存上限，超过后从最久未使用的条目开始淘汰
+    - ttl：默认过期时间（秒），set时可单独指定
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=32 * 1024 * 1024, ttl=300, sweep_interval=30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._data = OrderedDict()  # key -> (value, expires_at, size)
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._last_sweep = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """读取缓存，过期或不存在返回None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size = entry
+            if expires_at <= now:
+                self._remove(key, size)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """写入缓存，必要时淘汰过期和最久未使用的条目"""
+        now = time.monotonic()
+        size = estimate_size(key, value)
+        if size > self.max_bytes:
+            return False
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep_expired(now)
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, _, evicted_size) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+        return True
+
+    def ttl_remaining(self, key):
+        """条目剩余有效期（秒），不存在或已过期为0；不计入命中统计，也不改变LRU顺序"""
+        with self._lock:
+            entry = self._data.get(key)
+        return max(0.0, entry[1] - time.monotonic()) if entry is not None else 0.0
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._remove(key, entry[2])
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+    def _remove(self, key, size):
+        del self._data[key]
+        self._bytes -= size
+
+    def _sweep_expired(self, now):
+        """定期清理过期条目，避免冷门key一直占用内存"""
+        expired = [key for key, (_, expires_at, _) in self._data.items() if expires_at <= now]
+        for key in expired:
+            self._remove(key, self._data[key][2])
+        self.expirations += len(expired)
+        self._last_sweep = now
+
+
+class SQLiteCache:
+    """基于SQLite（WAL模式）的共享磁盘缓存
+
+    同一主机上的所有worker进程读写同一个数据库文件，
+    一次上游调用的结果可以被所有worker复用。
+    """
+
+    def __init__(self, path, max_entries=100000, ttl=300, sweep_interval=60):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_sweep = time.time()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'expires_at REAL NOT NULL, updated_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache (expires_at)')
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        return self.get_with_ttl(key)[0]
+
+    def get_with_ttl(self, key):
+        """读取缓存并返回剩余有效期，用于回填上层内存缓存"""
+        try:
+            row = self._conn().execute(
+                'SELECT value, expires_at FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"SQLite缓存读取失败: {str(e)}")
+            self.errors += 1
+            return None, 0
+        remaining = row[1] - time.time() if row else 0
+        if row is None or remaining <= 0:
+            self.misses += 1
+            return None, 0
+        self.hits += 1
+        return row[0], remaining
+
+    def ttl_remaining(self, key):
+        """条目剩余有效期（秒），不存在、已过期或读取失败为0；不计入命中统计"""
+        try:
+            row = self._conn().execute('SELECT expires_at FROM cache WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error:
+            return 0.0
+        return max(0.0, row[0] - time.time()) if row else 0.0
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        try:
+            conn = self._conn()
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires_at, updated_at) VALUES (?, ?, ?, ?)',
+                (key, value, expires_at, now)
+            )
+            if now - self._last_sweep >= self.sweep_interval:
+                self._sweep(conn, now)
+        except sqlite3.Error as e:
+            print(f"SQLite缓存写入失败: {str(e)}")
+            self.errors += 1
+            return False
+        return True
+
+    def delete(self, key):
+        try:
+            self._conn().execute('DELETE FROM cache WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            print(f"SQLite缓存删除失败: {str(e)}")
+            self.errors += 1
+
+    def clear(self):
+        self._conn().execute('DELETE FROM cache')
+
+    def _sweep(self, conn, now):
+        """清理过期条目，并把总条目数控制在上限内"""
+        with self._lock:
+            self._last_sweep = now
+        conn.execute('DELETE FROM cache WHERE expires_at <= ?', (now,))
+        count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY updated_at LIMIT ?)',
+                (overflow,)
+            )
+            self.evictions += overflow
+
+    def stats(self):
+        try:
+            entries = self._conn().execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        except sqlite3.Error:
+            entries = -1
+        lookups = self.hits + self.misses
+        return {
+            'path': self.path,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'errors': self.errors,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class TieredCache:
+    """两级缓存：进程内LRU在前，共享SQLite在后"""
+
+    def __init__(self, local, shared):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            return value
+        value, remaining = self.shared.get_with_ttl(key)
+        if value is not None:
+            self.local.set(key, value, ttl=min(remaining, self.local.ttl))
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.local.set(key, value, ttl=ttl)
+        return self.shared.set(key, value, ttl=ttl)
+
+    def ttl_remaining(self, key):
+        # 取两层中较长的：其他进程刷新了共享层时，本进程本地层的旧条目不应让预热误判为即将过期
+        return max(self.local.ttl_remaining(key), self.shared.ttl_remaining(key))
+
+    def delete(self, key):
+        self.local.delete(key)
+        self.shared.delete(key)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def stats(self):
+        stats = self.local.stats()
+        stats['shared'] = self.shared.stats()
+        return stats
+
+    def __len__(self):
+        return len(self.local)
@@ -0,0 +1,288 @@
+# /evaluate 热门号码缓存预热
+# - SpaceSaving：固定容量的热门项统计（Space-Saving算法），用O(容量)的内存近似统计请求最多的号码，
+#   定期衰减计数，让过气的热点逐渐让位
+# - CacheWarmer：后台线程定期检查热门号码、固定预热号码和排行榜最近评估的号码，
+#   缓存缺失或即将过期时提前刷新；刷新走有界线程池并按令牌桶限速，上游繁忙或熔断时跳过本轮
+#
+# 后台预热默认关闭，在一个进程上设置CACHE_WARMER=1启用（多个进程同时开启会重复预热同一批号码）。
+# 直播前批量预热：python cache_warmer.py seed --url http://127.0.0.1:5000 --file numbers.txt
+# seed/status调用服务的 /cache/warm 接口，服务端需要：
+#   - CACHE_WARMER=1，否则接口返回503；
+#   - 多worker部署时配置CACHE_SQLITE_PATH启用共享缓存，否则预热结果只写入接手该请求的那个worker的进程内缓存
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from resilience import TokenBucket
+
+
+class SpaceSaving:
+    """Space-Saving热门项统计：最多跟踪capacity个项，每项的计数误差不超过error
+
+    按计数分桶（计数 -> 项集合）并记录最小计数，offer为O(1)：
+    表满时新项替换最小计数桶中的任意一项，继承其计数加1，并把被替换项的计数记为误差上界。
+    """
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self._counts = {}     # 项 -> (计数, 误差)
+        self._buckets = {}    # 计数 -> 项集合
+        self._min_count = 0
+        self._lock = threading.Lock()
+
+    def offer(self, item):
+        with self._lock:
+            entry = self._counts.get(item)
+            if entry is not None:
+                count, error = entry
+                self._move(item, count, count + 1)
+                self._counts[item] = (count + 1, error)
+                if count == self._min_count and count not in self._buckets:
+                    self._min_count = count + 1
+                return
+            if len(self._counts) < self.capacity:
+                self._counts[item] = (1, 0)
+                self._buckets.setdefault(1, set()).add(item)
+                self._min_count = 1
+                return
+            bucket = self._buckets[self._min_count]
+            evicted = bucket.pop()
+            del self._counts[evicted]
+            error = self._min_count
+            if not bucket:
+                del self._buckets[self._min_count]
+            self._counts[item] = (error + 1, error)
+            self._buckets.setdefault(error + 1, set()).add(item)
+            if error not in self._buckets:
+                self._min_count = error + 1
+
+    def _move(self, item, old, new):
+        bucket = self._buckets[old]
+        bucket.discard(item)
+        if not bucket:
+            del self._buckets[old]
+        self._buckets.setdefault(new, set()).add(item)
+
+    def top(self, n, min_count=1):
+        """按计数从高到低返回最多n个 (项, 计数, 误差)"""
+        with self._lock:
+            items = [(item, count, error) for item, (count, error) in self._counts.items() if count >= min_count]
+        items.sort(key=lambda entry: (-entry[1], entry[2]))
+        return items[:n]
+
+    def decay(self, factor=0.5):
+        """所有计数按factor衰减，计数降为0的项被移出"""
+        with self._lock:
+            counts = {}
+            for item, (count, error) in self._counts.items():
+                count = int(count * factor)
+                if count > 0:
+                    counts[item] = (count, int(error * factor))
+            self._counts = counts
+            self._buckets = {}
+            for item, (count, _) in counts.items():
+                self._buckets.setdefault(count, set()).add(item)
+            self._min_count = min(self._buckets) if self._buckets else 0
+
+    def __len__(self):
+        return len(self._counts)
+
+
+class CacheWarmer:
+    """后台缓存预热
+
+    - candidates()：返回本轮需要保持热度的号码（固定预热号码、排行榜最近评估等，热门统计由本类自己合并）
+    - ttl_remaining(号码)：缓存剩余有效期（秒），不存在为0
+    - refresh(号码)：调用上游重新生成并写入缓存，成功返回True
+    - has_capacity()：上游是否有余量（并发未满、未熔断），没有余量时推迟刷新，不与用户请求争抢
+    """
+
+    def __init__(self, refresh, ttl_remaining, candidates=None, has_capacity=None, interval=30,
+                 refresh_ahead=60, top_n=20, min_hits=2, max_workers=2, rate=1.0,
+                 decay_interval=600, sketch_capacity=256):
+        self.refresh = refresh
+        self.ttl_remaining = ttl_remaining
+        self.candidates = candidates or (lambda: [])
+        self.has_capacity = has_capacity or (lambda: True)
+        self.interval = interval
+        self.refresh_ahead = refresh_ahead
+        self.top_n = top_n
+        self.min_hits = min_hits
+        self.decay_interval = decay_interval
+        self.sketch = SpaceSaving(sketch_capacity)
+        self._rate = TokenBucket(rate)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='cache-warmer')
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._pinned = {}     # 号码 -> 保持预热的截止时间
+        self._stop = threading.Event()
+        self._thread = None
+        self.refreshed = 0
+        self.failed = 0
+        self.deferred = 0
+
+    def record(self, number):
+        """记录一次请求，用于热门统计"""
+        self.sketch.offer(number)
+
+    def pin(self, numbers, duration):
+        """在duration秒内持续保持这些号码的缓存热度（直播期间）"""
+        until = time.monotonic() + duration
+        with self._lock:
+            for number in numbers:
+                self._pinned[number] = max(until, self._pinned.get(number, 0))
+
+    def hot_numbers(self):
+        """本轮需要检查的号码：热门统计 + 固定/临时预热号码 + candidates()，去重并保持顺序"""
+        now = time.monotonic()
+        with self._lock:
+            self._pinned = {number: until for number, until in self._pinned.items() if until > now}
+            pinned = list(self._pinned)
+        hot = [item for item, _, _ in self.sketch.top(self.top_n, self.min_hits)]
+        return list(dict.fromkeys(hot + pinned + list(self.candidates())))
+
+    def enqueue(self, numbers, force=False):
+        """把缓存缺失或即将过期的号码交给线程池刷新，返回 (已排队数, 因仍新鲜而跳过数)"""
+        queued = skipped = 0
+        for number in numbers:
+            if not force and self.ttl_remaining(number) > self.refresh_ahead:
+                skipped += 1
+                continue
+            with self._lock:
+                if number in self._pending:
+                    continue
+                self._pending.add(number)
+            self._pool.submit(self._refresh_one, number)
+            queued += 1
+        return queued, skipped
+
+    def _refresh_one(self, number):
+        try:
+            self._rate.acquire()
+            if not self.has_capacity():
+                self.deferred += 1
+                return
+            if self.refresh(number):
+                self.refreshed += 1
+            else:
+                self.failed += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"缓存预热失败 {number}: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.discard(number)
+
+    def run_once(self):
+        return self.enqueue(self.hot_numbers())
+
+    def _loop(self):
+        last_decay = time.monotonic()
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+                if time.monotonic() - last_decay >= self.decay_interval:
+                    self.sketch.decay()
+                    last_decay = time.monotonic()
+            except Exception as e:
+                print(f"缓存预热轮询失败: {str(e)}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name='cache-warmer', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def stats(self):
+        return {
+            'pending': self.pending,
+            'refreshed': self.refreshed,
+            'failed': self.failed,
+            'deferred': self.deferred,
+            'pinned': len(self._pinned),
+            'hot': [{'number': item, 'count': count, 'error': error}
+                    for item, count, error in self.sketch.top(self.top_n)],
+        }
+
+
+def _request(url, token=None, payload=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers=headers, method='POST' if data else 'GET')
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def read_numbers(path):
+    """读取号码列表：每行一个或以逗号/空白分隔，#开头为注释"""
+    with (sys.stdin if path == '-' else open(path, encoding='utf-8')) as f:
+        numbers = []
+        for line in f:
+            line = line.split('#', 1)[0]
+            numbers.extend(part for part in line.replace(',', ' ').split() if part)
+    return list(dict.fromkeys(numbers))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='红姐数字能量站缓存预热工具',
+        epilog='服务端需设置CACHE_WARMER=1；多worker部署还需设置CACHE_SQLITE_PATH共享缓存，否则预热只对单个worker生效。'
+    )
+    parser.add_argument('--url', default=os.getenv('CACHE_WARM_URL', 'http://127.0.0.1:5000'), help='服务地址')
+    parser.add_argument('--token', default=os.getenv('CACHE_WARM_TOKEN'), help='预热接口令牌')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    seed_parser = subparsers.add_parser('seed', help='直播前按号码列表预热/evaluate缓存')
+    seed_parser.add_argument('--file', required=True, help='号码列表文件，-表示标准输入')
+    seed_parser.add_argument('--keep-warm', type=float, default=0, help='之后持续保持热度的秒数（覆盖直播时长）')
+    seed_parser.add_argument('--force', action='store_true', help='即使缓存仍新鲜也重新生成')
+    seed_parser.add_argument('--wait', action='store_true', help='等待预热完成再退出')
+    subparsers.add_parser('status', help='查看预热状态和热门号码')
+    args = parser.parse_args(argv)
+
+    endpoint = args.url.rstrip('/') + '/cache/warm'
+    try:
+        if args.command == 'seed':
+            numbers = read_numbers(args.file)
+            result = _request(endpoint, args.token, {
+                'numbers': numbers, 'keep_warm': args.keep_warm, 'force': args.force
+            })
+            print(f"已提交{len(numbers)}个号码：排队{result['queued']}个，缓存仍新鲜跳过{result['skipped']}个")
+            if not result.get('shared_cache', True):
+                print('提示：服务未启用共享缓存（CACHE_SQLITE_PATH），预热结果只在接手本次请求的worker中生效', file=sys.stderr)
+            while args.wait:
+                status = _request(endpoint, args.token)
+                if not status['pending']:
+                    print(f"预热完成：累计刷新{status['refreshed']}个，失败{status['failed']}个，推迟{status['deferred']}个")
+                    break
+                time.sleep(1)
+        else:
+            print(json.dumps(_request(endpoint, args.token), ensure_ascii=False, indent=2))
+    except urllib.error.HTTPError as e:
+        print(f"预热请求失败：HTTP {e.code} {e.read().decode('utf-8', 'replace')}", file=sys.stderr)
+        if e.code == 503:
+            print('服务端未启用缓存预热：请设置环境变量CACHE_WARMER=1后重启服务（预设模式下无需预热）', file=sys.stderr)
+        return 1
+    except urllib.error.URLError as e:
+        print(f"无法连接服务：{e.reason}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
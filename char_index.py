@@ -0,0 +1,321 @@
+# 汉字属性索引
+# 离线从Unicode汉字数据库（Unihan）中提取常用汉字（U+3400~U+9FFF）的笔画、康熙笔画、部首、
+# 拼音声调和字音五行，写入按码位直接寻址的定长记录数组，运行时通过mmap加载，单字查询O(1)。
+# 姓名的字音、笔画、五格三才等特征在本地算好，大模型只负责写解读文字；
+# 缓存键取自这些特征，相同特征的姓名共享同一份解读。
+#
+# 字音五行按现代声母对应五音的常见口径：
+#   唇音 b p m f 属水，舌音 d t n l 属火，牙音 g k 属木，
+#   喉音 h 及零声母属土，齿音 j q x z c s zh ch sh r 属金
+#
+# 本功能需要手动开启：索引文件不随仓库提交，Vercel构建也不会生成。
+# 未构建索引时姓名解读与原来一样直接把姓名交给大模型，本地特征和按特征共享缓存都不生效。
+# 开启方法：下载Unihan.zip后构建，把生成的文件随部署一起发布（或用CHAR_INDEX_PATH指定位置）：
+#   python char_index.py build --unihan Unihan.zip [--output data/char_index.bin]
+# Unihan.zip 下载地址：https://www.unicode.org/Public/UCD/latest/ucd/Unihan.zip
+import argparse
+import io
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+import unicodedata
+import zipfile
+from collections import namedtuple
+
+INDEX_MAGIC = b'HJCI'
+INDEX_VERSION = 1
+FIRST_CODEPOINT, LAST_CODEPOINT = 0x3400, 0x9FFF   # 扩展A区 + 基本区
+HEADER = struct.Struct('<4sIIII')  # 魔数、版本、起始码位、记录数、拼音表条数
+# 笔画、康熙笔画、部首号、是否简化部首、声调、五行序号、拼音表下标；笔画为0表示无此字
+RECORD = struct.Struct('<BBBBBBH')
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'char_index.bin')
+
+ELEMENTS = '木火土金水'
+TONE_NAMES = ('轻声', '阴平', '阳平', '上声', '去声')
+TONE_MARKS = {'\u0304': 1, '\u0301': 2, '\u030c': 3, '\u0300': 4}  # 组合用声调符号：ˉ ˊ ˇ ˋ
+INITIAL_ELEMENTS = (
+    (('zh', 'ch', 'sh', 'j', 'q', 'x', 'z', 'c', 's', 'r'), '金'),
+    (('b', 'p', 'm', 'f'), '水'),
+    (('d', 't', 'n', 'l'), '火'),
+    (('g', 'k'), '木'),
+)
+# 康熙部首（U+2F00起的214个部首兼容字符规范化后即为对应汉字）及常见的简化部首写法
+RADICALS = tuple(unicodedata.normalize('NFKC', chr(0x2F00 + i)) for i in range(214))
+SIMPLIFIED_RADICALS = {
+    120: '纟', 147: '见', 149: '讠', 154: '贝', 159: '车', 167: '钅', 168: '长', 169: '门',
+    178: '韦', 181: '页', 182: '风', 184: '饣', 187: '马', 195: '鱼', 196: '鸟', 197: '卤',
+    199: '麦', 205: '黾', 210: '齐', 211: '齿', 212: '龙', 213: '龟',
+}
+COMPOUND_SURNAMES = frozenset((
+    '欧阳', '司马', '诸葛', '上官', '东方', '皇甫', '尉迟', '公孙', '慕容', '令狐', '长孙', '宇文',
+    '司徒', '司空', '夏侯', '端木', '轩辕', '西门', '南宫', '独孤', '百里', '呼延', '万俟', '闻人',
+    '澹台', '公冶', '宗政', '濮阳', '淳于', '单于', '太叔', '申屠', '钟离', '拓跋', '第五', '东郭',
+))
+RS_PATTERN = re.compile(r"^(\d+)('*)\.-?\d+")
+
+CharInfo = namedtuple('CharInfo', ['char', 'pinyin', 'tone', 'strokes', 'kangxi_strokes', 'radical', 'element'])
+
+
+def pinyin_tone(reading):
+    """带调拼音拆成 (无调拼音, 声调)，声调0表示轻声"""
+    tone = 0
+    letters = []
+    for ch in unicodedata.normalize('NFD', reading.lower()):
+        if ch in TONE_MARKS:
+            tone = TONE_MARKS[ch]
+        else:
+            letters.append(ch)
+    return unicodedata.normalize('NFC', ''.join(letters)), tone
+
+
+def pinyin_element(syllable):
+    """按声母所属五音取字音五行，零声母（含y、w开头）属土"""
+    for initials, element in INITIAL_ELEMENTS:
+        if syllable.startswith(initials):
+            return element
+    return '土'
+
+
+def wuge_element(strokes):
+    """五格数理的五行：尾数1、2属木，3、4属火，5、6属土，7、8属金，9、0属水"""
+    return ELEMENTS[(strokes - 1) % 10 // 2]
+
+
+class NameFeatures(namedtuple('NameFeatures', ['surname', 'given'])):
+    """姓名特征：姓和名各自的CharInfo序列"""
+    __slots__ = ()
+
+    @classmethod
+    def from_key(cls, key):
+        """由key()还原（不含汉字本身），供预设响应使用"""
+        return cls(*(tuple(CharInfo('', *item) for item in key[part]) for part in ('surname', 'given')))
+
+    @property
+    def chars(self):
+        return self.surname + self.given
+
+    @property
+    def elements(self):
+        return ''.join(info.element for info in self.chars)
+
+    @property
+    def tones(self):
+        """平仄：阴平、阳平为平，上声、去声为仄"""
+        return ''.join('平' if info.tone in (1, 2) else '仄' if info.tone else '轻' for info in self.chars)
+
+    def wuge(self):
+        """按康熙笔画计算五格（天格、人格、地格、外格、总格）"""
+        surname = [info.kangxi_strokes for info in self.surname]
+        given = [info.kangxi_strokes for info in self.given]
+        heaven = sum(surname) if len(surname) > 1 else surname[0] + 1
+        earth = sum(given) if len(given) > 1 else given[0] + 1
+        person = surname[-1] + given[0]
+        return {
+            '天格': heaven,
+            '人格': person,
+            '地格': earth,
+            '外格': heaven + earth - person,
+            '总格': sum(surname) + sum(given),
+        }
+
+    def sancai(self):
+        """三才配置：天格、人格、地格的五行"""
+        grids = self.wuge()
+        return ''.join(wuge_element(grids[name]) for name in ('天格', '人格', '地格'))
+
+    def describe(self):
+        """供提示词使用的文字描述（不含姓名本身）"""
+        parts = []
+        for label, chars in (('姓', self.surname), ('名', self.given)):
+            for position, info in enumerate(chars, 1):
+                name = label if len(chars) == 1 else f'{label}第{position}字'
+                parts.append(f'{name}：{info.pinyin}（{TONE_NAMES[info.tone]}），{info.strokes}画'
+                             f'（康熙{info.kangxi_strokes}画），部首{info.radical}，字音五行属{info.element}')
+        grids = '、'.join(f'{name}{value}（{wuge_element(value)}）' for name, value in self.wuge().items())
+        return (f"{'；'.join(parts)}。声调{self.tones}，字音五行{self.elements}；"
+                f"五格：{grids}；三才配置{self.sancai()}")
+
+    def key(self):
+        """缓存键和预设路由使用的结构化输入：只取特征，不含汉字本身"""
+        return {part: [list(info[1:]) for info in chars] for part, chars in zip(self._fields, self)}
+
+
+def _unihan_lines(source):
+    """逐行读取Unihan数据：支持官方Unihan.zip、解压后的目录或单个txt文件"""
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.endswith('.txt'):
+                with open(os.path.join(source, name), encoding='utf-8') as f:
+                    yield from f
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for name in sorted(archive.namelist()):
+                if name.endswith('.txt'):
+                    with archive.open(name) as f:
+                        yield from io.TextIOWrapper(f, encoding='utf-8')
+    else:
+        with open(source, encoding='utf-8') as f:
+            yield from f
+
+
+def read_unihan(source, fields=('kTotalStrokes', 'kRSUnicode', 'kMandarin', 'kTraditionalVariant')):
+    """读取Unihan中需要的字段，返回 {码位: {字段: 值}}"""
+    data = {}
+    for line in _unihan_lines(source):
+        if not line.startswith('U+'):
+            continue
+        code, field, value = line.rstrip('\n').split('\t', 2)
+        if field in fields:
+            data.setdefault(int(code[2:], 16), {})[field] = value
+    return data
+
+
+def _kangxi_strokes(entry, data):
+    """康熙笔画：取繁体字形的笔画数，没有繁体变体时取繁体（zh-Hant）笔画"""
+    variant = entry.get('kTraditionalVariant')
+    if variant:
+        traditional = data.get(int(variant.split()[0][2:], 16), {}).get('kTotalStrokes')
+        if traditional:
+            return int(traditional.split()[-1])
+    return int(entry['kTotalStrokes'].split()[-1])
+
+
+def build_index(source, path=DEFAULT_INDEX_PATH):
+    """由Unihan数据生成索引文件：文件头 + 定长记录数组 + 换行分隔的拼音表"""
+    data = read_unihan(source)
+    count = LAST_CODEPOINT - FIRST_CODEPOINT + 1
+    records = bytearray(RECORD.size * count)
+    syllables = {}
+    covered = 0
+    for code in range(FIRST_CODEPOINT, LAST_CODEPOINT + 1):
+        entry = data.get(code)
+        if not entry or not all(field in entry for field in ('kTotalStrokes', 'kRSUnicode', 'kMandarin')):
+            continue
+        match = RS_PATTERN.match(entry['kRSUnicode'])
+        if not match:
+            continue
+        reading = entry['kMandarin'].split()[0]
+        syllable, tone = pinyin_tone(reading)
+        RECORD.pack_into(
+            records, RECORD.size * (code - FIRST_CODEPOINT),
+            int(entry['kTotalStrokes'].split()[0]), _kangxi_strokes(entry, data),
+            int(match.group(1)), 1 if match.group(2) else 0, tone,
+            ELEMENTS.index(pinyin_element(syllable)), syllables.setdefault(reading, len(syllables))
+        )
+        covered += 1
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(INDEX_MAGIC, INDEX_VERSION, FIRST_CODEPOINT, count, len(syllables)))
+        f.write(records)
+        f.write('\n'.join(syllables).encode('utf-8'))
+    os.replace(tmp_path, path)
+    return path, covered, os.path.getsize(path)
+
+
+class CharIndex:
+    """只读的mmap汉字索引，多线程可并发读取"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._first, self._count, syllable_count = HEADER.unpack_from(self._mmap, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            self._mmap.close()
+            raise ValueError(f"汉字索引格式不匹配: {path}")
+        self._syllables = self._mmap[HEADER.size + RECORD.size * self._count:].decode('utf-8').split('\n')
+        if len(self._syllables) != syllable_count:
+            self._mmap.close()
+            raise ValueError(f"汉字索引拼音表损坏: {path}")
+
+    def lookup(self, char):
+        """查询单个汉字，索引中没有时返回None"""
+        offset = ord(char) - self._first if len(char) == 1 else -1
+        if not 0 <= offset < self._count:
+            return None
+        strokes, kangxi, radical, simplified, tone, element, syllable = RECORD.unpack_from(
+            self._mmap, HEADER.size + RECORD.size * offset
+        )
+        if not strokes:
+            return None
+        radical_char = SIMPLIFIED_RADICALS.get(radical) if simplified else None
+        return CharInfo(char, self._syllables[syllable], tone, strokes, kangxi,
+                        radical_char or RADICALS[radical - 1], ELEMENTS[element])
+
+
+_index = None
+_index_loaded = False
+_index_lock = threading.Lock()
+
+
+def load_index(path=None):
+    """加载汉字索引（进程内只加载一次），文件不存在时返回None"""
+    global _index, _index_loaded
+    if not _index_loaded:
+        with _index_lock:
+            if not _index_loaded:
+                path = path or os.getenv('CHAR_INDEX_PATH', DEFAULT_INDEX_PATH)
+                if os.path.exists(path):
+                    try:
+                        _index = CharIndex(path)
+                        print(f"汉字索引加载成功: {path}")
+                    except (OSError, ValueError) as e:
+                        print(f"汉字索引加载失败，姓名解读改为由大模型分析: {str(e)}")
+                else:
+                    print(f"未构建汉字索引（{path}），本地姓名特征未启用，姓名解读由大模型分析")
+                _index_loaded = True
+    return _index
+
+
+def split_name(name):
+    """拆分姓和名：前两字为常见复姓且名字至少一个字时按复姓处理"""
+    if len(name) >= 3 and name[:2] in COMPOUND_SURNAMES:
+        return name[:2], name[2:]
+    return name[:1], name[1:]
+
+
+def analyze_name(name):
+    """计算姓名特征；索引未构建、姓名不是2~4个汉字或含索引外的字时返回None"""
+    index = load_index()
+    name = ''.join(unicodedata.normalize('NFKC', str(name)).split())
+    if index is None or not 2 <= len(name) <= 4:
+        return None
+    infos = []
+    for char in name:
+        info = index.lookup(char)
+        if info is None:
+            return None
+        infos.append(info)
+    surname, _ = split_name(name)
+    return NameFeatures(tuple(infos[:len(surname)]), tuple(infos[len(surname):]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='红姐数字能量站汉字属性索引工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='由Unihan数据生成汉字属性索引')
+    build_parser.add_argument('--unihan', default=os.getenv('UNIHAN_PATH'), required=not os.getenv('UNIHAN_PATH'),
+                              help='Unihan.zip、解压后的目录或单个txt文件')
+    build_parser.add_argument('--output', default=os.getenv('CHAR_INDEX_PATH', DEFAULT_INDEX_PATH))
+    show_parser = subparsers.add_parser('show', help='查看姓名的本地特征')
+    show_parser.add_argument('name')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        path, covered, size = build_index(args.unihan, args.output)
+        print(f"已生成汉字索引: {path}（收录{covered}字，{size / 1024:.1f}KB）")
+    elif args.command == 'show':
+        features = analyze_name(args.name)
+        if features is None:
+            print('无法计算该姓名的特征（索引未构建，或姓名不是2~4个索引内的汉字）')
+            return 1
+        print(features.describe())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
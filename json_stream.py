@@ -0,0 +1,138 @@
+# 增量JSON字段解析
+# 大模型流式输出的JSON对象逐段喂入，每个顶层字段的值一完整就立即产出，
+# 不需要等待整段生成结束；结束后再按字段表做一次结构校验
+import json
+
+WHITESPACE = ' \t\r\n'
+
+
+class JSONFieldStream:
+    """逐段解析一个JSON对象，产出已完整的顶层字段 (字段名, 值)
+
+    对象之前的说明文字、```json 代码块标记会被跳过；
+    嵌套对象/数组作为一个整体值在闭合后产出。
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._pos = 0
+        self._state = 'start'   # start -> key -> colon -> value -> after_value -> ... -> end
+        self._token_start = 0
+        self._key = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.fields = {}
+
+    @property
+    def done(self):
+        return self._state == 'end'
+
+    def feed(self, text):
+        """喂入一段文本，返回本段新完成的字段列表"""
+        if self._state == 'end' or not text:
+            return []
+        self._buffer += text
+        completed = []
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer) and self._state != 'end':
+            ch = buffer[pos]
+            state = self._state
+            if state == 'start':
+                if ch == '{':
+                    self._state = 'key'
+            elif state == 'key':
+                if self._in_string:
+                    if self._escape:
+                        self._escape = False
+                    elif ch == '\\':
+                        self._escape = True
+                    elif ch == '"':
+                        self._in_string = False
+                        self._key = json.loads(buffer[self._token_start:pos + 1])
+                        self._state = 'colon'
+                elif ch == '"':
+                    self._in_string = True
+                    self._token_start = pos
+                elif ch == '}':
+                    self._state = 'end'
+            elif state == 'colon':
+                if ch == ':':
+                    self._state = 'value'
+                    self._token_start = -1
+            elif state == 'value':
+                field = self._scan_value(buffer, pos, ch)
+                if field is not None:
+                    completed.append(field)
+                    self.fields[field[0]] = field[1]
+                    self._state = 'after_value'
+                    if self._token_start is None:
+                        # 标量值由当前字符结束，该字符按after_value状态再处理一次
+                        continue
+            elif state == 'after_value':
+                if ch == ',':
+                    self._state = 'key'
+                elif ch == '}':
+                    self._state = 'end'
+            pos += 1
+        self._pos = pos
+        return completed
+
+    def _scan_value(self, buffer, pos, ch):
+        """扫描值的一个字符，值完整时返回 (字段名, 值)"""
+        if self._token_start == -1:
+            # 值尚未开始
+            if ch in WHITESPACE:
+                return None
+            self._token_start = pos
+            self._in_string = ch == '"'
+            self._depth = 1 if ch in '{[' else 0
+            return None
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == '\\':
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._depth == 0:
+                    return self._finish(buffer[self._token_start:pos + 1])
+            return None
+        if self._depth:
+            if ch == '"':
+                self._in_string = True
+            elif ch in '{[':
+                self._depth += 1
+            elif ch in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    return self._finish(buffer[self._token_start:pos + 1])
+            return None
+        # 数字、true/false/null：遇到分隔符或空白即结束
+        if ch in ',}' or ch in WHITESPACE:
+            field = self._finish(buffer[self._token_start:pos])
+            self._token_start = None
+            return field
+        return None
+
+    def _finish(self, raw):
+        self._token_start = 0
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = raw
+        return self._key, value
+
+
+def validate_fields(result, schema):
+    """按字段表 {字段名: 允许的类型} 校验解析结果，返回错误信息，通过时返回None"""
+    if not isinstance(result, dict):
+        return 'AI返回的JSON不是对象。'
+    for field, types in schema.items():
+        value = result.get(field)
+        if value is None or value == '':
+            return f'AI返回的JSON缺少 \'{field}\' 字段。'
+        if not isinstance(value, types) or isinstance(value, bool):
+            return f'AI返回的JSON中 \'{field}\' 字段类型不正确。'
+    return None
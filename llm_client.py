@@ -0,0 +1,381 @@
+# 大模型调用客户端
+# call_ai_with_retry 通过统一的客户端接口调用上游，后端由 LLM_BACKEND 选择：
+#   dashscope（默认）：通过官方SDK调用（SDK每次调用都新建连接）
+#   http：直接请求DashScope HTTP接口，进程内复用一个带连接池的会话（keep-alive），
+#         安装了httpx和h2时走HTTP/2，否则使用requests；需设置LLM_BACKEND=http开启
+#   mock：本地模拟后端，不访问网络，用于测试和离线演示
+# 客户端接口：call(prompt, parameters) 返回 Completion；
+#            stream(prompt, parameters) 建立连接并取到第一个片段后返回逐片段产出 Completion 的迭代器，
+#            连接和首个片段的错误在stream()调用处抛出，由调用方的重试逻辑处理
+import importlib.util
+import json
+import os
+import time
+from collections import namedtuple
+
+from metrics import UPSTREAM_HTTP_CONNECTIONS, UPSTREAM_HTTP_REQUESTS
+
+GENERATION_PATH = '/services/aigc/text-generation/generation'
+DASHSCOPE_API_URL = os.getenv('DASHSCOPE_API_URL') or (
+    os.getenv('DASHSCOPE_HTTP_BASE_URL', 'https://dashscope.aliyuncs.com/api/v1').rstrip('/') + GENERATION_PATH
+)
+
+# 连接池配置（每个worker进程一个池）：池大小应不小于该进程的并发请求线程数，
+# 超出池大小的连接用完即关闭，无法复用
+LLM_POOL_SIZE = int(os.getenv('LLM_POOL_SIZE', '16'))
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '10'))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv('LLM_KEEPALIVE_EXPIRY', '60'))
+LLM_HTTP2 = os.getenv('LLM_HTTP2', 'auto').lower()  # auto：已安装h2时启用；0：禁用
+
+# 模拟后端的首片段延迟和每片段延迟（秒）
+LLM_MOCK_FIRST_TOKEN_LATENCY = float(os.getenv('LLM_MOCK_FIRST_TOKEN_LATENCY', '0.05'))
+LLM_MOCK_TOKEN_LATENCY = float(os.getenv('LLM_MOCK_TOKEN_LATENCY', '0.01'))
+
+# 一次生成结果（流式时为一个片段）：文本和上游报告的token用量字典
+Completion = namedtuple('Completion', ['text', 'usage'])
+
+
+class LLMError(RuntimeError):
+    """上游返回错误（HTTP状态非200，或流式事件中带错误码）"""
+
+    def __init__(self, code, message):
+        super().__init__(f"请求错误：code: {code}, message: {message}")
+        self.code = code
+        self.message = message
+
+
+def sampling_kwargs(parameters):
+    """去掉未设置的采样参数（dashscope SDK需作为关键字参数传入，传parameters=字典会被整体嵌套，上游不识别）"""
+    return {k: v for k, v in parameters.items() if v is not None}
+
+
+def build_payload(model, prompt_text, parameters):
+    params = sampling_kwargs(parameters)
+    params['result_format'] = 'text'
+    return {'model': model, 'input': {'prompt': prompt_text}, 'parameters': params}
+
+
+def build_headers(api_key, stream=False):
+    headers = {'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'}
+    if stream:
+        headers['X-DashScope-SSE'] = 'enable'
+        headers['Accept'] = 'text/event-stream'
+    return headers
+
+
+def parse_body(status, body):
+    """解析非流式响应体"""
+    if status != 200 or 'output' not in body:
+        raise LLMError(body.get('code') or status, body.get('message'))
+    return Completion(body['output'].get('text') or '', body.get('usage') or {})
+
+
+def parse_stream_line(line):
+    """解析SSE的一行；非data行返回None，错误事件抛出LLMError"""
+    if not line.startswith('data:'):
+        return None
+    data = json.loads(line[5:])
+    if 'output' not in data:
+        raise LLMError(data.get('code'), data.get('message'))
+    return Completion(data['output'].get('text') or '', data.get('usage') or {})
+
+
+def _json_or_empty(read):
+    try:
+        return json.loads(read() or b'{}')
+    except ValueError:
+        return {}
+
+
+def _http2_enabled():
+    if LLM_HTTP2 in ('0', 'false', 'no'):
+        return False
+    return importlib.util.find_spec('httpx') is not None and importlib.util.find_spec('h2') is not None
+
+
+def count_new_connection(transport):
+    """返回httpx/httpcore的trace回调：每建立一条新TCP连接计数一次"""
+    def trace(event, info):
+        if event == 'connection.connect_tcp.complete':
+            UPSTREAM_HTTP_CONNECTIONS.inc(transport)
+    return trace
+
+
+class _RequestsTransport:
+    """基于requests.Session的连接池（HTTP/1.1 keep-alive）"""
+
+    name = 'requests'
+
+    def __init__(self, pool_size, timeout):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+        def counting(pool_class):
+            # 新建连接时计数，用于计算连接复用率
+            class CountingPool(pool_class):
+                def _new_conn(self):
+                    UPSTREAM_HTTP_CONNECTIONS.inc('requests')
+                    return super()._new_conn()
+            return CountingPool
+
+        class CountingAdapter(HTTPAdapter):
+            def init_poolmanager(self, *args, **kwargs):
+                super().init_poolmanager(*args, **kwargs)
+                self.poolmanager.pool_classes_by_scheme = {
+                    'http': counting(HTTPConnectionPool), 'https': counting(HTTPSConnectionPool)
+                }
+
+        self.session = requests.Session()
+        adapter = CountingAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.timeout = (LLM_CONNECT_TIMEOUT, timeout)
+
+    def post(self, url, headers, payload):
+        resp = self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
+        return resp.status_code, _json_or_empty(lambda: resp.content)
+
+    def stream_lines(self, url, headers, payload):
+        resp = self.session.post(url, headers=headers, json=payload, timeout=self.timeout, stream=True)
+        if resp.status_code != 200:
+            try:
+                body = _json_or_empty(lambda: resp.content)
+            finally:
+                resp.close()
+            raise LLMError(body.get('code') or resp.status_code, body.get('message'))
+        return self._iter_lines(resp)
+
+    @staticmethod
+    def _iter_lines(resp):
+        try:
+            for line in resp.iter_lines():
+                yield line.decode('utf-8')
+        finally:
+            # 读完或提前关闭都归还连接
+            resp.close()
+
+    def close(self):
+        self.session.close()
+
+
+class _HTTPXTransport:
+    """基于httpx.Client的连接池，支持HTTP/2多路复用"""
+
+    def __init__(self, pool_size, timeout, http2):
+        import httpx
+        self.name = 'httpx-h2' if http2 else 'httpx'
+        self.client = httpx.Client(
+            http2=http2,
+            timeout=httpx.Timeout(timeout, connect=LLM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=pool_size, max_keepalive_connections=pool_size, keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+            ),
+        )
+        self.extensions = {'trace': count_new_connection(self.name)}
+
+    def post(self, url, headers, payload):
+        resp = self.client.post(url, headers=headers, json=payload, extensions=self.extensions)
+        return resp.status_code, _json_or_empty(lambda: resp.content)
+
+    def stream_lines(self, url, headers, payload):
+        request = self.client.build_request('POST', url, headers=headers, json=payload, extensions=self.extensions)
+        resp = self.client.send(request, stream=True)
+        if resp.status_code != 200:
+            try:
+                body = _json_or_empty(resp.read)
+            finally:
+                resp.close()
+            raise LLMError(body.get('code') or resp.status_code, body.get('message'))
+        return self._iter_lines(resp)
+
+    @staticmethod
+    def _iter_lines(resp):
+        try:
+            yield from resp.iter_lines()
+        finally:
+            resp.close()
+
+    def close(self):
+        self.client.close()
+
+
+def prefetch_first(iterator):
+    """立即取出迭代器的第一个元素，返回从该元素开始的等价迭代器
+
+    生成器要到首次迭代才真正发起请求/读取数据，提前取一次让连接错误在调用处抛出。
+    """
+    try:
+        first = next(iterator)
+    except StopIteration:
+        return iter(())
+    except BaseException:
+        close = getattr(iterator, 'close', None)
+        if close:
+            close()
+        raise
+    return _resume(first, iterator)
+
+
+def _resume(first, iterator):
+    try:
+        yield first
+        yield from iterator
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close:
+            close()
+
+
+class DashScopeHTTPClient:
+    """直接请求DashScope HTTP接口的客户端，所有调用共用一个连接池"""
+
+    backend = 'http'
+
+    def __init__(self, api_key, model, timeout, url=DASHSCOPE_API_URL, pool_size=LLM_POOL_SIZE):
+        self.api_key = api_key
+        self.model = model
+        self.url = url
+        if _http2_enabled():
+            self.transport = _HTTPXTransport(pool_size, timeout, http2=True)
+        elif importlib.util.find_spec('requests'):
+            self.transport = _RequestsTransport(pool_size, timeout)
+        else:
+            self.transport = _HTTPXTransport(pool_size, timeout, http2=False)
+
+    def call(self, prompt, parameters):
+        UPSTREAM_HTTP_REQUESTS.inc(self.transport.name)
+        status, body = self.transport.post(
+            self.url, build_headers(self.api_key), build_payload(self.model, prompt.text, parameters)
+        )
+        return parse_body(status, body)
+
+    def stream(self, prompt, parameters):
+        UPSTREAM_HTTP_REQUESTS.inc(self.transport.name)
+        lines = self.transport.stream_lines(
+            self.url, build_headers(self.api_key, stream=True), build_payload(self.model, prompt.text, parameters)
+        )
+        return prefetch_first(self._iter_completions(lines))
+
+    @staticmethod
+    def _iter_completions(lines):
+        try:
+            for line in lines:
+                completion = parse_stream_line(line)
+                if completion is not None:
+                    yield completion
+        finally:
+            lines.close()
+
+    def close(self):
+        self.transport.close()
+
+
+class DashScopeSDKClient:
+    """通过dashscope官方SDK调用"""
+
+    backend = 'dashscope'
+
+    def __init__(self, api_key, model):
+        import dashscope
+        dashscope.api_key = api_key
+        self.generation = dashscope.Generation
+        self.model = model
+
+    @staticmethod
+    def _completion(response):
+        if response.status_code != 200:
+            raise LLMError(response.code, response.message)
+        return Completion(response.output.text or '', dict(response.usage or {}))
+
+    def call(self, prompt, parameters):
+        return self._completion(self.generation.call(
+            model=self.model, prompt=prompt.text, result_format='text', **sampling_kwargs(parameters)
+        ))
+
+    def stream(self, prompt, parameters):
+        responses = self.generation.call(
+            model=self.model, prompt=prompt.text, stream=True, result_format='text', **sampling_kwargs(parameters)
+        )
+        return prefetch_first(self._completion(response) for response in responses)
+
+    def close(self):
+        pass
+
+
+MOCK_EVALUATE_RESULT = {
+    'price': '5200',
+    'level': '稀有级',
+    'suggestion': '这个尾号数字组合和谐，谐音寓意积极向上，象征着稳步前行、好运相伴。'
+                  '从传统数字文化来看，它兼具稳定与进取的能量，适合日常使用和商务往来。（模拟响应）',
+}
+MOCK_TEXT = '从传统文化角度来看，这个组合蕴含着积极向上的寓意，象征着好运与顺遂。以上为本地模拟响应，仅供娱乐参考。'
+
+
+class MockLLMClient:
+    """本地模拟后端：按功能返回固定内容，按配置的延迟逐片段产出"""
+
+    backend = 'mock'
+
+    def __init__(self, first_token_latency=LLM_MOCK_FIRST_TOKEN_LATENCY, token_latency=LLM_MOCK_TOKEN_LATENCY,
+                 chunk_size=8):
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.chunk_size = chunk_size
+
+    def respond(self, prompt):
+        if prompt.feature == 'evaluate':
+            return json.dumps(MOCK_EVALUATE_RESULT, ensure_ascii=False)
+        return MOCK_TEXT
+
+    def plan(self, prompt, parameters):
+        """返回流式输出的片段列表；incremental_output未开启时与上游一样返回累计全文"""
+        text = self.respond(prompt)
+        pieces = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)]
+        incremental = parameters.get('incremental_output', False)
+        chunks = []
+        for index, piece in enumerate(pieces):
+            usage = {'input_tokens': len(prompt.text) // 2, 'output_tokens': index + 1}
+            chunks.append(Completion(piece if incremental else text[:(index + 1) * self.chunk_size], usage))
+        return chunks
+
+    def call(self, prompt, parameters):
+        chunks = self.plan(prompt, parameters)
+        time.sleep(self.first_token_latency + self.token_latency * (len(chunks) - 1))
+        return Completion(self.respond(prompt), chunks[-1].usage)
+
+    def stream(self, prompt, parameters):
+        chunks = self.plan(prompt, parameters)
+        return self._iter_chunks(chunks)
+
+    def _iter_chunks(self, chunks):
+        time.sleep(self.first_token_latency)
+        for index, chunk in enumerate(chunks):
+            if index:
+                time.sleep(self.token_latency)
+            yield chunk
+
+    def close(self):
+        pass
+
+
+BACKENDS = ('http', 'dashscope', 'mock')
+
+
+def missing_dependency(backend):
+    """返回后端缺少的依赖包名，依赖齐全时返回None（只检查不导入，避免拖慢冷启动）"""
+    if backend == 'dashscope':
+        return None if importlib.util.find_spec('dashscope') else 'dashscope'
+    if backend == 'http':
+        return None if importlib.util.find_spec('requests') or importlib.util.find_spec('httpx') else 'requests'
+    return None
+
+
+def create_llm_client(backend, api_key, model, timeout):
+    if backend == 'mock':
+        return MockLLMClient()
+    if backend == 'dashscope':
+        return DashScopeSDKClient(api_key, model)
+    if backend == 'http':
+        return DashScopeHTTPClient(api_key, model, timeout)
+    raise ValueError(f"未知的LLM_BACKEND：{backend}，可选值：{', '.join(BACKENDS)}")
@@ -0,0 +1,74 @@
+# 幸运抽奖
+# 幸运值 = md5(号码)前4字节 % 100 + 1，按奖项概率划分区间得到奖项（纯娱乐，结果只由号码决定）。
+# 奖项区间在导入时展开为"幸运值 -> 奖项"的查找表，抽奖不再逐项累加概率；
+# 批量抽奖时四位尾号的幸运值预先算好全部10000个，直接查表，其他号码逐个计算，
+# 与单个抽奖使用同一套公式和查找表，结果完全一致。
+import hashlib
+import threading
+
+PRIZES = (
+    {"name": "超级幸运星", "probability": 5, "color": "#ff6b6b"},
+    {"name": "大吉大利", "probability": 10, "color": "#4ecdc4"},
+    {"name": "财运亨通", "probability": 15, "color": "#45b7d1"},
+    {"name": "事业有成", "probability": 20, "color": "#96ceb4"},
+    {"name": "平安喜乐", "probability": 25, "color": "#feca57"},
+    {"name": "好运连连", "probability": 25, "color": "#ff9ff3"}
+)
+
+
+def _build_prize_table():
+    """展开为下标1~100的查找表；概率之和不足100时，剩余区间归最后一个奖项"""
+    table = [PRIZES[-1]] * 101
+    score = 1
+    for prize in PRIZES:
+        for _ in range(prize["probability"]):
+            if score > 100:
+                break
+            table[score] = prize
+            score += 1
+    return tuple(table)
+
+
+PRIZE_BY_SCORE = _build_prize_table()
+
+_lock = threading.Lock()
+_tail_scores = None
+
+
+def luck_score(number):
+    """号码的幸运值（1~100）"""
+    return int.from_bytes(hashlib.md5(number.encode()).digest()[:4], 'big') % 100 + 1
+
+
+def _build_tail_scores():
+    """预先计算全部四位尾号的幸运值"""
+    global _tail_scores
+    with _lock:
+        if _tail_scores is None:
+            _tail_scores = bytes(luck_score(f"{value:04d}") for value in range(10000))
+    return _tail_scores
+
+
+def draw_result(number, score):
+    prize = PRIZE_BY_SCORE[score]
+    return {
+        "prize": prize["name"],
+        "color": prize["color"],
+        "score": score,
+        "message": f"恭喜！根据您的号码{number}，获得了【{prize['name']}】！这是传统文化的趣味解读，愿好运伴随您！"
+    }
+
+
+def draw(number):
+    """单个号码抽奖"""
+    return draw_result(number, luck_score(number))
+
+
+def draw_many(numbers):
+    """批量抽奖，按输入顺序返回与draw()完全相同的结果"""
+    tail_scores = _tail_scores or _build_tail_scores()
+    return [
+        draw_result(number, tail_scores[int(number)] if len(number) == 4 and number.isascii() and number.isdigit()
+                    else luck_score(number))
+        for number in numbers
+    ]
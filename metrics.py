@@ -0,0 +1,280 @@
+# 进程内指标
+# 计数器和直方图按线程分片：每个线程只写自己的分片，热路径上不加锁；
+# 抓取时合并所有分片，已结束线程的分片并入归档后丢弃，线程频繁创建也不会无限增长。
+# render_metrics() 输出Prometheus文本格式
+import bisect
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 默认耗时分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+
+class _Sharded:
+    """按线程分片的指标基类"""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []     # (线程, 分片字典)
+        self._retired = {}    # 已结束线程的累计值
+        with _registry_lock:
+            _registry.append(self)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+        return shard
+
+    def _merge(self, target, shard):
+        raise NotImplementedError
+
+    def collect(self):
+        """合并所有分片，返回 {标签值元组: 值}"""
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    # 线程已结束，不会再写入，直接归档
+                    self._merge(self._retired, shard)
+            self._shards = alive
+            merged = {}
+            self._merge(merged, self._retired)
+            for _, shard in alive:
+                self._merge(merged, shard.copy())
+        return merged
+
+
+class Counter(_Sharded):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def _merge(self, target, shard):
+        for key, value in shard.items():
+            target[key] = target.get(key, 0) + value
+
+    def value(self, *labels):
+        return self.collect().get(labels, 0)
+
+    def render(self):
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in sorted(self.collect().items())
+        ]
+
+
+class Histogram(_Sharded):
+    """分桶直方图；每个分片保存 [各桶计数..., 总和, 总数]，输出时再累加成Prometheus的累计桶"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        shard = self._shard()
+        counts = shard.get(labels)
+        if counts is None:
+            counts = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def time(self, *labels):
+        """上下文管理器：记录代码块耗时"""
+        return _Timer(self, labels)
+
+    def _merge(self, target, shard):
+        for key, counts in shard.items():
+            counts = list(counts)
+            existing = target.get(key)
+            if existing is None:
+                target[key] = counts
+            else:
+                for i, value in enumerate(counts):
+                    existing[i] += value
+
+    def render(self):
+        lines = []
+        for key, counts in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(float(bound))))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(counts[-2])}')
+            lines.append(f'{self.name}_count{labels} {counts[-1]}')
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class GaugeFunc:
+    """抓取时调用fn取值的仪表；fn返回数值，或 {标签值元组: 数值}"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, fn, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        with _registry_lock:
+            _registry.append(self)
+
+    def render(self):
+        try:
+            values = self.fn()
+        except Exception as e:
+            print(f"采集指标 {self.name} 失败: {str(e)}")
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in sorted(values.items())
+        ]
+
+
+def counter(name, documentation, labelnames=()):
+    return Counter(name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    return Histogram(name, documentation, labelnames, buckets)
+
+
+def gauge_func(name, documentation, fn, labelnames=()):
+    return GaugeFunc(name, documentation, fn, labelnames)
+
+
+def render_metrics():
+    """以Prometheus文本格式输出全部已注册指标"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def is_content_chunk(chunk):
+    """是否为有内容的响应片段；空片段和SSE的retry/注释行不算"""
+    if isinstance(chunk, bytes):
+        return bool(chunk) and not chunk.startswith((b'retry:', b':'))
+    return bool(chunk) and not chunk.startswith(('retry:', ':'))
+
+
+def time_first_chunk(chunks, started, histogram, *labels):
+    """包装流式响应：记录从请求开始（perf_counter时间）到第一个内容片段产出的耗时"""
+    first = True
+    try:
+        for chunk in chunks:
+            if first and is_content_chunk(chunk):
+                histogram.observe(time.perf_counter() - started, *labels)
+                first = False
+            yield chunk
+    finally:
+        # 客户端断开时同步关闭内层生成器（如退出合并流的订阅）
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+
+def record_upstream_usage(feature, usage, chars):
+    """记录上游报告的token用量（usage为字典或dashscope的用量对象）和生成字符数"""
+    UPSTREAM_CHARS.inc(feature, amount=chars)
+    if usage:
+        UPSTREAM_TOKENS.inc(feature, 'input', amount=usage.get('input_tokens') or 0)
+        UPSTREAM_TOKENS.inc(feature, 'output', amount=usage.get('output_tokens') or 0)
+
+
+# 通用指标，Flask和ASGI入口共用
+HTTP_REQUEST_SECONDS = histogram(
+    'http_request_duration_seconds', '请求处理耗时（流式响应计到最后一个字节）', ('route', 'method', 'status')
+)
+STREAM_FIRST_CHUNK_SECONDS = histogram(
+    'stream_first_chunk_seconds', '流式接口从收到请求到发出第一个内容片段的耗时', ('route',)
+)
+UPSTREAM_CALLS = counter('dashscope_calls_total', '上游大模型调用次数', ('feature', 'mode', 'outcome'))
+UPSTREAM_RETRIES = counter('dashscope_retries_total', '上游调用重试次数', ('feature',))
+UPSTREAM_DEGRADED = counter('dashscope_degraded_total', '熔断降级为预设响应的次数', ('feature',))
+UPSTREAM_SECONDS = histogram(
+    'dashscope_call_duration_seconds', '上游调用耗时（流式为完整生成耗时）', ('feature', 'mode')
+)
+UPSTREAM_FIRST_CHUNK_SECONDS = histogram(
+    'dashscope_first_chunk_seconds', '上游流式调用返回第一个片段的耗时', ('feature',)
+)
+UPSTREAM_HTTP_REQUESTS = counter('dashscope_http_requests_total', '发往上游的HTTP请求数', ('transport',))
+UPSTREAM_HTTP_CONNECTIONS = counter(
+    'dashscope_http_connections_total', '与上游新建的HTTP连接数（连接复用率 = 1 - 新建连接数 / 请求数）', ('transport',)
+)
+UPSTREAM_TOKENS = counter('dashscope_tokens_total', '上游报告的token用量', ('feature', 'direction'))
+UPSTREAM_CHARS = counter('dashscope_output_chars_total', '上游生成的字符数', ('feature',))
+ADMISSION_REJECTED = counter(
+    'admission_rejected_total', '准入控制拒绝（reject）或降级为预设响应（preset）的请求数', ('reason', 'action')
+)
+UPSTREAM_QUEUE_WAIT_SECONDS = histogram(
+    'upstream_queue_wait_seconds', '上游调用在并发队列中排队等待的耗时（不含无需排队的调用）',
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+STREAM_FANOUT_TIMEOUTS = counter('stream_fanout_wait_timeouts_total', '合并流订阅者等待上游片段超时而中止的次数')
+CACHE_REQUESTS = counter('cache_requests_total', 'AI结果缓存查询次数', ('prefix', 'result'))
+CACHE_WARM_REFRESHES = counter('cache_warm_refreshes_total', '/evaluate缓存预热刷新次数', ('result',))
+SHARE_CARD_RENDER_SECONDS = histogram(
+    'share_card_render_seconds', '分享卡片渲染耗时（不含缓存命中）', ('card_type',),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+)
+SHARE_CARD_CACHE_REQUESTS = counter('share_card_cache_requests_total', '分享卡片缓存查询次数', ('result',))
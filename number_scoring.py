@@ -0,0 +1,163 @@
+# 手机尾号规则评分引擎
+# 根据数字形态（豹子、顺子、叠字）、吉利数字和谐音组合离线计算分数、等级和估值，
+# 覆盖全部10000个四位尾号，查表即可得到结果，不需要调用大模型
+import threading
+from array import array
+
+LEVELS = ('普通级', '优质级', '稀有级', '典藏级', '传说级')
+LEVEL_THRESHOLDS = (35, 55, 75, 90)  # 分数达到对应阈值即升一级
+
+MIN_PRICE = 3000
+MAX_PRICE = 8000
+
+# 谐音组合加分（取匹配到的最高值）
+HOMOPHONES = {
+    '1314': ('一生一世', 62),
+    '520': ('我爱你', 40),
+    '521': ('我爱你', 30),
+    '1688': ('一路发发', 45),
+    '168': ('一路发', 30),
+    '518': ('我要发', 30),
+    '888': ('发发发', 30),
+    '666': ('六六大顺', 25),
+    '999': ('长长久久', 25),
+    '789': ('步步高', 15),
+    '5211': ('我爱依依', 20),
+    '1199': ('依依久久', 15),
+}
+
+DIGITS = '0123456789'
+
+# 单个数字加减分
+DIGIT_WEIGHTS = {'8': 7, '6': 5, '9': 5, '4': -6}
+
+BASE_SCORE = 20
+
+_lock = threading.Lock()
+_scores = None
+_prices = None
+
+
+def _pattern(number):
+    """识别数字形态，返回 (标签, 分数)"""
+    a, b, c, d = number
+    if a == b == c == d:
+        return '豹子号', 70
+    steps = {int(b) - int(a), int(c) - int(b), int(d) - int(c)}
+    if steps == {1} or steps == {-1}:
+        return '顺子号', 55
+    if a == b and c == d:
+        return 'AABB', 45
+    if a == c and b == d:
+        return 'ABAB', 40
+    if a == d and b == c:
+        return 'ABBA', 35
+    if a == b == c or b == c == d:
+        return '三连号', 40
+    if max(number.count(x) for x in number) == 3:
+        return '三同号', 25
+    if a == b or b == c or c == d:
+        return '对子号', 10
+    return None, 0
+
+
+def _homophone(number):
+    """返回匹配到的最佳谐音组合 (组合, 寓意, 分数)"""
+    best = None
+    for combo, (meaning, bonus) in HOMOPHONES.items():
+        if combo in number and (best is None or bonus > best[2]):
+            best = (combo, meaning, bonus)
+    return best
+
+
+def _score(number):
+    _, pattern_score = _pattern(number)
+    homophone = _homophone(number)
+    score = BASE_SCORE + pattern_score + (homophone[2] if homophone else 0)
+    score += sum(DIGIT_WEIGHTS.get(digit, 0) for digit in number)
+    if number[-1] == '8':
+        score += 5  # 以8收尾
+    return max(0, min(100, score))
+
+
+def _price(number, score):
+    # 同分号码按数字做确定性的小幅错开，避免价格完全相同
+    spread = (int(number) * 7919) % 200
+    return max(MIN_PRICE, min(MAX_PRICE, MIN_PRICE + score * 48 + spread))
+
+
+def _build_tables():
+    """预先计算全部四位尾号的分数和估值"""
+    global _scores, _prices
+    with _lock:
+        if _scores is not None:
+            return
+        scores = bytearray(10000)
+        prices = array('H', bytes(20000))
+        for value in range(10000):
+            number = f"{value:04d}"
+            score = _score(number)
+            scores[value] = score
+            prices[value] = _price(number, score)
+        _prices = prices
+        _scores = bytes(scores)
+
+
+def level_for_score(score):
+    level_index = 0
+    for threshold in LEVEL_THRESHOLDS:
+        if score >= threshold:
+            level_index += 1
+    return LEVELS[level_index]
+
+
+def clean_number(value):
+    """规范化请求中的号码：转为字符串并去掉首尾空白，只允许ASCII数字，无效时返回None"""
+    number = str(value).strip() if value is not None else ''
+    if not number or any(ch not in DIGITS for ch in number):
+        return None
+    return number
+
+
+def normalize_tail(number):
+    """提取四位尾号，无法识别时返回None"""
+    # 只取ASCII数字：str.isdigit()也认全角数字、上标等Unicode数字，int()后会落到错误的尾号上
+    digits = ''.join(ch for ch in str(number) if ch in DIGITS)
+    if len(digits) < 4:
+        return None
+    return digits[-4:]
+
+
+def score_number(number):
+    """查表返回尾号的评分结果；不是有效尾号时返回None"""
+    tail = normalize_tail(number)
+    if tail is None:
+        return None
+    if _scores is None:
+        _build_tables()
+    value = int(tail)
+    score = _scores[value]
+    return {
+        'number': tail,
+        'price': str(_prices[value]),
+        'level': level_for_score(score),
+        'score': score,
+    }
+
+
+def describe_number(number):
+    """返回尾号的形态和谐音特征描述，用于提示词和预设文案"""
+    tail = normalize_tail(number)
+    if tail is None:
+        return []
+    tags = []
+    pattern, _ = _pattern(tail)
+    if pattern:
+        tags.append(pattern)
+    homophone = _homophone(tail)
+    if homophone:
+        tags.append(f"谐音'{homophone[0]}'（{homophone[1]}）")
+    lucky = [digit for digit in tail if DIGIT_WEIGHTS.get(digit, 0) > 0]
+    if lucky:
+        tags.append(f"含吉利数字{''.join(sorted(set(lucky)))}")
+    return tags
@@ -0,0 +1,180 @@
+# 预设响应语料库
+# 离线为全部10000个四位尾号生成预设评估结果，写入紧凑的二进制文件，
+# 运行时通过mmap加载，按尾号O(1)定位，请求路径上不再做随机数、正则和模板拼装。
+#
+# 本功能需要手动开启：语料库约7MB，不随仓库提交，Vercel构建（@vercel/python）也不会生成。
+# 未构建时预设模式照常工作，只是每个请求实时生成预设结果（render_number_preset），没有mmap带来的冷启动收益。
+# 开启方法：部署前构建，并让生成的文件随部署一起发布（或用PRESET_CORPUS_PATH指定位置）：
+#   python preset_corpus.py build [--output data/preset_corpus.bin]
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import threading
+
+from number_scoring import score_number
+
+CORPUS_MAGIC = b'HJPC'
+CORPUS_VERSION = 1
+CORPUS_SIZE = 10000
+HEADER = struct.Struct('<4sII')  # 魔数、版本、条目数
+OFFSET = struct.Struct('<I')
+DEFAULT_CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'preset_corpus.bin')
+
+NUMBER_TEMPLATES = {
+    "1314": {
+        "homophonic_meaning": "'1314'谐音'一生一世'，堪称爱情的数字诗篇。在中文语境中，它象征着永恒的陪伴与不渝的承诺，常用于表白、婚恋场景，是情感长跑中的甜蜜密码。这个组合把浪漫刻进了数字基因，堪称移动的情书。",
+        "numerical_energy": "从数字能量学看，'1'代表开创与独立，如同晨曦初露，充满向上的生命力；'3'象征活力与表达，如春风拂面；'4'在此非指'死'，而是'稳'的化身，代表踏实与持久。三者共振，形成'进取—绽放—坚守'的能量闭环，寓意事业有成、感情稳定。",
+        "market_value": "由于其深入人心的情感寓意，1314在婚庆、情侣号、纪念日礼品市场备受欢迎。虽非极端稀有，但文化认同度极高，属于高流通性的吉祥号码，具备持续增值潜力。",
+        "fortune_impact": "持有此号者易吸引稳定关系与长久合作，尤其利于从事情感咨询、婚庆服务、文化创意等行业。在人际交往中自带亲和力光环，有助于建立信任与深度连接，是情感与事业双线发展的隐形助力。"
+    },
+    "8888": {
+        "homophonic_meaning": "'8888'四连发，谐音'发发发发'，是财富与成功的终极象征。在传统文化中，'8'形似无穷符号，寓意财源滚滚、生生不息。四个'8'的组合如同四方来财，预示着全方位的兴旺发达。",
+        "numerical_energy": "从数字能量学角度，'8'代表物质成就与权威地位，具有强烈的聚财磁场。四个'8'连续出现，形成超强的财富振频，有助于提升个人的商业敏感度和投资直觉，是天然的财富吸引器。",
+        "market_value": "8888作为顶级吉祥号码，在商界和收藏界享有极高声誉。无论是手机号、车牌还是门牌号，都是身份与财力的象征，具有极强的保值增值能力。",
+        "fortune_impact": "持有者往往在商业领域表现出色，容易获得贵人相助和投资机会。这个号码特别适合企业家、金融从业者和销售人员，能够增强个人的商业魅力和谈判能力。"
+    }
+}
+
+GENERIC_MEANINGS = (
+    "寓意吉祥如意，代表着美好的愿望和期待",
+    "象征着稳步前进，预示着事业的稳定发展",
+    "体现了和谐平衡，有助于人际关系的改善",
+    "代表着创新突破，预示着新的机遇和发展"
+)
+
+GENERIC_ENERGIES = (
+    "从数字能量学看，这个组合具有正向的磁场效应",
+    "数字排列体现了阴阳平衡的和谐状态",
+    "蕴含着稳定而持续的能量波动",
+    "展现了积极向上的生命力量"
+)
+
+
+def render_number_preset(number):
+    """生成单个尾号的预设评估JSON（纯函数，线程安全）"""
+    # 价格和等级来自规则评分引擎，文字部分汇总成suggestion供前端展示
+    scored = score_number(number) or {}
+
+    # 获取特定数字的分析，如果没有则生成通用分析
+    if number in NUMBER_TEMPLATES:
+        analysis = NUMBER_TEMPLATES[number]
+        suggestion = analysis['homophonic_meaning'] + analysis['fortune_impact']
+    else:
+        # 使用独立的随机数生成器，不影响全局random
+        rng = random.Random(int(number)) if number.isascii() and number.isdigit() else random.Random(number)
+        analysis = {
+            "homophonic_meaning": f"'{number}'{rng.choice(GENERIC_MEANINGS)}，在传统文化中被视为吉祥的象征。",
+            "numerical_energy": rng.choice(GENERIC_ENERGIES) + "，有助于提升个人的正能量磁场。",
+            "market_value": "这个数字组合在传统文化中具有一定的收藏价值，体现了对美好生活的向往。",
+            "fortune_impact": "持有者可能在相关领域获得更多的关注和机会，有助于个人发展和人际交往。"
+        }
+        suggestion = analysis['homophonic_meaning'] + analysis['numerical_energy']
+    return json.dumps({
+        'price': scored.get('price'),
+        'level': scored.get('level'),
+        'suggestion': suggestion,
+        **analysis
+    }, ensure_ascii=False)
+
+
+def build_corpus(path=DEFAULT_CORPUS_PATH):
+    """生成语料库文件：文件头 + (条目数+1)个偏移量 + UTF-8正文"""
+    entries = [render_number_preset(f"{value:04d}").encode('utf-8') for value in range(CORPUS_SIZE)]
+    offsets = [0]
+    for entry in entries:
+        offsets.append(offsets[-1] + len(entry))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(CORPUS_MAGIC, CORPUS_VERSION, CORPUS_SIZE))
+        f.write(struct.pack(f'<{len(offsets)}I', *offsets))
+        for entry in entries:
+            f.write(entry)
+    os.replace(tmp_path, path)
+    return path, HEADER.size + OFFSET.size * len(offsets) + offsets[-1]
+
+
+class PresetCorpus:
+    """只读的mmap语料库，多线程可并发读取"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != CORPUS_MAGIC or version != CORPUS_VERSION or count != CORPUS_SIZE:
+            self._mmap.close()
+            raise ValueError(f"预设语料库格式不匹配: {path}")
+        self._data_start = HEADER.size + OFFSET.size * (count + 1)
+
+    def get_bytes(self, number):
+        """按四位尾号返回UTF-8编码的JSON，不存在返回None"""
+        if not isinstance(number, str) or len(number) != 4 or not number.isascii() or not number.isdigit():
+            return None
+        start, end = struct.unpack_from('<II', self._mmap, HEADER.size + OFFSET.size * int(number))
+        return self._mmap[self._data_start + start:self._data_start + end]
+
+    def get(self, number):
+        data = self.get_bytes(number)
+        return data.decode('utf-8') if data is not None else None
+
+
+_corpus = None
+_corpus_loaded = False
+_corpus_lock = threading.Lock()
+
+
+def load_corpus(path=None):
+    """加载语料库（进程内只加载一次），文件不存在时返回None"""
+    global _corpus, _corpus_loaded
+    if not _corpus_loaded:
+        with _corpus_lock:
+            if not _corpus_loaded:
+                path = path or os.getenv('PRESET_CORPUS_PATH', DEFAULT_CORPUS_PATH)
+                if os.path.exists(path):
+                    try:
+                        _corpus = PresetCorpus(path)
+                        print(f"预设语料库加载成功: {path}")
+                    except (OSError, ValueError) as e:
+                        print(f"预设语料库加载失败，改为实时生成: {str(e)}")
+                else:
+                    print(f"未构建预设语料库（{path}），预设结果改为实时生成")
+                _corpus_loaded = True
+    return _corpus
+
+
+def get_number_preset_bytes(number):
+    """直接返回语料库中的UTF-8字节（零解码），语料库未构建或尾号无效时返回None"""
+    corpus = load_corpus()
+    return corpus.get_bytes(number) if corpus is not None else None
+
+
+def get_number_preset(number):
+    """返回尾号的预设评估JSON：优先查语料库，未构建时实时生成"""
+    corpus = load_corpus()
+    if corpus is not None:
+        text = corpus.get(number)
+        if text is not None:
+            return text
+    return render_number_preset(number)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='红姐数字能量站预设响应语料库工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='为全部四位尾号生成预设语料库')
+    build_parser.add_argument('--output', default=os.getenv('PRESET_CORPUS_PATH', DEFAULT_CORPUS_PATH))
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        path, size = build_corpus(args.output)
+        print(f"已生成预设语料库: {path}（{CORPUS_SIZE}条，{size / 1024:.1f}KB）")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+# 提示词模板注册表
+# 模板在导入时预编译为"字面量 + 字段"序列，渲染时只做一次拼接；
+# 每个模板带有功能ID和内容摘要版本号，缓存键和预设路由都基于功能ID和结构化输入，
+# 不再从生成好的提示词文本中反向解析
+import hashlib
+from collections import namedtuple
+from string import Formatter
+
+# 一次渲染结果：功能ID、结构化输入、提示词文本、模板版本
+Prompt = namedtuple('Prompt', ['feature', 'inputs', 'text', 'version'])
+
+
+class PromptTemplate:
+    """预编译的提示词模板"""
+
+    def __init__(self, feature, template):
+        self.feature = feature
+        self.template = template
+        self.version = hashlib.sha256(template.encode('utf-8')).hexdigest()[:12]
+        self._parts = [(literal, field) for literal, field, _, _ in Formatter().parse(template)]
+        self.fields = tuple(field for _, field in self._parts if field)
+
+    def render(self, inputs, **fields):
+        """渲染提示词；inputs为参与缓存键和预设路由的结构化输入"""
+        text = ''.join(
+            literal + (str(fields[field]) if field else '')
+            for literal, field in self._parts
+        )
+        return Prompt(self.feature, inputs, text, self.version)
+
+
+EVALUATE_TEMPLATE = """
+作为专业的数字文化研究专家和趣味评估师，请分析手机尾号：{number}
+
+**角色设定**：你是红姐数字能量站的首席分析师，擅长用现代语言解读传统数字文化，语言风格要生动有趣、通俗易懂。
+
+**分析框架**（请严格按此顺序分析）：
+1. **谐音寓意**：分析数字的中文谐音含义，要有创意且积极正面
+2. **数字能量**：从传统数字学角度解读其能量属性
+3. **市场价值**：基于稀有度和吉祥程度评估市场价值
+4. **运势影响**：说明对主人可能带来的积极影响
+
+**重要约束条件**：
+- 必须输出标准JSON格式
+- {price_rule}
+- {level_rule}
+- suggestion字段：200-300字的专业建议，要有具体的文化内涵解释
+
+**特别要求**：
+- {pricing_rule}
+- 语言要符合中文表达习惯，避免翻译腔
+- 内容要富有文化底蕴但通俗易懂
+- 只返回JSON，不要任何额外文字
+
+请开始分析尾号：{number}
+"""
+
+FORTUNE_TEMPLATE = """
+**角色**：你是红姐数字能量站的命理文化专家，专门从传统文化角度解读生辰信息。
+
+**任务**：根据生辰八字进行传统文化分析
+
+**八字信息**：{bazi}
+
+**分析要求**：
+1. **性格特质**：从日主五行、出生月令等角度分析性格倾向
+2. **天赋优势**：分析可能具备的天然优势和潜能
+3. **情感特征**：解读在人际关系中的表现特点
+4. **事业方向**：建议适合的发展领域和方式
+5. **开运建议**：给出未来一年的吉祥提醒
+
+**输出规范**：
+- 语言要温暖亲切，如红姐亲自解读
+- 内容要具体实用，不空泛
+- 长度控制在350-450字
+- 要体现中华传统文化底蕴
+- 语气积极正面，给人希望和动力
+
+**重要声明**：请在开头说明这是"传统文化娱乐解读，仅供参考"
+
+现在开始为这位朋友进行解读：
+"""
+
+NAME_ANALYSIS_TEMPLATE = """
+**角色**：你是红姐数字能量站的汉字文化专家，专注传统姓名文化解读。
+
+**任务**：为以下姓名进行传统文化解析
+
+**姓名信息**：{profile}
+
+**解读框架**：
+1. **字音解析**：结合拼音声调分析姓名的音韵特点和谐音寓意
+2. **字形文化**：解读汉字结构蕴含的文化内涵
+3. **五行能量**：结合字音五行和五格三才分析姓名能量
+4. **性格映射**：推测可能的性格特质和天赋
+5. **人生暗示**：分析姓名对人生路径的积极指引
+
+**表达风格**：
+- 用红姐温暖亲切的语调
+- 语言要生动有趣，避免学术化
+- 多用"可能"、"倾向于"等谦逊表述
+- 内容积极正面，给人启发
+- 长度控制在420-520字
+
+**合规要求**：
+- 开头必须声明"这是传统文化娱乐解读，仅供参考"
+- 强调姓名只是文化符号，人生靠自己努力
+- 避免任何绝对化的预测表述
+- 已给出的笔画、五行、五格数据直接引用，不要重新推算
+
+现在开始为这个姓名进行姓名文化解读：
+"""
+
+PROMPTS = {
+    'evaluate': PromptTemplate('evaluate', EVALUATE_TEMPLATE),
+    'fortune': PromptTemplate('fortune', FORTUNE_TEMPLATE),
+    'name_analysis': PromptTemplate('name_analysis', NAME_ANALYSIS_TEMPLATE),
+}
+
+
+def prompt_version(feature):
+    """返回功能对应模板的版本号，未注册的功能返回空字符串"""
+    template = PROMPTS.get(feature)
+    return template.version if template else ''
@@ -0,0 +1,187 @@
+# 排行榜存储
+# 内存版：有序列表（bisect）维护Top-N + 环形缓冲区保存最近评估，带锁保证并发写入安全
+# SQLite版（WAL模式）：同一主机上的所有worker共享同一份排行榜
+import bisect
+import sqlite3
+import threading
+import time
+from collections import deque
+
+TOP_CAPACITY = 20       # 榜单保留条数
+RECENT_CAPACITY = 50    # 最近评估保留条数
+MIN_RANKING_PRICE = 4000  # 高于该价格才进入榜单
+
+DEFAULT_TOP_NUMBERS = [
+    {'number': '8888', 'price': '7888', 'level': '传说级', 'timestamp': '2024-01-01'},
+    {'number': '6666', 'price': '6666', 'level': '稀有级', 'timestamp': '2024-01-01'},
+    {'number': '1314', 'price': '5200', 'level': '典藏级', 'timestamp': '2024-01-01'},
+    {'number': '0520', 'price': '4888', 'level': '经典级', 'timestamp': '2024-01-01'},
+    {'number': '9999', 'price': '7999', 'level': '传说级', 'timestamp': '2024-01-01'},
+]
+
+
+def parse_price(price):
+    """解析价格字符串（允许千分位逗号）"""
+    return int(str(price).replace(',', ''))
+
+
+class MemoryRankingStore:
+    """进程内排行榜"""
+
+    def __init__(self, seed=DEFAULT_TOP_NUMBERS, top_capacity=TOP_CAPACITY, recent_capacity=RECENT_CAPACITY):
+        self.top_capacity = top_capacity
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=recent_capacity)
+        self._top_keys = []     # (-价格, 序号)，升序即价格降序、同价先到先排
+        self._top_items = []    # 与_top_keys一一对应
+        self._top_numbers = {}  # 号码 -> 条目，O(1)判重
+        self._seq = 0
+        self.version = 0
+        for item in seed:
+            self._insert_top(dict(item), parse_price(item['price']))
+
+    def add(self, number, price, level, timestamp):
+        """记录一次评估；价格足够高且未上榜的号码进入榜单"""
+        price_num = parse_price(price)
+        item = {'number': number, 'price': price, 'level': level, 'timestamp': timestamp}
+        with self._lock:
+            self._recent.append(item)
+            if price_num > MIN_RANKING_PRICE and number not in self._top_numbers:
+                self._insert_top(dict(item), price_num)
+            self.version += 1
+            return self.version
+
+    def _insert_top(self, item, price_num):
+        self._seq += 1
+        key = (-price_num, self._seq)
+        index = bisect.bisect(self._top_keys, key)
+        self._top_keys.insert(index, key)
+        self._top_items.insert(index, item)
+        self._top_numbers[item['number']] = item
+        # 保持前N名
+        while len(self._top_items) > self.top_capacity:
+            self._top_keys.pop()
+            evicted = self._top_items.pop()
+            self._top_numbers.pop(evicted['number'], None)
+
+    def snapshot(self, top_limit=10, recent_limit=20):
+        """返回排行榜数据的副本和当前版本号"""
+        with self._lock:
+            recent = list(self._recent)
+            return {
+                'top_numbers': self._top_items[:top_limit],
+                'recent_evaluations': recent[-recent_limit:] if recent_limit else [],
+            }, self.version
+
+    def recent_numbers(self, limit=RECENT_CAPACITY):
+        with self._lock:
+            return [item['number'] for item in list(self._recent)[-limit:]]
+
+
+class SQLiteRankingStore:
+    """SQLite（WAL模式）共享排行榜，多个worker看到同一份数据"""
+
+    def __init__(self, path, seed=DEFAULT_TOP_NUMBERS, top_capacity=TOP_CAPACITY, recent_capacity=RECENT_CAPACITY):
+        self.path = path
+        self.top_capacity = top_capacity
+        self.recent_capacity = recent_capacity
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS top_numbers ('
+                'number TEXT PRIMARY KEY, price TEXT NOT NULL, price_num INTEGER NOT NULL, '
+                'level TEXT NOT NULL, timestamp TEXT NOT NULL, seq INTEGER NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_top_rank ON top_numbers (price_num DESC, seq)')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS recent_evaluations ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, number TEXT NOT NULL, price TEXT NOT NULL, '
+                'level TEXT NOT NULL, timestamp TEXT NOT NULL)'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            # 只在首次建库时写入初始榜单
+            if conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0)").rowcount:
+                for item in seed:
+                    self._insert_top(conn, item, parse_price(item['price']))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _insert_top(self, conn, item, price_num):
+        conn.execute(
+            'INSERT OR IGNORE INTO top_numbers (number, price, price_num, level, timestamp, seq) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (item['number'], item['price'], price_num, item['level'], item['timestamp'], time.time_ns())
+        )
+
+    def add(self, number, price, level, timestamp):
+        price_num = parse_price(price)
+        item = {'number': number, 'price': price, 'level': level, 'timestamp': timestamp}
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'INSERT INTO recent_evaluations (number, price, level, timestamp) VALUES (?, ?, ?, ?)',
+                (number, price, level, timestamp)
+            )
+            conn.execute(
+                'DELETE FROM recent_evaluations WHERE id <= (SELECT MAX(id) FROM recent_evaluations) - ?',
+                (self.recent_capacity,)
+            )
+            if price_num > MIN_RANKING_PRICE:
+                self._insert_top(conn, item, price_num)
+                conn.execute(
+                    'DELETE FROM top_numbers WHERE number NOT IN ('
+                    'SELECT number FROM top_numbers ORDER BY price_num DESC, seq LIMIT ?)',
+                    (self.top_capacity,)
+                )
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+            version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return version
+
+    @property
+    def version(self):
+        return self._conn().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    def snapshot(self, top_limit=10, recent_limit=20):
+        conn = self._conn()
+        conn.execute('BEGIN')
+        try:
+            top = conn.execute(
+                'SELECT number, price, level, timestamp FROM top_numbers ORDER BY price_num DESC, seq LIMIT ?',
+                (top_limit,)
+            ).fetchall()
+            recent = conn.execute(
+                'SELECT number, price, level, timestamp FROM recent_evaluations ORDER BY id DESC LIMIT ?',
+                (recent_limit,)
+            ).fetchall()
+            version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+        finally:
+            conn.execute('COMMIT')
+        keys = ('number', 'price', 'level', 'timestamp')
+        return {
+            'top_numbers': [dict(zip(keys, row)) for row in top],
+            'recent_evaluations': [dict(zip(keys, row)) for row in reversed(recent)],
+        }, version
+
+    def recent_numbers(self, limit=RECENT_CAPACITY):
+        rows = self._conn().execute(
+            'SELECT number FROM recent_evaluations ORDER BY id DESC LIMIT ?', (limit,)
+        ).fetchall()
+        return [row[0] for row in reversed(rows)]
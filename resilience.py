@@ -0,0 +1,210 @@
+# 上游调用的容错组件
+# 抖动退避、熔断器、重试预算、单次调用超时
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+# 独立的随机数生成器，不受其他代码reseed全局random的影响
+_jitter_random = random.Random()
+
+
+def backoff_delay(attempt, base=0.2, cap=2.0):
+    """全抖动（full jitter）指数退避：在 [0, min(cap, base*2^attempt)] 内随机取值，
+    避免所有worker在同一时刻集中重试"""
+    return _jitter_random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """按滑动窗口错误率熔断
+
+    - closed：正常放行，统计窗口内的成功/失败
+    - open：错误率超过阈值后打开，冷却期内直接拒绝（调用方走降级逻辑）
+    - half_open：冷却结束后只放行一个探测请求，成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, failure_rate=0.5, min_calls=10, window=30, cooldown=15):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._events = deque()  # (时间戳, 是否成功)
+        self._state = 'closed'
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.trips = 0
+        self.rejections = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh(time.monotonic())
+            return self._state
+
+    def allow(self):
+        """是否允许本次请求调用上游"""
+        now = time.monotonic()
+        with self._lock:
+            self._refresh(now)
+            if self._state == 'closed':
+                return True
+            if self._state == 'half_open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejections += 1
+            return False
+
+    def release_probe(self):
+        """放行后未实际调用上游（如被准入控制拒绝或降级）时归还探测名额，既不算成功也不算失败"""
+        with self._lock:
+            if self._state == 'half_open':
+                self._probe_in_flight = False
+
+    def record_success(self):
+        self._record(True)
+
+    def record_failure(self):
+        self._record(False)
+
+    def _record(self, ok):
+        now = time.monotonic()
+        with self._lock:
+            if self._state == 'half_open':
+                self._probe_in_flight = False
+                if ok:
+                    self._state = 'closed'
+                    self._events.clear()
+                else:
+                    self._open(now)
+                return
+            if self._state == 'open':
+                return
+            self._events.append((now, ok))
+            self._trim(now)
+            total = len(self._events)
+            if total >= self.min_calls:
+                failures = sum(1 for _, success in self._events if not success)
+                if failures / total >= self.failure_rate:
+                    self._open(now)
+
+    def _open(self, now):
+        self._state = 'open'
+        self._opened_at = now
+        self._events.clear()
+        self.trips += 1
+        print(f"熔断器打开：上游错误率过高，{self.cooldown}秒内使用降级响应")
+
+    def _refresh(self, now):
+        if self._state == 'open' and now - self._opened_at >= self.cooldown:
+            self._state = 'half_open'
+            self._probe_in_flight = False
+
+    def _trim(self, now):
+        while self._events and now - self._events[0][0] > self.window:
+            self._events.popleft()
+
+    def stats(self):
+        with self._lock:
+            self._refresh(time.monotonic())
+            return {'state': self._state, 'trips': self.trips, 'rejections': self.rejections}
+
+
+class RetryBudget:
+    """重试预算：每个请求存入ratio个令牌，每次重试消耗一个令牌
+
+    上游整体故障时重试量被限制在请求量的ratio比例内，避免重试风暴。
+    min_retries_per_sec保证低流量时也能有少量重试。
+    """
+
+    def __init__(self, ratio=0.2, min_retries_per_sec=1.0, max_tokens=100):
+        self.ratio = ratio
+        self.min_retries_per_sec = min_retries_per_sec
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._tokens = float(min(max_tokens, 10))  # 启动时预留少量重试机会
+        self._last = time.monotonic()
+        self.exhausted = 0
+
+    def record_request(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self):
+        """尝试消耗一次重试机会，预算不足返回False"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            self.exhausted += 1
+            return False
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._last) * self.min_retries_per_sec)
+        self._last = now
+
+
+class CallTimeout(Exception):
+    """上游调用超时"""
+
+
+# 用于强制单次调用超时的线程池；超时后调用方立即返回，后台线程自行结束
+_timeout_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='ai-call')
+
+
+def call_with_timeout(fn, timeout, *args, **kwargs):
+    """在限定时间内执行fn，超时抛出CallTimeout"""
+    if not timeout:
+        return fn(*args, **kwargs)
+    future = _timeout_executor.submit(fn, *args, **kwargs)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        future.cancel()
+        raise CallTimeout(f"上游调用超过{timeout}秒未返回")
+
+
+class TokenBucket:
+    """令牌桶限速：rate为每秒补充的令牌数，capacity为突发上限"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._lock = threading.Lock()
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+
+    def try_acquire(self, tokens=1):
+        """立即尝试取令牌，不足返回False"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1, timeout=None):
+        """阻塞等待直到取得令牌，超时返回False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
@@ -0,0 +1,154 @@
+# 分享卡片渲染
+# 渐变背景只绘制一次，之后每次复制；字体加载结果缓存；相同内容的卡片直接复用已编码的JPEG
+# Pillow在首次渲染时才导入，不需要分享卡片的请求（包括冷启动）不承担导入开销
+import io
+import json
+import os
+import threading
+
+from cache_store import LRUCache
+from metrics import SHARE_CARD_CACHE_REQUESTS, SHARE_CARD_RENDER_SECONDS
+
+CARD_WIDTH, CARD_HEIGHT = 400, 600
+GRADIENT_STEPS = 50
+JPEG_QUALITY = 85
+
+# 支持中文的字体候选路径，可通过SHARE_CARD_FONT指定
+FONT_CANDIDATES = [
+    os.getenv('SHARE_CARD_FONT', ''),
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',
+    '/System/Library/Fonts/PingFang.ttc',
+    'C:/Windows/Fonts/msyh.ttc',
+]
+
+# 已知的卡片类型；其他值按通用卡片渲染，缓存key和指标标签统一记为other，避免任意输入撑大指标基数
+CARD_TYPES = ('number', 'fortune', 'name', 'lucky')
+
+_background = None
+_background_lock = threading.Lock()
+_fonts = {}
+Image = ImageDraw = ImageFont = None
+
+# 已渲染卡片缓存：(类型, 内容) -> JPEG字节
+card_cache = LRUCache(
+    max_entries=int(os.getenv('SHARE_CARD_CACHE_ENTRIES', '512')),
+    max_bytes=int(os.getenv('SHARE_CARD_CACHE_BYTES', str(16 * 1024 * 1024))),
+    ttl=int(os.getenv('SHARE_CARD_CACHE_TTL', '3600'))
+)
+
+
+def load_pil():
+    """首次使用时导入Pillow"""
+    global Image, ImageDraw, ImageFont
+    if Image is None:
+        from PIL import Image as _Image, ImageDraw as _ImageDraw, ImageFont as _ImageFont
+        ImageDraw, ImageFont = _ImageDraw, _ImageFont
+        Image = _Image
+
+
+def get_background():
+    """返回渐变背景（首次调用时绘制，之后直接复用）"""
+    global _background
+    if _background is None:
+        with _background_lock:
+            if _background is None:
+                load_pil()
+                image = Image.new('RGB', (CARD_WIDTH, CARD_HEIGHT), '#6a11cb')
+                draw = ImageDraw.Draw(image)
+                step_height = CARD_HEIGHT // GRADIENT_STEPS
+                for i in range(GRADIENT_STEPS):
+                    y = i * step_height
+                    ratio = i / GRADIENT_STEPS
+                    r = int(106 * (1 - ratio) + 37 * ratio)
+                    g = int(17 * (1 - ratio) + 117 * ratio)
+                    b = int(203 * (1 - ratio) + 252 * ratio)
+                    draw.rectangle([(0, y), (CARD_WIDTH, y + step_height)], fill=(r, g, b))
+                _background = image
+    return _background
+
+
+def get_font(size):
+    """加载并缓存指定字号的字体，优先使用支持中文的字体"""
+    font = _fonts.get(size)
+    if font is None:
+        load_pil()
+        for path in FONT_CANDIDATES:
+            if path and os.path.exists(path):
+                try:
+                    font = ImageFont.truetype(path, size)
+                    break
+                except OSError:
+                    continue
+        if font is None:
+            font = ImageFont.load_default()
+        _fonts[size] = font
+    return font
+
+
+def warm_share_card():
+    """预热：导入Pillow并准备背景和常用字号的字体"""
+    get_background()
+    for size in (28, 20, 16):
+        get_font(size)
+
+
+def _draw_centered(draw, y, text, font, fill):
+    bbox = draw.textbbox((0, 0), text, font=font)
+    text_width = bbox[2] - bbox[0]
+    draw.text(((CARD_WIDTH - text_width) // 2, y), text, fill=fill, font=font)
+
+
+def _render(card_type, content):
+    image = get_background().copy()
+    draw = ImageDraw.Draw(image)
+    title_font = get_font(28)
+    subtitle_font = get_font(20)
+    content_font = get_font(16)
+
+    # 绘制标题
+    _draw_centered(draw, 50, "红姐数字能量站", title_font, 'white')
+
+    # 根据类型绘制不同内容
+    if card_type == 'number':
+        # 手机号码估值卡片
+        number = content.get('number', '****')
+        price = content.get('price', '未知')
+        level = content.get('level', '普通级')
+        _draw_centered(draw, 150, f"手机尾号: {number}", subtitle_font, 'white')
+        _draw_centered(draw, 250, f"估值: ¥{price}", title_font, '#ffd700')
+        _draw_centered(draw, 350, f"等级: {level}", subtitle_font, 'white')
+
+    elif card_type == 'lucky':
+        # 幸运转盘卡片
+        prize = content.get('prize', '好运连连')
+        score = content.get('score', 50)
+        _draw_centered(draw, 200, f"🎉 {prize} 🎉", title_font, '#ffd700')
+        _draw_centered(draw, 300, f"幸运值: {score}", subtitle_font, 'white')
+
+    # 绘制底部文字
+    _draw_centered(draw, CARD_HEIGHT - 80, "仅供传统文化娱乐参考", content_font, 'white')
+
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+    return buffered.getvalue()
+
+
+def render_share_card(card_type, content):
+    """渲染分享卡片并返回JPEG字节，相同 (类型, 内容) 直接返回缓存结果"""
+    if card_type not in CARD_TYPES:
+        card_type = 'other'
+    if not isinstance(content, dict):
+        content = {}
+    cache_key = f"{card_type}:{json.dumps(content, ensure_ascii=False, sort_keys=True, default=str)}"
+    jpeg_bytes = card_cache.get(cache_key)
+    if jpeg_bytes is None:
+        SHARE_CARD_CACHE_REQUESTS.inc('miss')
+        with SHARE_CARD_RENDER_SECONDS.time(card_type):
+            jpeg_bytes = _render(card_type, content)
+        card_cache.set(cache_key, jpeg_bytes)
+    else:
+        SHARE_CARD_CACHE_REQUESTS.inc('hit')
+    return jpeg_bytes
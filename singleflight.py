@@ -0,0 +1,174 @@
+# 请求合并（single-flight）
+# 同一个key的并发请求只触发一次上游调用，其余请求等待并共享结果
+# asyncio版本在async_singleflight.py中，Flask入口不必导入asyncio
+import threading
+import time
+
+from metrics import STREAM_FANOUT_TIMEOUTS
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """同一key同一时刻只执行一次fn，并发调用者共享返回值或异常"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def do(self, key, fn, timeout=None):
+        """执行fn并返回 (结果, 是否为共享结果)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            if not call.event.wait(timeout):
+                raise TimeoutError(f"等待合并请求超时: {key}")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+class _Broadcast:
+    def __init__(self):
+        self.chunks = []
+        self.offsets = [0]  # offsets[i]为前i个片段的UTF-8字节总数，用于O(1)计算待发送字节数
+        self.done = False
+        self.subscribers = 0
+        self.cond = threading.Condition()
+
+    def append(self, chunk):
+        self.chunks.append(chunk)
+        self.offsets.append(self.offsets[-1] + len(chunk.encode('utf-8')))
+
+    def pending_bytes(self, index):
+        return self.offsets[-1] - self.offsets[index]
+
+
+class StreamFanout:
+    """一个上游流式生成器的输出分发给所有订阅者
+
+    第一个订阅者启动后台线程拉取上游数据，后来的订阅者先补发已有片段，
+    再跟随实时片段，直到上游结束。上游只会被调用一次。
+
+    设置flush_interval/flush_bytes后，订阅者会把细碎片段攒成一批再输出：
+    待发送数据达到flush_bytes字节或距首个待发送片段超过flush_interval秒即刷新。
+    """
+
+    def __init__(self, wait_timeout=60, flush_interval=0, flush_bytes=0):
+        self._lock = threading.Lock()
+        self._streams = {}
+        self.wait_timeout = wait_timeout
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.leaders = 0
+        self.shared = 0
+
+    def subscribe(self, key, factory):
+        """订阅key对应的流；factory返回上游生成器，仅在无进行中的流时调用"""
+        with self._lock:
+            broadcast = self._streams.get(key)
+            if broadcast is None:
+                broadcast = _Broadcast()
+                self._streams[key] = broadcast
+                self.leaders += 1
+                start = True
+            else:
+                self.shared += 1
+                start = False
+            broadcast.subscribers += 1
+
+        if start:
+            thread = threading.Thread(target=self._pump, args=(key, broadcast, factory), daemon=True)
+            thread.start()
+        return self._follow(broadcast)
+
+    def _pump(self, key, broadcast, factory):
+        try:
+            for chunk in factory():
+                with broadcast.cond:
+                    broadcast.append(chunk)
+                    broadcast.cond.notify_all()
+        except Exception as e:
+            print(f"流式合并上游异常: {str(e)}")
+            with broadcast.cond:
+                broadcast.append(f"调用API时发生异常: {str(e)}")
+        finally:
+            with self._lock:
+                self._streams.pop(key, None)
+            with broadcast.cond:
+                broadcast.done = True
+                broadcast.cond.notify_all()
+
+    def _follow(self, broadcast):
+        index = 0
+        while True:
+            with broadcast.cond:
+                timed_out = False
+                while index >= len(broadcast.chunks) and not broadcast.done:
+                    if not broadcast.cond.wait(self.wait_timeout):
+                        timed_out = True
+                        break
+            if timed_out:
+                # 与上游异常相同，以错误文字结尾，客户端不会把截断的内容当成完整结果
+                STREAM_FANOUT_TIMEOUTS.inc()
+                print(f"流式合并等待上游超时（{self.wait_timeout}秒）")
+                yield f"调用API时发生异常: 等待上游响应超时（{self.wait_timeout}秒）"
+                return
+            with broadcast.cond:
+                if self.flush_interval:
+                    # 攒批：等到字节数达标、超过刷新间隔或上游结束
+                    deadline = time.monotonic() + self.flush_interval
+                    while not broadcast.done and broadcast.pending_bytes(index) < self.flush_bytes:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        broadcast.cond.wait(remaining)
+                pending = broadcast.chunks[index:]
+                done = broadcast.done
+            if pending:
+                yield ''.join(pending)
+            index += len(pending)
+            if done and index >= len(broadcast.chunks):
+                return
+
+    def is_active(self, key):
+        """key对应的上游流是否仍在进行"""
+        with self._lock:
+            return key in self._streams
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._streams)
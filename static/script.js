@@ -24,7 +24,9 @@ function switchTab(tabName) {
 
     // Load rankings if switching to ranking tab
     if (tabName === 'ranking') {
-        loadRankings();
+        subscribeRankings();
+    } else {
+        unsubscribeRankings();
     }
 }
 
@@ -59,22 +61,27 @@ async function evaluateNumber() {
     resultDiv.style.display = 'none';
 
     try {
-        const response = await fetch('/evaluate', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ number: number }),
+        // 流式评估：价格、等级、建议各自生成完即显示
+        let streamError = null;
+        await fetchStreamWithResume('/evaluate', { number: number }, async (data, type) => {
+            if (type === 'error') {
+                streamError = JSON.parse(data).error;
+                return;
+            }
+            if (type !== 'field') return;
+            const field = JSON.parse(data);
+            if (field.name === 'price') {
+                priceEl.textContent = `¥ ${field.value}`;
+            } else if (field.name === 'level') {
+                levelEl.textContent = field.value;
+            } else if (field.name === 'suggestion') {
+                suggestionEl.textContent = field.value;
+            }
+            resultDiv.style.display = 'block';
         });
-
-        if (!response.ok) {
-            const errorData = await response.json();
-            throw new Error(errorData.error || '评估失败');
+        if (streamError) {
+            throw new Error(streamError);
         }
-
-        const result = await response.json();
-
-        priceEl.textContent = `¥ ${result.price}`;
-        levelEl.textContent = result.level;
-        suggestionEl.textContent = result.suggestion;
         resultDiv.style.display = 'block';
 
     } catch (error) {
@@ -106,9 +113,95 @@ function initializeInputs() {
     }
 }
 
+// 逐字显示文本（打字机效果）
+async function typeText(element, text, typingSpeed) {
+    for (const char of text) {
+        if (char === '\n') {
+            element.innerHTML += '<br>';
+        } else {
+            element.innerHTML += char;
+        }
+        await sleep(typingSpeed);
+    }
+}
+
+// 解析一条SSE事件
+function parseSSEEvent(raw) {
+    const event = { id: null, event: null, data: null };
+    const dataLines = [];
+    for (const line of raw.split('\n')) {
+        if (!line || line.startsWith(':')) continue;
+        const index = line.indexOf(':');
+        const field = index === -1 ? line : line.slice(0, index);
+        let value = index === -1 ? '' : line.slice(index + 1);
+        if (value.startsWith(' ')) value = value.slice(1);
+        if (field === 'id') event.id = value;
+        else if (field === 'event') event.event = value;
+        else if (field === 'data') dataLines.push(value);
+    }
+    if (dataLines.length) event.data = dataLines.join('\n');
+    return event;
+}
+
+// 以SSE方式请求流式接口；移动网络断线时携带Last-Event-ID续传，不会重新生成
+// onText(null) 表示服务端要求清空已显示内容并从头开始；第二个参数为事件类型（field、result等）
+async function fetchStreamWithResume(url, payload, onText, maxRetries = 3) {
+    let lastEventId = null;
+    for (let attempt = 0; ; attempt++) {
+        const headers = { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' };
+        if (lastEventId !== null) {
+            headers['Last-Event-ID'] = lastEventId;
+        }
+        try {
+            const response = await fetch(url, {
+                method: 'POST',
+                headers,
+                body: JSON.stringify(payload),
+            });
+            if (response.status === 429) {
+                // 被限速或服务繁忙，立即重试只会继续被拒绝
+                const body = await response.json().catch(() => ({}));
+                const error = new Error(body.error || '请求过于频繁，请稍后再试。');
+                error.noRetry = true;
+                throw error;
+            }
+            if (!response.ok) {
+                throw new Error(`服务出错: ${response.status}`);
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                let separator;
+                while ((separator = buffer.indexOf('\n\n')) !== -1) {
+                    const event = parseSSEEvent(buffer.slice(0, separator));
+                    buffer = buffer.slice(separator + 2);
+                    if (event.event === 'done') return;
+                    if (event.event === 'reset') {
+                        await onText(null);
+                    } else if (event.data !== null) {
+                        await onText(event.data, event.event);
+                    }
+                    if (event.id !== null) lastEventId = event.id;
+                }
+            }
+            // 没有收到done事件就结束，说明连接中断
+            throw new Error('连接中断');
+        } catch (error) {
+            if (error.noRetry || attempt >= maxRetries) throw error;
+            await sleep(1000 * (attempt + 1));
+        }
+    }
+}
+
 async function getFortune() {
     const birthdateInput = document.getElementById('birthdate');
     const birthdate = birthdateInput.value;
+    const birthtime = document.getElementById('birthtime').value;
     const fortuneResultDiv = document.getElementById('fortune-result');
     const fortuneTextEl = document.getElementById('fortune-text');
     const fortuneBtn = document.querySelector('#fortune-telling .evaluate-btn');
@@ -125,34 +218,15 @@ async function getFortune() {
     fortuneTextEl.innerHTML = ''; // Clear previous results
 
     try {
-        const response = await fetch('/fortune', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ birthdate: birthdate }),
-        });
-
-        if (!response.ok) {
-            throw new Error('算命服务出错');
-        }
-
-        const reader = response.body.getReader();
-        const decoder = new TextDecoder();
         const typingSpeed = 20; // Adjusted speed for better readability
 
-        while (true) {
-            const { done, value } = await reader.read();
-            if (done) break;
-            
-            const chunk = decoder.decode(value, { stream: true });
-            for (const char of chunk) {
-                if (char === '\n') {
-                    fortuneTextEl.innerHTML += '<br>';
-                } else {
-                    fortuneTextEl.innerHTML += char;
-                }
-                await sleep(typingSpeed);
+        await fetchStreamWithResume('/fortune', birthtime ? { birthdate, birthtime } : { birthdate }, async (text) => {
+            if (text === null) {
+                fortuneTextEl.innerHTML = ''; // 服务端要求重新开始
+                return;
             }
-        }
+            await typeText(fortuneTextEl, text, typingSpeed);
+        });
 
     } catch (error) {
         console.error('算命出错:', error);
@@ -183,34 +257,15 @@ async function analyzeName() {
     nameTextEl.innerHTML = '';
 
     try {
-        const response = await fetch('/name_analysis', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ name: name }),
-        });
-
-        if (!response.ok) {
-            throw new Error('姓名分析服务出错');
-        }
-
-        const reader = response.body.getReader();
-        const decoder = new TextDecoder();
         const typingSpeed = 25;
 
-        while (true) {
-            const { done, value } = await reader.read();
-            if (done) break;
-
-            const chunk = decoder.decode(value, { stream: true });
-            for (const char of chunk) {
-                if (char === '\n') {
-                    nameTextEl.innerHTML += '<br>';
-                } else {
-                    nameTextEl.innerHTML += char;
-                }
-                await sleep(typingSpeed);
+        await fetchStreamWithResume('/name_analysis', { name: name }, async (text) => {
+            if (text === null) {
+                nameTextEl.innerHTML = '';
+                return;
             }
-        }
+            await typeText(nameTextEl, text, typingSpeed);
+        });
 
     } catch (error) {
         console.error('姓名分析出错:', error);
@@ -802,16 +857,99 @@ function switchRankingTab(tabName) {
     }
 }
 
+// 排行榜默认按ETag轮询：未变化时服务端返回304，连续未变化时逐步拉长间隔；
+// 服务端通过X-Rankings-Stream声明支持推送（ASGI部署）时改用SSE，推送失败再退回轮询
+const RANKINGS_POLL_MIN_MS = 5000;
+const RANKINGS_POLL_MAX_MS = 60000;
+let rankingsEtag = null;
+let rankingsPollTimer = null;
+let rankingsPollDelay = RANKINGS_POLL_MIN_MS;
+let rankingsSubscribed = false;
+let rankingsSource = null;
+let rankingsStreamFailed = false;
+
+function renderActiveRanking() {
+    if (document.getElementById('recent-ranking').classList.contains('active')) {
+        renderRecentRanking();
+    } else {
+        renderTopRanking();
+    }
+}
+
 async function loadRankings() {
+    // 返回排行榜是否有变化；请求失败时抛出，由轮询退避
+    const headers = rankingsEtag ? { 'If-None-Match': rankingsEtag } : {};
+    const response = await fetch('/rankings', { headers, cache: 'no-store' });
+    if (response.status === 304) return false;
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    rankingsEtag = response.headers.get('ETag');
+    rankingsData = await response.json();
+    renderActiveRanking();
+    const streamUrl = response.headers.get('X-Rankings-Stream');
+    if (streamUrl && rankingsSubscribed) openRankingsStream(streamUrl);
+    return true;
+}
+
+async function pollRankings() {
+    rankingsPollTimer = null;
+    if (!rankingsSubscribed || rankingsSource) return;
     try {
-        const response = await fetch('/rankings');
-        if (response.ok) {
-            rankingsData = await response.json();
-            renderTopRanking();
-        }
+        const changed = document.hidden ? false : await loadRankings();
+        rankingsPollDelay = changed ? RANKINGS_POLL_MIN_MS : Math.min(rankingsPollDelay * 1.5, RANKINGS_POLL_MAX_MS);
     } catch (error) {
         console.error('加载排行榜失败:', error);
+        rankingsPollDelay = Math.min(rankingsPollDelay * 2, RANKINGS_POLL_MAX_MS);
     }
+    if (rankingsSubscribed && !rankingsSource && !rankingsPollTimer) {
+        rankingsPollTimer = setTimeout(pollRankings, rankingsPollDelay);
+    }
+}
+
+function openRankingsStream(url) {
+    if (rankingsSource || rankingsStreamFailed || typeof EventSource === 'undefined') return;
+    rankingsSource = new EventSource(url);
+    let received = false;
+    rankingsSource.addEventListener('rankings', (event) => {
+        received = true;
+        try {
+            rankingsData = JSON.parse(event.data);
+            rankingsEtag = event.lastEventId ? `"${event.lastEventId}"` : rankingsEtag;
+            renderActiveRanking();
+        } catch (error) {
+            console.error('解析排行榜推送失败:', error);
+        }
+    });
+    rankingsSource.addEventListener('error', () => {
+        // 收到过数据且浏览器仍在自动重连时等待重连；从未收到数据（如未以ASGI部署）或连接已关闭时退回轮询
+        if (received && rankingsSource.readyState !== EventSource.CLOSED) return;
+        rankingsStreamFailed = !received;
+        closeRankingsStream();
+        if (rankingsSubscribed && !rankingsPollTimer) {
+            rankingsPollTimer = setTimeout(pollRankings, rankingsPollDelay);
+        }
+    });
+}
+
+function closeRankingsStream() {
+    if (rankingsSource) {
+        rankingsSource.close();
+        rankingsSource = null;
+    }
+}
+
+// 仅在排行榜标签页打开时更新
+function subscribeRankings() {
+    if (rankingsSubscribed) return;
+    rankingsSubscribed = true;
+    rankingsPollDelay = RANKINGS_POLL_MIN_MS;
+    pollRankings();
+}
+
+function unsubscribeRankings() {
+    rankingsSubscribed = false;
+    clearTimeout(rankingsPollTimer);
+    rankingsPollTimer = null;
+    closeRankingsStream();
 }
 
 function renderTopRanking() {
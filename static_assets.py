@@ -0,0 +1,196 @@
+# 带内容摘要的静态资源
+# 构建时把static下的脚本和样式按内容摘要重命名写入static/dist，同时生成gzip和brotli预压缩版本，
+# 页面通过 /assets/<带摘要的文件名> 引用，内容一变文件名就变，因此可以设置一年的immutable缓存，
+# 浏览器再次访问时不必重新验证。manifest.json记录每个源文件的摘要，加载时与static下的当前文件比对，
+# 未构建或构建产物已过期时在首次使用时于内存中计算摘要和gzip版本（不含brotli）。
+#
+# 构建：python static_assets.py build（生成brotli版本需要 pip install brotli）
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+import threading
+from collections import namedtuple
+
+from stream_compression import negotiate_encoding
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(ROOT, 'static')
+DEFAULT_DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_NAME = 'manifest.json'
+ASSET_FILES = ('style.css', 'script.js')
+# 编码 -> 预压缩文件后缀，顺序即协商时的服务端偏好
+ASSET_ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# bodies: 编码 -> 内容，identity为未压缩版本
+Asset = namedtuple('Asset', ['name', 'filename', 'digest', 'mimetype', 'bodies'])
+
+
+def fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def hashed_filename(name, digest):
+    base, ext = os.path.splitext(name)
+    return f'{base}.{digest}{ext}'
+
+
+def _brotli():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def compress_variants(data, brotli=None):
+    """生成预压缩版本，只保留比原文件小的"""
+    variants = {'gzip': gzip.compress(data, 9, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(data, quality=11)
+    return {encoding: body for encoding, body in variants.items() if len(body) < len(data)}
+
+
+def make_asset(name, data, variants):
+    digest = fingerprint(data)
+    mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    if mimetype.startswith('text/') or mimetype.endswith('javascript'):
+        mimetype += '; charset=utf-8'
+    return Asset(name, hashed_filename(name, digest), digest, mimetype, {'identity': data, **variants})
+
+
+def build_assets(static_dir=STATIC_DIR, dist_dir=DEFAULT_DIST_DIR):
+    """生成带摘要的资源文件、预压缩版本和manifest.json，并清理上一次构建的旧文件"""
+    brotli = _brotli()
+    if brotli is None:
+        print('未安装brotli，跳过.br预压缩版本（pip install brotli）')
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest = {}
+    written = set()
+    for name in ASSET_FILES:
+        with open(os.path.join(static_dir, name), 'rb') as f:
+            data = f.read()
+        asset = make_asset(name, data, compress_variants(data, brotli))
+        manifest[name] = {'file': asset.filename, 'source': asset.digest}
+        for encoding, body in asset.bodies.items():
+            filename = asset.filename + ASSET_ENCODINGS.get(encoding, '')
+            with open(os.path.join(dist_dir, filename), 'wb') as f:
+                f.write(body)
+            written.add(filename)
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    for filename in os.listdir(dist_dir):
+        if filename not in written and filename != MANIFEST_NAME:
+            os.remove(os.path.join(dist_dir, filename))
+    return manifest
+
+
+def _load_built(dist_dir, static_dir=STATIC_DIR):
+    """加载构建产物；构建后源文件又被修改（或部署时未重新构建）时抛出ValueError，改为内存中生成"""
+    with open(os.path.join(dist_dir, MANIFEST_NAME), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if set(manifest) != set(ASSET_FILES):
+        raise ValueError('manifest.json 中的资源列表与当前版本不一致')
+    assets = []
+    for name, entry in manifest.items():
+        if not isinstance(entry, dict):
+            raise ValueError('manifest.json 格式过旧，请重新构建')
+        with open(os.path.join(static_dir, name), 'rb') as f:
+            if fingerprint(f.read()) != entry.get('source'):
+                raise ValueError(f'{name} 在构建后已修改，构建产物已过期')
+        filename = entry['file']
+        path = os.path.join(dist_dir, filename)
+        with open(path, 'rb') as f:
+            data = f.read()
+        variants = {}
+        for encoding, suffix in ASSET_ENCODINGS.items():
+            if os.path.exists(path + suffix):
+                with open(path + suffix, 'rb') as f:
+                    variants[encoding] = f.read()
+        asset = make_asset(name, data, variants)
+        if asset.filename != filename:
+            raise ValueError(f'{filename} 内容与文件名摘要不一致')
+        assets.append(asset)
+    return assets
+
+
+def _compute_in_memory(static_dir):
+    assets = []
+    for name in ASSET_FILES:
+        with open(os.path.join(static_dir, name), 'rb') as f:
+            data = f.read()
+        assets.append(make_asset(name, data, compress_variants(data)))
+    return assets
+
+
+_assets = None
+_assets_lock = threading.Lock()
+
+
+def load_assets(dist_dir=None):
+    """加载静态资源（进程内只加载一次）：优先用构建产物，未构建或构建产物无效时在内存中生成"""
+    global _assets
+    if _assets is None:
+        with _assets_lock:
+            if _assets is None:
+                dist_dir = dist_dir or os.getenv('STATIC_DIST_DIR', DEFAULT_DIST_DIR)
+                assets = None
+                if os.path.exists(os.path.join(dist_dir, MANIFEST_NAME)):
+                    try:
+                        assets = _load_built(dist_dir)
+                        print(f"静态资源构建产物加载成功: {dist_dir}")
+                    except (OSError, ValueError) as e:
+                        print(f"静态资源构建产物加载失败，改为内存中生成: {str(e)}")
+                if assets is None:
+                    try:
+                        assets = _compute_in_memory(STATIC_DIR)
+                    except OSError as e:
+                        print(f"静态资源加载失败，使用未加摘要的原始文件: {str(e)}")
+                        assets = []
+                _assets = {
+                    **{asset.name: asset for asset in assets},
+                    **{asset.filename: asset for asset in assets},
+                }
+    return _assets
+
+
+def asset_filename(name):
+    """原始文件名对应的带摘要文件名，未登记的资源返回None"""
+    asset = load_assets().get(name)
+    return asset.filename if asset is not None else None
+
+
+def find_asset(filename):
+    """按带摘要的文件名查找资源"""
+    asset = load_assets().get(filename)
+    return asset if asset is not None and asset.filename == filename else None
+
+
+def choose_body(asset, accept_encoding):
+    """按Accept-Encoding选择预压缩版本，返回 (编码或None, 内容)"""
+    available = tuple(encoding for encoding in ASSET_ENCODINGS if encoding in asset.bodies)
+    encoding = negotiate_encoding(accept_encoding, available)
+    return encoding, asset.bodies[encoding or 'identity']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='红姐数字能量站静态资源构建工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='生成带内容摘要的预压缩静态资源')
+    build_parser.add_argument('--output', default=os.getenv('STATIC_DIST_DIR', DEFAULT_DIST_DIR))
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        manifest = build_assets(STATIC_DIR, args.output)
+        for name, entry in manifest.items():
+            print(f"{name} -> {entry['file']}")
+        print(f"已生成静态资源: {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
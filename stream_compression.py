@@ -0,0 +1,84 @@
+# 按Accept-Encoding协商的响应压缩
+# 流式文本响应逐片段压缩并以Z_SYNC_FLUSH刷新：每个片段压缩后立即可被客户端解出，
+# 不会因为压缩器内部缓冲而推迟首字和后续文字的到达，同时整条流共享同一个压缩上下文。
+import gzip
+import zlib
+
+# 编码 -> zlib的wbits参数（gzip封装 / zlib封装）
+STREAM_ENCODINGS = {'gzip': 31, 'deflate': 15}
+STREAM_COMPRESSION_LEVEL = 6
+
+
+def negotiate_encoding(accept_encoding, available=('gzip', 'deflate')):
+    """按Accept-Encoding（含q值）从available中选出编码，available的顺序即服务端偏好；不可压缩时返回None"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            weights[name] = quality
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = weights.get(encoding, weights.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_bytes(data, encoding, level=STREAM_COMPRESSION_LEVEL):
+    """一次性压缩完整响应体"""
+    if encoding == 'gzip':
+        return gzip.compress(data, level, mtime=0)
+    return zlib.compress(data, level)
+
+
+class StreamCompressor:
+    """增量压缩器：compress()返回本片段可立即解压的输出，finish()返回流尾"""
+
+    def __init__(self, encoding, level=STREAM_COMPRESSION_LEVEL):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, STREAM_ENCODINGS[encoding])
+
+    def compress(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+def compress_chunks(chunks, encoding):
+    """压缩同步的流式响应；被提前关闭时同时关闭上游迭代器（归还上游名额等）"""
+    compressor = StreamCompressor(encoding)
+    try:
+        for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+
+async def compress_async_chunks(chunks, encoding):
+    """压缩异步的流式响应"""
+    compressor = StreamCompressor(encoding)
+    try:
+        async for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk)
+        yield compressor.finish()
+    finally:
+        aclose = getattr(chunks, 'aclose', None)
+        if aclose:
+            await aclose()
@@ -0,0 +1,26 @@
+from werkzeug.datastructures import Headers
+
+from admission import client_identity
+
+
+def test_client_identity_ignores_proxy_headers_when_untrusted():
+    headers = Headers({'X-Forwarded-For': '1.2.3.4', 'X-Real-IP': '1.2.3.4'})
+    assert client_identity('10.0.0.1', headers, trust_proxy=False) == '10.0.0.1'
+
+
+def test_client_identity_uses_rightmost_forwarded_hop():
+    # 客户端自带的X-Forwarded-For: 127.0.0.1 在最左边，代理追加的真实地址在最右边
+    headers = Headers({'X-Forwarded-For': '127.0.0.1, 203.0.113.7'})
+    assert client_identity('10.0.0.1', headers, trust_proxy=True) == '203.0.113.7'
+
+
+def test_client_identity_prefers_proxy_written_headers():
+    headers = Headers({'X-Forwarded-For': '127.0.0.1, 198.51.100.2', 'x-vercel-forwarded-for': '203.0.113.7'})
+    assert client_identity('10.0.0.1', headers, trust_proxy=True) == '203.0.113.7'
+    headers = Headers({'X-Forwarded-For': '127.0.0.1', 'X-Real-IP': '198.51.100.2'})
+    assert client_identity('10.0.0.1', headers, trust_proxy=True) == '198.51.100.2'
+
+
+def test_client_identity_falls_back_to_remote_addr():
+    assert client_identity('10.0.0.1', Headers(), trust_proxy=True) == '10.0.0.1'
+    assert client_identity(None) == 'unknown'
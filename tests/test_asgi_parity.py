@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+
+os.environ.setdefault('LLM_BACKEND', 'mock')
+os.environ.setdefault('DASHSCOPE_API_KEY', 'test')
+os.environ.setdefault('STARTUP_PREWARM', '0')
+os.environ.setdefault('CACHE_WARMER', '0')
+
+import app  # noqa: E402
+import asgi_app  # noqa: E402
+from starlette.testclient import TestClient  # noqa: E402
+
+PRESET = json.dumps({'price': '1', 'level': '语料库', 'suggestion': '来自预设语料库'}, ensure_ascii=False).encode('utf-8')
+
+
+@pytest.fixture
+def clients(monkeypatch):
+    monkeypatch.setattr(app, 'IS_VERCEL', True)
+    monkeypatch.setattr(app, 'client_rate_limiter', None)
+    monkeypatch.setattr(app, 'get_number_preset_bytes', lambda number: PRESET if number == '8888' else None)
+    return app.app.test_client(), TestClient(asgi_app.app)
+
+
+def test_asgi_evaluate_uses_preset_corpus(clients):
+    flask_client, asgi_client = clients
+    flask_body = flask_client.post('/evaluate', json={'number': '8888'}).data
+    asgi_body = asgi_client.post('/evaluate', json={'number': '8888'}).content
+    assert flask_body == asgi_body == PRESET
+
+
+def test_asgi_evaluate_sse_uses_preset_corpus(clients):
+    _, asgi_client = clients
+    response = asgi_client.post('/evaluate', json={'number': '8888'}, headers={'Accept': 'text/event-stream'})
+    assert 'event: result' in response.text
+    assert '来自预设语料库' in response.text
+
+
+def test_asgi_accepts_falsy_non_empty_field(clients):
+    flask_client, asgi_client = clients
+    # 0不是缺少字段，与Flask版一样按号码'0'处理
+    flask_response = flask_client.post('/evaluate', json={'number': 0})
+    asgi_response = asgi_client.post('/evaluate', json={'number': 0})
+    assert 'number' not in asgi_response.json().get('error', '')
+    assert (asgi_response.status_code, asgi_response.json()) == (flask_response.status_code, flask_response.get_json())
+    assert asgi_client.post('/evaluate', json={'number': ''}).status_code == 400
+    assert asgi_client.post('/evaluate', json={}).status_code == 400
+
+
+def test_asgi_shares_flask_ai_timeout():
+    assert asgi_app.AsyncDashScopeClient.__init__.__defaults__[1] == app.AI_TIMEOUT
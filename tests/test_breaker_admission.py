@@ -0,0 +1,68 @@
+import asyncio
+import os
+
+import pytest
+
+os.environ.setdefault('LLM_BACKEND', 'mock')
+os.environ.setdefault('DASHSCOPE_API_KEY', 'test')
+os.environ.setdefault('STARTUP_PREWARM', '0')
+os.environ.setdefault('CACHE_WARMER', '0')
+
+import app  # noqa: E402
+import asgi_app  # noqa: E402
+from admission import AdmissionRejected, ConcurrencyLimiter  # noqa: E402
+from resilience import CircuitBreaker  # noqa: E402
+
+
+def half_open_breaker():
+    breaker = CircuitBreaker(min_calls=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.state == 'half_open'
+    return breaker
+
+
+@pytest.fixture
+def prompt():
+    return app.build_evaluate_prompt('8888')
+
+
+@pytest.mark.parametrize('overflow', ['preset', 'reject'])
+def test_half_open_probe_released_when_admission_rejects(monkeypatch, prompt, overflow):
+    breaker = half_open_breaker()
+    limiter = ConcurrencyLimiter(1, 0, 0.01)
+    limiter.acquire()
+    monkeypatch.setattr(app, 'IS_VERCEL', False)
+    monkeypatch.setattr(app, 'ai_breaker', breaker)
+    monkeypatch.setattr(app, 'upstream_limiter', limiter)
+    monkeypatch.setattr(app, 'ADMISSION_OVERFLOW', overflow)
+
+    if overflow == 'reject':
+        with pytest.raises(AdmissionRejected):
+            app.call_ai_with_retry(prompt)
+    else:
+        assert app.call_ai_with_retry(prompt)
+
+    # 探测名额已归还，下一个请求仍可作为探测调用上游
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+
+
+@pytest.mark.parametrize('overflow', ['preset', 'reject'])
+def test_async_half_open_probe_released_when_admission_rejects(monkeypatch, prompt, overflow):
+    breaker = half_open_breaker()
+    limiter = asgi_app.AsyncConcurrencyLimiter(1, 0, 0.01)
+    limiter.in_flight = 1
+    monkeypatch.setattr(app, 'IS_VERCEL', False)
+    monkeypatch.setattr(app, 'ai_breaker', breaker)
+    monkeypatch.setattr(app, 'ADMISSION_OVERFLOW', overflow)
+    monkeypatch.setattr(asgi_app, 'upstream_limiter', limiter)
+
+    if overflow == 'reject':
+        with pytest.raises(AdmissionRejected):
+            asyncio.run(asgi_app.call_ai_with_retry(prompt))
+    else:
+        text, degraded = asyncio.run(asgi_app.call_ai_with_retry(prompt))
+        assert text and degraded
+
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
@@ -0,0 +1,10 @@
+from cache_store import LRUCache, SQLiteCache, TieredCache
+
+
+def test_tiered_ttl_remaining_uses_longest_layer(tmp_path):
+    cache = TieredCache(LRUCache(ttl=60), SQLiteCache(str(tmp_path / 'cache.db'), ttl=3600))
+    cache.set('key', 'old', ttl=10)
+    # 其他进程刷新了共享层，本进程本地层仍是即将过期的旧条目
+    cache.shared.set('key', 'new', ttl=3600)
+    assert cache.ttl_remaining('key') > 3000
+    assert cache.ttl_remaining('missing') == 0
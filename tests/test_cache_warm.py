@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+os.environ.setdefault('LLM_BACKEND', 'mock')
+os.environ.setdefault('DASHSCOPE_API_KEY', 'test')
+os.environ.setdefault('STARTUP_PREWARM', '0')
+os.environ.setdefault('CACHE_WARMER', '0')
+
+import app  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app, 'CACHE_WARM_TOKEN', None)
+    monkeypatch.setattr(app, 'TRUST_PROXY_HEADERS', True)
+    return app.app.test_client()
+
+
+def test_direct_loopback_request_is_allowed(client):
+    # 鉴权通过后因预热未启用返回503
+    response = client.get('/cache/warm', environ_base={'REMOTE_ADDR': '127.0.0.1'})
+    assert response.status_code == 503
+
+
+@pytest.mark.parametrize('header', ['X-Forwarded-For', 'X-Real-IP', 'X-Vercel-Forwarded-For'])
+def test_forwarded_request_through_local_proxy_is_rejected(client, header):
+    response = client.get('/cache/warm', headers={header: '127.0.0.1'}, environ_base={'REMOTE_ADDR': '127.0.0.1'})
+    assert response.status_code == 403
+
+
+def test_spoofed_forwarded_for_from_remote_client_is_rejected(client):
+    response = client.get('/cache/warm', headers={'X-Forwarded-For': '127.0.0.1'},
+                          environ_base={'REMOTE_ADDR': '203.0.113.7'})
+    assert response.status_code == 403
+
+
+def test_token_is_required_when_configured(client, monkeypatch):
+    monkeypatch.setattr(app, 'CACHE_WARM_TOKEN', 'secret')
+    assert client.get('/cache/warm', environ_base={'REMOTE_ADDR': '127.0.0.1'}).status_code == 401
+    response = client.get('/cache/warm', headers={'Authorization': 'Bearer secret'},
+                          environ_base={'REMOTE_ADDR': '203.0.113.7'})
+    assert response.status_code == 503
+
+
+def test_non_ascii_authorization_is_rejected_not_crashed(client, monkeypatch):
+    monkeypatch.setattr(app, 'CACHE_WARM_TOKEN', 'secret')
+    response = client.get('/cache/warm', headers={'Authorization': 'Bearer sécret'},
+                          environ_base={'REMOTE_ADDR': '127.0.0.1'})
+    assert response.status_code == 401
+
+
+def test_seed_cli_explains_disabled_warmer(monkeypatch, capsys, tmp_path):
+    import io
+    import urllib.error
+
+    import cache_warmer
+
+    def disabled(*args, **kwargs):
+        raise urllib.error.HTTPError('http://127.0.0.1:5000/cache/warm', 503, 'Service Unavailable', {},
+                                     io.BytesIO(b'{}'))
+
+    monkeypatch.setattr(cache_warmer, '_request', disabled)
+    numbers = tmp_path / 'numbers.txt'
+    numbers.write_text('8888\n', encoding='utf-8')
+    assert cache_warmer.main(['seed', '--file', str(numbers)]) == 1
+    assert 'CACHE_WARMER=1' in capsys.readouterr().err
@@ -0,0 +1,37 @@
+import json
+import os
+
+import pytest
+
+os.environ.setdefault('LLM_BACKEND', 'mock')
+os.environ.setdefault('DASHSCOPE_API_KEY', 'test')
+os.environ.setdefault('STARTUP_PREWARM', '0')
+os.environ.setdefault('CACHE_WARMER', '0')
+
+import app  # noqa: E402
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app, 'IS_VERCEL', True)
+    monkeypatch.setattr(app, 'client_rate_limiter', None)
+    return app.app.test_client()
+
+
+@pytest.mark.parametrize('number', [8888, '8888', ' 8888 '])
+def test_evaluate_accepts_numeric_and_padded_numbers(client, number):
+    response = client.post('/evaluate', json={'number': number})
+    assert response.status_code == 200
+    assert json.loads(response.data) == json.loads(client.post('/evaluate', json={'number': '8888'}).data)
+
+
+@pytest.mark.parametrize('number', ['88a8', '８８８８', '٨٨٨٨', [8888], True])
+def test_evaluate_rejects_non_ascii_digits(client, number):
+    response = client.post('/evaluate', json={'number': number})
+    assert response.status_code == 400
+
+
+def test_evaluate_batch_rejects_invalid_number(client):
+    response = client.post('/evaluate_batch', json={'numbers': ['8888', '８８８８']})
+    assert response.status_code == 400
+    assert '第2个' in response.get_json()['error']
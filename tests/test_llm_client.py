@@ -0,0 +1,67 @@
+import os
+
+os.environ.setdefault('LLM_BACKEND', 'mock')
+os.environ.setdefault('DASHSCOPE_API_KEY', 'test')
+os.environ.setdefault('STARTUP_PREWARM', '0')
+os.environ.setdefault('CACHE_WARMER', '0')
+
+import app  # noqa: E402
+from llm_client import Completion, prefetch_first  # noqa: E402
+from resilience import CircuitBreaker, RetryBudget  # noqa: E402
+
+
+def test_prefetch_first_raises_connection_errors_immediately():
+    closed = []
+
+    def failing():
+        try:
+            raise ConnectionError('connect failed')
+            yield  # noqa: unreachable
+        finally:
+            closed.append(True)
+
+    try:
+        prefetch_first(failing())
+    except ConnectionError:
+        pass
+    else:
+        raise AssertionError('应在prefetch_first调用处抛出')
+    assert closed
+
+
+def test_prefetch_first_preserves_items_and_closes():
+    closed = []
+
+    def chunks():
+        try:
+            yield from ['a', 'b', 'c']
+        finally:
+            closed.append(True)
+
+    stream = prefetch_first(chunks())
+    assert next(stream) == 'a'
+    stream.close()
+    assert closed
+    assert list(prefetch_first(chunks())) == ['a', 'b', 'c']
+    assert list(prefetch_first(iter([]))) == []
+
+
+def test_stream_connection_error_is_retried(monkeypatch):
+    attempts = []
+
+    class FlakyClient:
+        def stream(self, prompt, parameters):
+            def chunks():
+                attempts.append(True)
+                if len(attempts) == 1:
+                    raise ConnectionError('reset by peer')
+                yield Completion('ok', {})
+            return prefetch_first(chunks())
+
+    monkeypatch.setattr(app, 'get_llm_client', lambda: FlakyClient())
+    monkeypatch.setattr(app, 'ai_breaker', CircuitBreaker())
+    monkeypatch.setattr(app, 'retry_budget', RetryBudget(ratio=1.0))
+    monkeypatch.setattr(app, 'AI_RETRY_BASE_DELAY', 0)
+    chunks = app.call_upstream(app.build_evaluate_prompt('8888'), True, 3, None)
+    assert [chunk.text for chunk in chunks] == ['ok']
+    assert len(attempts) == 2
@@ -0,0 +1,22 @@
+from number_scoring import clean_number, normalize_tail, score_number
+
+
+def test_normalize_tail_uses_ascii_digits_only():
+    assert normalize_tail('138-0013-8888') == '8888'
+    assert normalize_tail(13800138888) == '8888'
+    assert normalize_tail('８８８８') is None
+    assert normalize_tail('²³¹⁴') is None
+    assert normalize_tail('12٨٨٨٨') is None
+
+
+def test_score_number_ignores_unicode_digits():
+    assert score_number('８８８８') is None
+    assert score_number('8888') == score_number('0000-8888')
+
+
+def test_clean_number():
+    assert clean_number(8888) == '8888'
+    assert clean_number(' 0520 ') == '0520'
+    assert clean_number('８８８８') is None
+    assert clean_number('') is None
+    assert clean_number(None) is None
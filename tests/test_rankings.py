@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+os.environ.setdefault('LLM_BACKEND', 'mock')
+os.environ.setdefault('DASHSCOPE_API_KEY', 'test')
+os.environ.setdefault('STARTUP_PREWARM', '0')
+os.environ.setdefault('CACHE_WARMER', '0')
+
+import app  # noqa: E402
+import asgi_app  # noqa: E402
+from starlette.testclient import TestClient  # noqa: E402
+
+
+@pytest.fixture
+def client():
+    return app.app.test_client()
+
+
+def test_rankings_poll_is_conditional(client):
+    response = client.get('/rankings')
+    assert response.status_code == 200
+    assert 'X-Rankings-Stream' not in response.headers
+    etag = response.headers['ETag']
+    assert client.get('/rankings', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_rankings_advertises_stream_when_enabled(client, monkeypatch):
+    monkeypatch.setattr(app, 'RANKINGS_STREAM', True)
+    assert client.get('/rankings').headers['X-Rankings-Stream'] == '/rankings/stream'
+
+
+def test_rankings_stream_is_not_served_by_flask(client):
+    assert client.get('/rankings/stream').status_code == 404
+
+
+def test_rankings_stream_is_served_by_asgi(monkeypatch):
+    monkeypatch.setattr(app, 'RANKINGS_STREAM_MAX_SECONDS', 0)
+    with TestClient(asgi_app.app) as asgi_client:
+        response = asgi_client.get('/rankings/stream')
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+    assert 'event: rankings' in response.text
@@ -0,0 +1,15 @@
+import pytest
+
+pytest.importorskip('PIL')
+
+from metrics import SHARE_CARD_RENDER_SECONDS  # noqa: E402
+from share_card import render_share_card  # noqa: E402
+
+
+def test_unknown_card_types_share_the_other_label():
+    for card_type in ('unknown-1', 'unknown-2', ['list'], None):
+        assert render_share_card(card_type, {'number': '8888'})
+    render_share_card('lucky', {'prize': '大吉大利', 'score': 88})
+    labels = {key[0] for key in SHARE_CARD_RENDER_SECONDS.collect()}
+    assert labels <= {'number', 'fortune', 'name', 'lucky', 'other'}
+    assert {'other', 'lucky'} <= labels
@@ -0,0 +1,26 @@
+import threading
+
+from metrics import STREAM_FANOUT_TIMEOUTS
+from singleflight import StreamFanout
+
+
+def test_follower_timeout_ends_with_error_marker():
+    release = threading.Event()
+
+    def upstream():
+        yield '第一段'
+        release.wait(5)
+        yield '第二段'
+
+    fanout = StreamFanout(wait_timeout=0.05)
+    before = sum(STREAM_FANOUT_TIMEOUTS.collect().values())
+    chunks = list(fanout.subscribe('key', upstream))
+    release.set()
+    assert chunks[0] == '第一段'
+    assert chunks[-1].startswith('调用API时发生异常')
+    assert sum(STREAM_FANOUT_TIMEOUTS.collect().values()) == before + 1
+
+
+def test_follower_receives_complete_stream():
+    fanout = StreamFanout(wait_timeout=1)
+    assert ''.join(fanout.subscribe('key', lambda: iter(['a', 'b', 'c']))) == 'abc'
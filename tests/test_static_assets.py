@@ -0,0 +1,32 @@
+import shutil
+
+import pytest
+
+import static_assets
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    path = tmp_path / 'static'
+    path.mkdir()
+    for name in static_assets.ASSET_FILES:
+        shutil.copy(static_assets.os.path.join(static_assets.STATIC_DIR, name), path / name)
+    return path
+
+
+def test_built_assets_load_while_sources_match(static_dir, tmp_path):
+    dist_dir = tmp_path / 'dist'
+    manifest = static_assets.build_assets(str(static_dir), str(dist_dir))
+    assets = static_assets._load_built(str(dist_dir), str(static_dir))
+    assert {asset.name: asset.filename for asset in assets} == {
+        name: entry['file'] for name, entry in manifest.items()
+    }
+
+
+def test_stale_build_is_rejected_after_source_changes(static_dir, tmp_path):
+    dist_dir = tmp_path / 'dist'
+    static_assets.build_assets(str(static_dir), str(dist_dir))
+    with open(static_dir / 'style.css', 'a', encoding='utf-8') as f:
+        f.write('\nbody { color: red; }\n')
+    with pytest.raises(ValueError):
+        static_assets._load_built(str(dist_dir), str(static_dir))